@@ -0,0 +1,71 @@
+"""
+Alembic environment.
+
+Migrations run against the application's primary engine, so they reach
+Cloud SQL through the same connector (or DATABASE_URL) as the API. An
+explicit URL (sqlalchemy.url in alembic.ini, or `alembic -x url=...`) takes
+precedence, e.g. for a local or test database.
+
+The version table lives in the preproduction schema next to the tables.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+config = context.config
+
+if config.config_file_name is not None:
+    # Leaves the application's loggers alone when migrating from a running process (or the tests)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+SCHEMA = "preproduction"
+
+
+def get_url():
+    return context.get_x_argument(as_dictionary=True).get("url") or config.get_main_option("sqlalchemy.url")
+
+
+def target_metadata():
+    """Model metadata; only `alembic revision --autogenerate` needs (and imports) it."""
+    if not getattr(config.cmd_opts, "autogenerate", False):
+        return None
+    from app.db.session import Base
+    import app.models  # noqa: F401  (registers every model on Base.metadata)
+    return Base.metadata
+
+
+def configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata(),
+        version_table_schema=SCHEMA,
+        include_schemas=True,
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting (`alembic upgrade head --sql`)."""
+    configure(url=get_url() or "postgresql://", literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    url = get_url()
+    if url:
+        connectable = create_engine(url, poolclass=pool.NullPool)
+    else:
+        from app.db.session import engine as connectable
+
+    with connectable.connect() as connection:
+        configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
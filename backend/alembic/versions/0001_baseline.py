@@ -0,0 +1,53 @@
+"""Baseline: tables used by the models but missing from schema.sql
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+app/db/schema.sql creates the original tables. items, task_variant_to_items
+and task_variants_to_subdatasets were added to live databases by hand; they
+are created here if missing, so this revision is safe to run on both.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS preproduction.items (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            url TEXT,
+            images TEXT[],
+            notes TEXT
+        )
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS preproduction.task_variant_to_items (
+            task_variant_id INT NOT NULL REFERENCES preproduction.task_variants(id) ON DELETE CASCADE,
+            item_id INT NOT NULL REFERENCES preproduction.items(id) ON DELETE CASCADE,
+            quantity INT NOT NULL DEFAULT 1,
+            PRIMARY KEY (task_variant_id, item_id)
+        )
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS preproduction.task_variants_to_subdatasets (
+            id SERIAL PRIMARY KEY,
+            task_variant_id INT NOT NULL REFERENCES preproduction.task_variants(id) ON DELETE CASCADE,
+            subdataset_id INT NOT NULL REFERENCES preproduction.subdatasets(id) ON DELETE CASCADE
+        )
+    """)
+
+
+def downgrade() -> None:
+    # The tables may predate this revision; never drop them with their data
+    pass
@@ -0,0 +1,61 @@
+"""Indexes for the columns app/crud filters, joins and paginates on
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 09:30:00.000000
+
+Built CONCURRENTLY so large tables (raw_episodes, episodes) stay writable
+while the indexes build; that cannot run inside a transaction, hence the
+autocommit block. IF NOT EXISTS makes a retry after a failed build safe
+(drop the INVALID index it leaves behind first).
+
+Composite indexes end in id so filtered pages come back in id order from
+the index; the (subdataset_id, label, id) index also answers the per
+subdataset episode stats with an index-only scan.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEMA = "preproduction"
+
+# (index name, table, columns)
+INDEXES = [
+    ("ix_raw_episodes_subdataset_id_id", "raw_episodes", ["subdataset_id", "id"]),
+    ("ix_raw_episodes_subdataset_id_label_id", "raw_episodes", ["subdataset_id", "label", "id"]),
+    ("ix_raw_episodes_label_id", "raw_episodes", ["label", "id"]),
+    ("ix_episodes_subdataset_id_id", "episodes", ["subdataset_id", "id"]),
+    ("ix_episodes_raw_episode_id", "episodes", ["raw_episode_id"]),
+    ("ix_task_variants_task_id_id", "task_variants", ["task_id", "id"]),
+    ("ix_task_variants_to_subdatasets_task_variant_id_subdataset_id", "task_variants_to_subdatasets",
+     ["task_variant_id", "subdataset_id"]),
+    ("ix_task_variants_to_subdatasets_subdataset_id", "task_variants_to_subdatasets", ["subdataset_id"]),
+    ("ix_task_variant_to_items_item_id", "task_variant_to_items", ["item_id"]),
+    ("ix_tasks_to_subdatasets_subdataset_id", "tasks_to_subdatasets", ["subdataset_id"]),
+    ("ix_training_runs_to_tasks_task_id", "training_runs_to_tasks", ["task_id"]),
+    ("ix_evaluations_task_id", "evaluations", ["task_id"]),
+    ("ix_tasks_status_id", "tasks", ["status", "id"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, schema=SCHEMA,
+                if_not_exists=True, postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, schema=SCHEMA, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,207 @@
+"""Per subdataset episode counters maintained by triggers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 14:00:00.000000
+
+subdataset_episode_stats holds one row per subdataset with the raw episode
+count per label (every label the raw_episodes CHECK allows) and the
+processed episode count; subdataset_processed_episode_stats splits the
+processed count per conversion version. Row triggers on raw_episodes and
+episodes keep both current for every writer, not just app/crud, so the
+subdataset detail reads its stats by primary key instead of aggregating
+all of its episodes.
+
+The tables are filled from the current rows in the same transaction that
+creates the triggers (CREATE TRIGGER blocks writes to the table until
+commit), so no change is missed or counted twice. Drift can be repaired
+with scripts/reconcile_episode_stats.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE preproduction.subdataset_episode_stats (
+            subdataset_id INT PRIMARY KEY REFERENCES preproduction.subdatasets(id) ON DELETE CASCADE,
+            total INT NOT NULL DEFAULT 0,
+            good INT NOT NULL DEFAULT 0,
+            bad INT NOT NULL DEFAULT 0,
+            contains_correction INT NOT NULL DEFAULT 0,
+            corrupted INT NOT NULL DEFAULT 0,
+            processed INT NOT NULL DEFAULT 0
+        )
+    """)
+    op.execute("""
+        CREATE TABLE preproduction.subdataset_processed_episode_stats (
+            subdataset_id INT NOT NULL REFERENCES preproduction.subdatasets(id) ON DELETE CASCADE,
+            conversion_version_id INT NOT NULL
+                REFERENCES preproduction.episode_conversion_versions(id) ON DELETE CASCADE,
+            total INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (subdataset_id, conversion_version_id)
+        )
+    """)
+
+    # Increments upsert the row; decrements only update it, so deleting the
+    # episodes of a subdataset that is itself being deleted is a no-op
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.bump_raw_episode_stats(p_subdataset_id INT, p_label TEXT, p_delta INT)
+        RETURNS VOID AS $$
+        BEGIN
+            IF p_subdataset_id IS NULL THEN
+                RETURN;
+            END IF;
+            IF p_delta > 0 THEN
+                INSERT INTO preproduction.subdataset_episode_stats AS s
+                    (subdataset_id, total, good, bad, contains_correction, corrupted)
+                VALUES (
+                    p_subdataset_id, p_delta,
+                    CASE WHEN p_label = 'good' THEN p_delta ELSE 0 END,
+                    CASE WHEN p_label = 'bad' THEN p_delta ELSE 0 END,
+                    CASE WHEN p_label = 'contains correction' THEN p_delta ELSE 0 END,
+                    CASE WHEN p_label = 'corrupted' THEN p_delta ELSE 0 END
+                )
+                ON CONFLICT (subdataset_id) DO UPDATE SET
+                    total = s.total + EXCLUDED.total,
+                    good = s.good + EXCLUDED.good,
+                    bad = s.bad + EXCLUDED.bad,
+                    contains_correction = s.contains_correction + EXCLUDED.contains_correction,
+                    corrupted = s.corrupted + EXCLUDED.corrupted;
+            ELSE
+                UPDATE preproduction.subdataset_episode_stats SET
+                    total = total + p_delta,
+                    good = good + CASE WHEN p_label = 'good' THEN p_delta ELSE 0 END,
+                    bad = bad + CASE WHEN p_label = 'bad' THEN p_delta ELSE 0 END,
+                    contains_correction = contains_correction
+                        + CASE WHEN p_label = 'contains correction' THEN p_delta ELSE 0 END,
+                    corrupted = corrupted + CASE WHEN p_label = 'corrupted' THEN p_delta ELSE 0 END
+                WHERE subdataset_id = p_subdataset_id;
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.bump_processed_episode_stats(
+            p_subdataset_id INT, p_conversion_version_id INT, p_delta INT
+        )
+        RETURNS VOID AS $$
+        BEGIN
+            IF p_subdataset_id IS NULL THEN
+                RETURN;
+            END IF;
+            IF p_delta > 0 THEN
+                INSERT INTO preproduction.subdataset_episode_stats AS s (subdataset_id, processed)
+                VALUES (p_subdataset_id, p_delta)
+                ON CONFLICT (subdataset_id) DO UPDATE SET processed = s.processed + EXCLUDED.processed;
+                IF p_conversion_version_id IS NOT NULL THEN
+                    INSERT INTO preproduction.subdataset_processed_episode_stats AS s
+                        (subdataset_id, conversion_version_id, total)
+                    VALUES (p_subdataset_id, p_conversion_version_id, p_delta)
+                    ON CONFLICT (subdataset_id, conversion_version_id) DO UPDATE SET total = s.total + EXCLUDED.total;
+                END IF;
+            ELSE
+                UPDATE preproduction.subdataset_episode_stats SET processed = processed + p_delta
+                WHERE subdataset_id = p_subdataset_id;
+                UPDATE preproduction.subdataset_processed_episode_stats SET total = total + p_delta
+                WHERE subdataset_id = p_subdataset_id AND conversion_version_id = p_conversion_version_id;
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.update_raw_episode_stats()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM preproduction.bump_raw_episode_stats(OLD.subdataset_id, OLD.label, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM preproduction.bump_raw_episode_stats(NEW.subdataset_id, NEW.label, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.update_processed_episode_stats()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM preproduction.bump_processed_episode_stats(OLD.subdataset_id, OLD.conversion_version_id, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM preproduction.bump_processed_episode_stats(NEW.subdataset_id, NEW.conversion_version_id, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Separate UPDATE triggers so updates that leave the counted columns
+    # alone (urls, operators, ...) do not touch the stats rows
+    for table, function, columns in (
+        ("raw_episodes", "update_raw_episode_stats", ("subdataset_id", "label")),
+        ("episodes", "update_processed_episode_stats", ("subdataset_id", "conversion_version_id")),
+    ):
+        changed = " OR ".join(f"OLD.{column} IS DISTINCT FROM NEW.{column}" for column in columns)
+        op.execute(f"""
+            CREATE TRIGGER on_{table}_insert_delete_stats
+            AFTER INSERT OR DELETE ON preproduction.{table}
+            FOR EACH ROW EXECUTE FUNCTION preproduction.{function}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER on_{table}_update_stats
+            AFTER UPDATE OF {", ".join(columns)} ON preproduction.{table}
+            FOR EACH ROW WHEN ({changed}) EXECUTE FUNCTION preproduction.{function}()
+        """)
+
+    op.execute("""
+        INSERT INTO preproduction.subdataset_episode_stats
+            (subdataset_id, total, good, bad, contains_correction, corrupted, processed)
+        SELECT s.id,
+               COALESCE(r.total, 0), COALESCE(r.good, 0), COALESCE(r.bad, 0),
+               COALESCE(r.contains_correction, 0), COALESCE(r.corrupted, 0), COALESCE(e.processed, 0)
+        FROM preproduction.subdatasets s
+        LEFT JOIN (
+            SELECT subdataset_id,
+                   count(*) AS total,
+                   count(*) FILTER (WHERE label = 'good') AS good,
+                   count(*) FILTER (WHERE label = 'bad') AS bad,
+                   count(*) FILTER (WHERE label = 'contains correction') AS contains_correction,
+                   count(*) FILTER (WHERE label = 'corrupted') AS corrupted
+            FROM preproduction.raw_episodes GROUP BY subdataset_id
+        ) r ON r.subdataset_id = s.id
+        LEFT JOIN (
+            SELECT subdataset_id, count(*) AS processed FROM preproduction.episodes GROUP BY subdataset_id
+        ) e ON e.subdataset_id = s.id
+        WHERE r.subdataset_id IS NOT NULL OR e.subdataset_id IS NOT NULL
+    """)
+    op.execute("""
+        INSERT INTO preproduction.subdataset_processed_episode_stats (subdataset_id, conversion_version_id, total)
+        SELECT subdataset_id, conversion_version_id, count(*)
+        FROM preproduction.episodes
+        WHERE subdataset_id IS NOT NULL AND conversion_version_id IS NOT NULL
+        GROUP BY subdataset_id, conversion_version_id
+    """)
+
+
+def downgrade() -> None:
+    for table in ("raw_episodes", "episodes"):
+        op.execute(f"DROP TRIGGER IF EXISTS on_{table}_update_stats ON preproduction.{table}")
+        op.execute(f"DROP TRIGGER IF EXISTS on_{table}_insert_delete_stats ON preproduction.{table}")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.update_processed_episode_stats()")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.update_raw_episode_stats()")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.bump_processed_episode_stats(INT, INT, INT)")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.bump_raw_episode_stats(INT, TEXT, INT)")
+    op.execute("DROP TABLE IF EXISTS preproduction.subdataset_processed_episode_stats")
+    op.execute("DROP TABLE IF EXISTS preproduction.subdataset_episode_stats")
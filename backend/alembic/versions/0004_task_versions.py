@@ -0,0 +1,137 @@
+"""Per task version counter bumped by every write to the task detail graph
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 17:00:00.000000
+
+tasks.version changes whenever anything GET /tasks/{id}/detail shows
+changes: the task row itself (BEFORE UPDATE trigger), its variants, their
+item and subdataset links, training run links and evaluations (row
+triggers keyed by the task or variant id), and edits to the items,
+subdatasets, training runs, embodiments and teleop modes it references.
+Deleting a referenced row cascades to a link table or sets a variant or
+subdataset column to NULL, both of which bump too. The response cache
+(app.core.response_cache) keys documents by (task id, version), so a write
+from any process, script or worker invalidates them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, key the task ids are looked up by, key column, events)
+TASK_GRAPH_TRIGGERS = [
+    ("task_variants", "task", "task_id", "INSERT OR UPDATE OR DELETE"),
+    ("training_runs_to_tasks", "task", "task_id", "INSERT OR UPDATE OR DELETE"),
+    ("evaluations", "task", "task_id", "INSERT OR UPDATE OR DELETE"),
+    ("task_variant_to_items", "task_variant", "task_variant_id", "INSERT OR UPDATE OR DELETE"),
+    ("task_variants_to_subdatasets", "task_variant", "task_variant_id", "INSERT OR UPDATE OR DELETE"),
+    ("items", "item", "id", "UPDATE"),
+    ("subdatasets", "subdataset", "id", "UPDATE"),
+    ("training_runs", "training_run", "id", "UPDATE"),
+    ("embodiments", "embodiment", "id", "UPDATE"),
+    ("teleop_modes", "teleop_mode", "id", "UPDATE"),
+]
+
+
+def upgrade() -> None:
+    # A constant default, so existing rows are not rewritten
+    op.execute("ALTER TABLE preproduction.tasks ADD COLUMN version BIGINT NOT NULL DEFAULT 1")
+
+    # Direct updates of a task; bumps made by bump_task_versions already
+    # changed version and are left alone
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.increment_task_version()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.version := OLD.version + 1;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER on_tasks_update_version
+        BEFORE UPDATE ON preproduction.tasks
+        FOR EACH ROW WHEN (OLD.version = NEW.version AND OLD.* IS DISTINCT FROM NEW.*)
+        EXECUTE FUNCTION preproduction.increment_task_version()
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.bump_task_versions(p_key TEXT, p_ids INT[])
+        RETURNS VOID AS $$
+        BEGIN
+            UPDATE preproduction.tasks SET version = version + 1
+            WHERE id IN (
+                SELECT unnest(p_ids) WHERE p_key = 'task'
+                UNION
+                SELECT v.task_id FROM preproduction.task_variants v
+                WHERE p_key = 'task_variant' AND v.id = ANY(p_ids)
+                UNION
+                SELECT v.task_id FROM preproduction.task_variant_to_items l
+                JOIN preproduction.task_variants v ON v.id = l.task_variant_id
+                WHERE p_key = 'item' AND l.item_id = ANY(p_ids)
+                UNION
+                SELECT v.task_id FROM preproduction.task_variants_to_subdatasets l
+                JOIN preproduction.task_variants v ON v.id = l.task_variant_id
+                WHERE p_key = 'subdataset' AND l.subdataset_id = ANY(p_ids)
+                UNION
+                SELECT l.task_id FROM preproduction.training_runs_to_tasks l
+                WHERE p_key = 'training_run' AND l.training_run_id = ANY(p_ids)
+                UNION
+                SELECT v.task_id FROM preproduction.task_variants v
+                WHERE (p_key = 'embodiment' AND v.embodiment_id = ANY(p_ids))
+                   OR (p_key = 'teleop_mode' AND v.teleop_mode_id = ANY(p_ids))
+                UNION
+                SELECT v.task_id FROM preproduction.subdatasets s
+                JOIN preproduction.task_variants_to_subdatasets l ON l.subdataset_id = s.id
+                JOIN preproduction.task_variants v ON v.id = l.task_variant_id
+                WHERE (p_key = 'embodiment' AND s.embodiment_id = ANY(p_ids))
+                   OR (p_key = 'teleop_mode' AND s.teleop_mode_id = ANY(p_ids))
+            );
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Trigger arguments: the key of bump_task_versions and the column of the
+    # changed row holding it
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.touch_task_versions()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            ids INT[] := '{}';
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                ids := ids || (to_jsonb(OLD) ->> TG_ARGV[1])::INT;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                ids := ids || (to_jsonb(NEW) ->> TG_ARGV[1])::INT;
+            END IF;
+            PERFORM preproduction.bump_task_versions(TG_ARGV[0], ids);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    for table, key, column, events in TASK_GRAPH_TRIGGERS:
+        # Updates that change nothing (e.g. re-saving a form) keep the cache
+        when = "WHEN (OLD.* IS DISTINCT FROM NEW.*) " if events == "UPDATE" else ""
+        op.execute(f"""
+            CREATE TRIGGER on_{table}_task_version
+            AFTER {events} ON preproduction.{table}
+            FOR EACH ROW {when}EXECUTE FUNCTION preproduction.touch_task_versions('{key}', '{column}')
+        """)
+
+
+def downgrade() -> None:
+    for table, _, _, _ in reversed(TASK_GRAPH_TRIGGERS):
+        op.execute(f"DROP TRIGGER IF EXISTS on_{table}_task_version ON preproduction.{table}")
+    op.execute("DROP TRIGGER IF EXISTS on_tasks_update_version ON preproduction.tasks")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.touch_task_versions()")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.bump_task_versions(TEXT, INT[])")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.increment_task_version()")
+    op.execute("ALTER TABLE preproduction.tasks DROP COLUMN IF EXISTS version")
@@ -0,0 +1,81 @@
+"""Per table change counters for conditional GETs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 19:00:00.000000
+
+table_versions holds one counter per table the read endpoints serve from.
+A statement trigger bumps it after every INSERT, UPDATE, DELETE or
+TRUNCATE of the table, by any writer, so an ETag built from the counters of
+the tables behind a response (app.core.etag) changes whenever the response
+can. Reading them is one primary key lookup, which is all a 304 costs.
+
+The counter row is locked until the writing transaction commits, so
+concurrent writes to the same table commit one after the other. The
+episode stats tables are not counted: they only change with raw_episodes
+and episodes, whose counters are used instead.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = [
+    "tasks",
+    "task_variants",
+    "task_variant_to_items",
+    "task_variants_to_subdatasets",
+    "tasks_to_subdatasets",
+    "items",
+    "subdatasets",
+    "raw_episodes",
+    "episodes",
+    "episode_conversion_versions",
+    "embodiments",
+    "teleop_modes",
+    "training_runs",
+    "training_runs_to_tasks",
+    "evaluations",
+]
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE preproduction.table_versions (
+            table_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 1
+        )
+    """)
+    op.execute(
+        "INSERT INTO preproduction.table_versions (table_name) VALUES "
+        + ", ".join(f"('{table}')" for table in VERSIONED_TABLES)
+    )
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.bump_table_version()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO preproduction.table_versions AS v (table_name) VALUES (TG_TABLE_NAME)
+            ON CONFLICT (table_name) DO UPDATE SET version = v.version + 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in VERSIONED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER on_{table}_table_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON preproduction.{table}
+            FOR EACH STATEMENT EXECUTE FUNCTION preproduction.bump_table_version()
+        """)
+
+
+def downgrade() -> None:
+    for table in reversed(VERSIONED_TABLES):
+        op.execute(f"DROP TRIGGER IF EXISTS on_{table}_table_version ON preproduction.{table}")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.bump_table_version()")
+    op.execute("DROP TABLE IF EXISTS preproduction.table_versions")
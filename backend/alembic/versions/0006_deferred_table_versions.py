@@ -0,0 +1,145 @@
+"""Bump the table change counters once per transaction, at commit, in table order
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 23:00:00.000000
+
+0005 bumped a table's table_versions row from a statement trigger, so the
+row stayed locked from the first write to that table until the commit:
+concurrent writers to a table ran one after the other, and two
+transactions writing two tables in opposite orders could deadlock on the
+counters. The tasks.version bumps of 0004 are UPDATEs of tasks, so every
+write to the task graph also took (and held) the tasks counter.
+
+Now the statement triggers only note the table in a transaction local
+setting (iliad.changed_tables). The first note of a transaction queues a
+row in table_version_bumps, whose deferred constraint trigger bumps every
+noted table at commit, in table name order, and removes the row. The
+counter locks are held for the commit only and always taken in the same
+order. Readers still never see a counter ahead of the data: the bump
+commits with it.
+
+tasks is only counted for changes to its own columns; the version column
+0004 bumps is read through tasks.version, not the table counter.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The tables of 0005
+VERSIONED_TABLES = [
+    "tasks",
+    "task_variants",
+    "task_variant_to_items",
+    "task_variants_to_subdatasets",
+    "tasks_to_subdatasets",
+    "items",
+    "subdatasets",
+    "raw_episodes",
+    "episodes",
+    "episode_conversion_versions",
+    "embodiments",
+    "teleop_modes",
+    "training_runs",
+    "training_runs_to_tasks",
+    "evaluations",
+]
+
+# Events counted per table; tasks leaves out UPDATEs of version only
+TASK_COLUMNS = ["name", "description", "status", "created_at", "is_external"]
+EVENTS = {"tasks": f"INSERT OR DELETE OR TRUNCATE OR UPDATE OF {', '.join(TASK_COLUMNS)}"}
+DEFAULT_EVENTS = "INSERT OR UPDATE OR DELETE OR TRUNCATE"
+
+
+def upgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS on_{table}_table_version ON preproduction.{table}")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.bump_table_version()")
+
+    # Transient: one row per open transaction that wrote a counted table
+    op.execute("CREATE UNLOGGED TABLE preproduction.table_version_bumps (id BIGSERIAL PRIMARY KEY)")
+    # The setting is noted before the row is queued: with the constraint
+    # set IMMEDIATE the bump runs right after that INSERT
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.note_table_change()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            tables TEXT[] := string_to_array(NULLIF(current_setting('iliad.changed_tables', true), ''), ',');
+        BEGIN
+            IF tables IS NULL THEN
+                PERFORM set_config('iliad.changed_tables', TG_TABLE_NAME::TEXT, true);
+                INSERT INTO preproduction.table_version_bumps DEFAULT VALUES;
+            ELSIF NOT TG_TABLE_NAME::TEXT = ANY(tables) THEN
+                PERFORM set_config('iliad.changed_tables',
+                                   array_to_string(tables || TG_TABLE_NAME::TEXT, ','), true);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.bump_table_versions()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            changed TEXT;
+        BEGIN
+            FOR changed IN
+                SELECT DISTINCT t FROM unnest(string_to_array(
+                    NULLIF(current_setting('iliad.changed_tables', true), ''), ','
+                )) AS t ORDER BY t
+            LOOP
+                INSERT INTO preproduction.table_versions AS v (table_name) VALUES (changed)
+                ON CONFLICT (table_name) DO UPDATE SET version = v.version + 1;
+            END LOOP;
+            PERFORM set_config('iliad.changed_tables', '', true);
+            DELETE FROM preproduction.table_version_bumps WHERE id = NEW.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE CONSTRAINT TRIGGER on_table_version_bump
+        AFTER INSERT ON preproduction.table_version_bumps
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION preproduction.bump_table_versions()
+    """)
+    for table in VERSIONED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER on_{table}_table_change
+            AFTER {EVENTS.get(table, DEFAULT_EVENTS)} ON preproduction.{table}
+            FOR EACH STATEMENT EXECUTE FUNCTION preproduction.note_table_change()
+        """)
+
+
+def downgrade() -> None:
+    for table in reversed(VERSIONED_TABLES):
+        op.execute(f"DROP TRIGGER IF EXISTS on_{table}_table_change ON preproduction.{table}")
+    op.execute("DROP TRIGGER IF EXISTS on_table_version_bump ON preproduction.table_version_bumps")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.bump_table_versions()")
+    op.execute("DROP FUNCTION IF EXISTS preproduction.note_table_change()")
+    op.execute("DROP TABLE IF EXISTS preproduction.table_version_bumps")
+
+    # The 0005 statement triggers
+    op.execute("""
+        CREATE OR REPLACE FUNCTION preproduction.bump_table_version()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO preproduction.table_versions AS v (table_name) VALUES (TG_TABLE_NAME)
+            ON CONFLICT (table_name) DO UPDATE SET version = v.version + 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in VERSIONED_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER on_{table}_table_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON preproduction.{table}
+            FOR EACH STATEMENT EXECUTE FUNCTION preproduction.bump_table_version()
+        """)
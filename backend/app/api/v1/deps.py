@@ -0,0 +1,58 @@
+"""
+Dependencies shared by the v1 routes.
+"""
+
+from typing import Dict, Sequence
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_db, get_async_db
+from app.crud import subdataset as subdataset_crud, table_version as table_version_crud
+from app.crud.aio import subdataset as async_subdataset_crud, table_version as async_table_version_crud
+from app.core.etag import resource_etag, check_etag
+
+
+def require_subdataset(subdataset_id: int, db: Session = Depends(get_db)) -> int:
+    """
+    404 unless the subdataset exists. An EXISTS probe on the primary key, so
+    nested routes no longer load the subdataset (and its episodes) for it.
+    Also called directly after a lookup folded the check into its own
+    statement and came back empty, to tell which of the two is missing.
+    """
+    if not subdataset_crud.subdataset_exists(db, subdataset_id):
+        raise HTTPException(status_code=404, detail="Subdataset not found")
+    return subdataset_id
+
+
+async def require_subdataset_async(subdataset_id: int, db: AsyncSession = Depends(get_async_db)) -> int:
+    """require_subdataset for async routes."""
+    if not await async_subdataset_crud.subdataset_exists(db, subdataset_id):
+        raise HTTPException(status_code=404, detail="Subdataset not found")
+    return subdataset_id
+
+
+def _check_table_etag(request: Request, response: Response, tables: Sequence[str], versions: Dict[str, int]):
+    if len(versions) < len(set(tables)):
+        # A table without a counter could change unnoticed: no ETag at all
+        return
+    check_etag(request, response, resource_etag(request, sorted(versions.items())))
+
+
+def conditional_get(*tables: str):
+    """
+    Route dependency answering 304 while the client's ETag matches the
+    change counters of tables, the tables the response is read from (see
+    app.core.etag). Otherwise the ETag is sent with the response.
+    """
+    def dependency(request: Request, response: Response, db: Session = Depends(get_db)):
+        _check_table_etag(request, response, tables, table_version_crud.get_table_versions(db, tables))
+    return dependency
+
+
+def conditional_get_async(*tables: str):
+    """conditional_get for async routes."""
+    async def dependency(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+        _check_table_etag(request, response, tables, await async_table_version_crud.get_table_versions(db, tables))
+    return dependency
@@ -4,10 +4,13 @@ from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.models.embodiment import Embodiment
+from app.core.request_timing import TimedRoute
+from app.api.v1.deps import conditional_get
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-@router.get("/", response_model=List[dict])
+@router.get("/", response_model=List[dict],
+            dependencies=[Depends(conditional_get("embodiments"))])
 def read_embodiments(db: Session = Depends(get_db)):
     """
     Retrieve all embodiments.
@@ -22,7 +25,8 @@ def read_embodiments(db: Session = Depends(get_db)):
         for embodiment in embodiments
     ]
 
-@router.get("/{embodiment_id}", response_model=dict)
+@router.get("/{embodiment_id}", response_model=dict,
+            dependencies=[Depends(conditional_get("embodiments"))])
 def read_embodiment(embodiment_id: int, db: Session = Depends(get_db)):
     """
     Retrieve a specific embodiment by ID.
@@ -1,37 +1,50 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.crud import item as crud
 from app.schemas.item import Item, ItemCreate, ItemUpdate
+from app.core.request_timing import TimedRoute
+from app.core.pagination import page_cursor, set_next_cursor
+from app.core.row_response import row_response
+from app.api.v1.deps import conditional_get
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 # Item endpoints
-@router.get("/list", response_model=List[Item])
+@router.get("/list", response_model=List[Item],
+            dependencies=[Depends(conditional_get("items"))])
 def read_items_list(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    after: Optional[tuple] = Depends(page_cursor),
     db: Session = Depends(get_db)
 ):
-    items = crud.get_items(db=db, skip=skip, limit=limit)
-    return items
+    items = crud.get_item_rows(db=db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, items, limit)
+    return row_response(response, items)
 
-@router.get("/", response_model=List[Item])
+@router.get("/", response_model=List[Item],
+            dependencies=[Depends(conditional_get("items"))])
 def read_items(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    after: Optional[tuple] = Depends(page_cursor),
     db: Session = Depends(get_db)
 ):
-    items = crud.get_items(db=db, skip=skip, limit=limit)
-    return items
+    items = crud.get_item_rows(db=db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, items, limit)
+    return row_response(response, items)
 
 @router.post("/", response_model=Item)
 def create_item(item: ItemCreate, db: Session = Depends(get_db)):
     return crud.create_item(db=db, item=item)
 
-@router.get("/{item_id}", response_model=Item)
+@router.get("/{item_id}", response_model=Item,
+            dependencies=[Depends(conditional_get("items"))])
 def read_item(item_id: int, db: Session = Depends(get_db)):
     db_item = crud.get_item(db=db, item_id=item_id)
     if db_item is None:
@@ -1,26 +1,29 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
 from app.crud import subdataset as crud
+from app.crud.aio import subdataset as async_crud
 from app.schemas.subdataset import RawEpisode, RawEpisodeCreate, RawEpisodeUpdate
+from app.core.request_timing import TimedRoute
+from app.core.pagination import page_cursor, set_next_cursor
+from app.core.row_response import row_response
+from app.api.v1.deps import require_subdataset, require_subdataset_async, conditional_get_async
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/", response_model=RawEpisode)
 def create_raw_episode(
     *,
     db: Session = Depends(get_db),
     raw_episode_in: RawEpisodeCreate,
-    subdataset_id: int
+    subdataset_id: int = Depends(require_subdataset)
 ) -> RawEpisode:
     """
     Create a new raw episode.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
-        raise HTTPException(status_code=404, detail="Subdataset not found")
     raw_episode = crud.create_raw_episode(
         db=db,
         subdataset_id=subdataset_id,
@@ -28,14 +31,17 @@ def create_raw_episode(
     )
     return raw_episode
 
-@router.get("/", response_model=List[RawEpisode])
-def read_raw_episodes(
+@router.get("/", response_model=List[RawEpisode],
+            dependencies=[Depends(conditional_get_async("raw_episodes", "subdatasets"))])
+async def read_raw_episodes(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     subdataset_id: Optional[int] = None,
-    label: Optional[str] = None
+    label: Optional[str] = None,
+    after: Optional[tuple] = Depends(page_cursor)
 ) -> List[RawEpisode]:
     """
     Retrieve raw episodes with optional filtering.
@@ -44,37 +50,33 @@ def read_raw_episodes(
     - **limit**: Maximum number of records to return
     - **subdataset_id**: Optional filter by subdataset ID
     - **label**: Optional filter by episode label
+    - **cursor**: Continue after the previous page (X-Next-Cursor header)
     """
-    if subdataset_id is not None:
-        subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-        if not subdataset:
-            raise HTTPException(status_code=404, detail="Subdataset not found")
-        raw_episodes = crud.get_raw_episodes(
-            db=db,
-            subdataset_id=subdataset_id,
-            skip=skip,
-            limit=limit,
-            label=label
-        )
-    else:
-        raw_episodes = crud.get_all_raw_episodes(
-            db=db,
-            skip=skip,
-            limit=limit,
-            label=label
-        )
-    return raw_episodes
+    raw_episodes = await async_crud.get_raw_episode_rows(
+        db=db,
+        subdataset_id=subdataset_id,
+        skip=skip,
+        limit=limit,
+        label=label,
+        after=after
+    )
+    if not raw_episodes and subdataset_id is not None:
+        # An empty page may also mean there is no such subdataset
+        await require_subdataset_async(subdataset_id, db)
+    set_next_cursor(response, raw_episodes, limit)
+    return row_response(response, raw_episodes)
 
-@router.get("/{episode_id}", response_model=RawEpisode)
-def read_raw_episode(
+@router.get("/{episode_id}", response_model=RawEpisode,
+            dependencies=[Depends(conditional_get_async("raw_episodes"))])
+async def read_raw_episode(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     episode_id: int
 ) -> RawEpisode:
     """
     Get a specific raw episode by ID.
     """
-    raw_episode = crud.get_raw_episode(db=db, raw_episode_id=episode_id)
+    raw_episode = await async_crud.get_raw_episode(db=db, raw_episode_id=episode_id)
     if not raw_episode:
         raise HTTPException(status_code=404, detail="Raw episode not found")
     return raw_episode
@@ -89,14 +91,13 @@ def update_raw_episode(
     """
     Update a raw episode.
     """
-    raw_episode = crud.get_raw_episode(db=db, raw_episode_id=episode_id)
-    if not raw_episode:
-        raise HTTPException(status_code=404, detail="Raw episode not found")
     raw_episode = crud.update_raw_episode(
         db=db,
         raw_episode_id=episode_id,
         raw_episode=raw_episode_in
     )
+    if not raw_episode:
+        raise HTTPException(status_code=404, detail="Raw episode not found")
     return raw_episode
 
 @router.delete("/{episode_id}", response_model=bool)
@@ -108,7 +109,6 @@ def delete_raw_episode(
     """
     Delete a raw episode.
     """
-    raw_episode = crud.get_raw_episode(db=db, raw_episode_id=episode_id)
-    if not raw_episode:
+    if not crud.delete_raw_episode(db=db, raw_episode_id=episode_id):
         raise HTTPException(status_code=404, detail="Raw episode not found")
-    return crud.delete_raw_episode(db=db, raw_episode_id=episode_id) 
\ No newline at end of file
+    return True 
\ No newline at end of file
@@ -1,37 +1,56 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
 from app.crud import subdataset as crud
+from app.crud.aio import subdataset as async_crud
 from app.crud import episode as episode_crud
 from app.schemas.subdataset import (
     Subdataset, SubdatasetCreate, SubdatasetUpdate,
-    SubdatasetList, RawEpisode, RawEpisodeCreate, RawEpisodeUpdate
+    SubdatasetList, SubdatasetListWithStats, RawEpisode, RawEpisodeCreate, RawEpisodeUpdate
 )
 from app.schemas.episode import Episode
 from app.schemas.task import Task
 from app.models.task_variants_to_subdatasets import TaskVariantsToSubdatasets
+from app.core.request_timing import TimedRoute
+from app.core.pagination import page_cursor, set_next_cursor
+from app.core.row_response import row_response
+from app.api.v1.deps import require_subdataset, require_subdataset_async, conditional_get, conditional_get_async
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Tables a serialized subdataset is read from, for ETags; the episode stats
+# change with raw_episodes and episodes
+SUBDATASET_TABLES = ("subdatasets", "embodiments", "teleop_modes", "raw_episodes", "episodes")
 
 # Subdataset endpoints
-@router.get("/list", response_model=List[SubdatasetList])
-def read_subdatasets_list(
+@router.get("/list", response_model=Union[List[SubdatasetListWithStats], List[SubdatasetList]],
+            dependencies=[Depends(conditional_get_async(
+                "task_variants_to_subdatasets", "task_variants", *SUBDATASET_TABLES
+            ))])
+async def read_subdatasets_list(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     task_id: Optional[int] = Query(None),
     variant_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    with_stats: bool = Query(False, description="Include the episode stats of each subdataset"),
+    after: Optional[tuple] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    subdatasets = crud.get_subdatasets(
+    subdatasets = await async_crud.get_subdataset_rows(
         db=db,
         skip=skip,
         limit=limit,
         task_id=task_id,
-        variant_id=variant_id
+        variant_id=variant_id,
+        after=after,
+        with_stats=with_stats
     )
-    return subdatasets
+    set_next_cursor(response, subdatasets, limit)
+    return row_response(response, subdatasets)
 
 @router.post("/", response_model=Subdataset)
 def create_subdataset(
@@ -45,36 +64,52 @@ def create_subdataset(
     subdataset = crud.create_subdataset(db=db, subdataset=subdataset_in)
     return subdataset
 
-@router.get("/", response_model=List[Subdataset])
+@router.get("/", response_model=List[Subdataset],
+            dependencies=[Depends(conditional_get(*SUBDATASET_TABLES))])
 def read_subdatasets(
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     embodiment_id: Optional[int] = None,
-    teleop_mode_id: Optional[int] = None
+    teleop_mode_id: Optional[int] = None,
+    after: Optional[tuple] = Depends(page_cursor)
 ) -> List[Subdataset]:
     """
     Retrieve subdatasets.
     """
-    subdatasets = crud.get_subdatasets(
+    subdatasets = crud.get_subdataset_rows(
         db=db,
         skip=skip,
         limit=limit,
         embodiment_id=embodiment_id,
-        teleop_mode_id=teleop_mode_id
+        teleop_mode_id=teleop_mode_id,
+        after=after
     )
-    return subdatasets
+    set_next_cursor(response, subdatasets, limit)
+    return row_response(response, subdatasets)
 
-@router.get("/{subdataset_id}", response_model=Subdataset)
-def read_subdataset(
+@router.get("/{subdataset_id}", response_model=Subdataset,
+            dependencies=[Depends(conditional_get_async(*SUBDATASET_TABLES))])
+async def read_subdataset(
     *,
-    db: Session = Depends(get_db),
-    subdataset_id: int
+    db: AsyncSession = Depends(get_async_db),
+    subdataset_id: int,
+    episode_limit: Optional[int] = Query(
+        None, ge=0, le=1000,
+        description="Only return the first episode_limit raw episodes; the rest via /{subdataset_id}/episodes/"
+    )
 ) -> Subdataset:
     """
     Get subdataset by ID.
+
+    Without episode_limit every raw episode is included. With it, raw_episodes
+    holds the first page and raw_episodes_next_cursor is the cursor for
+    /{subdataset_id}/episodes/ (null if there are no more). episode_limit=0
+    returns no raw episodes; the cursor is then that of the first page (null
+    if the subdataset has none).
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
+    subdataset = await async_crud.get_subdataset(db=db, subdataset_id=subdataset_id, episode_limit=episode_limit)
     if not subdataset:
         raise HTTPException(status_code=404, detail="Subdataset not found")
     return subdataset
@@ -89,14 +124,13 @@ def update_subdataset(
     """
     Update subdataset.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
-        raise HTTPException(status_code=404, detail="Subdataset not found")
     subdataset = crud.update_subdataset(
         db=db,
         subdataset_id=subdataset_id,
         subdataset=subdataset_in
     )
+    if not subdataset:
+        raise HTTPException(status_code=404, detail="Subdataset not found")
     return subdataset
 
 @router.delete("/{subdataset_id}", response_model=bool)
@@ -108,25 +142,21 @@ def delete_subdataset(
     """
     Delete subdataset.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
+    if not crud.delete_subdataset(db=db, subdataset_id=subdataset_id):
         raise HTTPException(status_code=404, detail="Subdataset not found")
-    return crud.delete_subdataset(db=db, subdataset_id=subdataset_id)
+    return True
 
 # RawEpisode endpoints
 @router.post("/{subdataset_id}/episodes/", response_model=RawEpisode)
 def create_raw_episode(
     *,
     db: Session = Depends(get_db),
-    subdataset_id: int,
+    subdataset_id: int = Depends(require_subdataset),
     raw_episode_in: RawEpisodeCreate
 ) -> RawEpisode:
     """
     Create new raw episode.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
-        raise HTTPException(status_code=404, detail="Subdataset not found")
     raw_episode = crud.create_raw_episode(
         db=db,
         subdataset_id=subdataset_id,
@@ -134,45 +164,49 @@ def create_raw_episode(
     )
     return raw_episode
 
-@router.get("/{subdataset_id}/episodes/", response_model=List[RawEpisode])
-def read_raw_episodes(
+@router.get("/{subdataset_id}/episodes/", response_model=List[RawEpisode],
+            dependencies=[Depends(conditional_get_async("raw_episodes", "subdatasets"))])
+async def read_raw_episodes(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    response: Response,
     subdataset_id: int,
     skip: int = 0,
     limit: int = 100,
-    label: Optional[str] = None
+    label: Optional[str] = None,
+    after: Optional[tuple] = Depends(page_cursor)
 ) -> List[RawEpisode]:
     """
     Retrieve raw episodes.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
-        raise HTTPException(status_code=404, detail="Subdataset not found")
-    raw_episodes = crud.get_raw_episodes(
+    raw_episodes = await async_crud.get_raw_episode_rows(
         db=db,
         subdataset_id=subdataset_id,
         skip=skip,
         limit=limit,
-        label=label
+        label=label,
+        after=after
     )
-    return raw_episodes
+    if not raw_episodes:
+        # An empty page may also mean there is no such subdataset
+        await require_subdataset_async(subdataset_id, db)
+    set_next_cursor(response, raw_episodes, limit)
+    return row_response(response, raw_episodes)
 
-@router.get("/{subdataset_id}/episodes/{episode_id}", response_model=RawEpisode)
-def read_raw_episode(
+@router.get("/{subdataset_id}/episodes/{episode_id}", response_model=RawEpisode,
+            dependencies=[Depends(conditional_get_async("raw_episodes", "subdatasets"))])
+async def read_raw_episode(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     subdataset_id: int,
     episode_id: int
 ) -> RawEpisode:
     """
     Get raw episode by ID.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
-        raise HTTPException(status_code=404, detail="Subdataset not found")
-    raw_episode = crud.get_raw_episode(db=db, raw_episode_id=episode_id)
-    if not raw_episode or raw_episode.subdataset_id != subdataset_id:
+    raw_episode = await async_crud.get_raw_episode(db=db, raw_episode_id=episode_id, subdataset_id=subdataset_id)
+    if not raw_episode:
+        await require_subdataset_async(subdataset_id, db)
         raise HTTPException(status_code=404, detail="Raw episode not found")
     return raw_episode
 
@@ -187,17 +221,15 @@ def update_raw_episode(
     """
     Update raw episode.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
-        raise HTTPException(status_code=404, detail="Subdataset not found")
-    raw_episode = crud.get_raw_episode(db=db, raw_episode_id=episode_id)
-    if not raw_episode or raw_episode.subdataset_id != subdataset_id:
-        raise HTTPException(status_code=404, detail="Raw episode not found")
     raw_episode = crud.update_raw_episode(
         db=db,
         raw_episode_id=episode_id,
-        raw_episode=raw_episode_in
+        raw_episode=raw_episode_in,
+        subdataset_id=subdataset_id
     )
+    if not raw_episode:
+        require_subdataset(subdataset_id, db)
+        raise HTTPException(status_code=404, detail="Raw episode not found")
     return raw_episode
 
 @router.delete("/{subdataset_id}/episodes/{episode_id}", response_model=bool)
@@ -210,28 +242,35 @@ def delete_raw_episode(
     """
     Delete raw episode.
     """
-    subdataset = crud.get_subdataset(db=db, subdataset_id=subdataset_id)
-    if not subdataset:
-        raise HTTPException(status_code=404, detail="Subdataset not found")
-    raw_episode = crud.get_raw_episode(db=db, raw_episode_id=episode_id)
-    if not raw_episode or raw_episode.subdataset_id != subdataset_id:
+    if not crud.delete_raw_episode(db=db, raw_episode_id=episode_id, subdataset_id=subdataset_id):
+        require_subdataset(subdataset_id, db)
         raise HTTPException(status_code=404, detail="Raw episode not found")
-    return crud.delete_raw_episode(db=db, raw_episode_id=episode_id)
+    return True
 
-@router.get("/{subdataset_id}/processed_episodes/", response_model=List[Episode])
+@router.get("/{subdataset_id}/processed_episodes/", response_model=List[Episode],
+            dependencies=[Depends(conditional_get("episodes", "episode_conversion_versions"))])
 def read_processed_episodes(
     *,
     db: Session = Depends(get_db),
+    response: Response,
     subdataset_id: int,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    after: Optional[tuple] = Depends(page_cursor)
 ) -> List[Episode]:
     """
     Retrieve processed episodes for a subdataset.
     """
-    return episode_crud.get_episodes_by_subdataset(db=db, subdataset_id=subdataset_id, skip=skip, limit=limit)
+    episodes = episode_crud.get_episode_rows_by_subdataset(
+        db=db, subdataset_id=subdataset_id, skip=skip, limit=limit, after=after
+    )
+    set_next_cursor(response, episodes, limit)
+    return row_response(response, episodes)
 
-@router.get("/{subdataset_id}/linked_tasks/", response_model=List[Task])
+@router.get("/{subdataset_id}/linked_tasks/", response_model=List[Task],
+            dependencies=[Depends(conditional_get(
+                "tasks", "task_variants", "task_variants_to_subdatasets", "embodiments", "teleop_modes"
+            ))])
 def read_linked_tasks(
     *,
     db: Session = Depends(get_db),
@@ -1,60 +1,84 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
 from app.crud import task as crud
+from app.crud.aio import task as async_crud
 from app.schemas.task import (
     Task, TaskCreate, TaskUpdate,
     TaskVariant, TaskVariantCreate, TaskVariantUpdate,
     TaskList, TaskDetailSummary
 )
 from app.schemas.item import TaskVariantItemInfo
+from app.core.config import settings
+from app.core.response_cache import task_detail_cache
+from app.core.request_timing import TimedRoute
+from app.core.pagination import page_cursor, set_next_cursor
+from app.core.row_response import row_response
+from app.core.etag import NotModified, resource_etag, etag_matches, etag_headers
+from app.api.v1.deps import conditional_get, conditional_get_async
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Tables a serialized variant is read from, for ETags
+VARIANT_TABLES = ("task_variants", "embodiments", "teleop_modes")
 
 # Task endpoints
-@router.get("/list", response_model=List[TaskList])
-def read_tasks_list(
+@router.get("/list", response_model=List[TaskList],
+            dependencies=[Depends(conditional_get_async("tasks"))])
+async def read_tasks_list(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
     is_external: Optional[bool] = None,
-    db: Session = Depends(get_db)
+    after: Optional[tuple] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    tasks = crud.get_tasks(
+    tasks = await async_crud.get_task_rows(
         db=db,
         skip=skip,
         limit=limit,
         status=status,
-        is_external=is_external
+        is_external=is_external,
+        after=after
     )
-    return tasks
+    set_next_cursor(response, tasks, limit)
+    return row_response(response, tasks)
 
 @router.post("/", response_model=Task)
 def create_task(task: TaskCreate, db: Session = Depends(get_db)):
     return crud.create_task(db=db, task=task)
 
-@router.get("/", response_model=List[Task])
-def read_tasks(
+@router.get("/", response_model=List[Task],
+            dependencies=[Depends(conditional_get_async("tasks", *VARIANT_TABLES))])
+async def read_tasks(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
     is_external: Optional[bool] = None,
-    db: Session = Depends(get_db)
+    after: Optional[tuple] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    tasks = crud.get_tasks(
+    tasks = await async_crud.get_task_rows(
         db=db,
         skip=skip,
         limit=limit,
         status=status,
-        is_external=is_external
+        is_external=is_external,
+        with_variants=True,
+        after=after
     )
-    return tasks
+    set_next_cursor(response, tasks, limit)
+    return row_response(response, tasks)
 
-@router.get("/{task_id}", response_model=Task)
-def read_task(task_id: int, db: Session = Depends(get_db)):
-    db_task = crud.get_task(db=db, task_id=task_id)
+@router.get("/{task_id}", response_model=Task,
+            dependencies=[Depends(conditional_get_async("tasks", *VARIANT_TABLES))])
+async def read_task(task_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_task = await async_crud.get_task(db=db, task_id=task_id, with_variants=True)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
@@ -89,7 +113,8 @@ def create_task_variant(
         raise HTTPException(status_code=404, detail="Task not found")
     return crud.create_task_variant(db=db, task_id=task_id, variant=variant)
 
-@router.get("/{task_id}/variants/", response_model=List[TaskVariant])
+@router.get("/{task_id}/variants/", response_model=List[TaskVariant],
+            dependencies=[Depends(conditional_get("tasks", *VARIANT_TABLES))])
 def read_task_variants(
     task_id: int,
     skip: int = 0,
@@ -101,9 +126,10 @@ def read_task_variants(
         raise HTTPException(status_code=404, detail="Task not found")
     return crud.get_task_variants(db=db, task_id=task_id, skip=skip, limit=limit)
 
-@router.get("/variants/{variant_id}", response_model=TaskVariant)
+@router.get("/variants/{variant_id}", response_model=TaskVariant,
+            dependencies=[Depends(conditional_get(*VARIANT_TABLES))])
 def read_task_variant(variant_id: int, db: Session = Depends(get_db)):
-    db_variant = crud.get_task_variant(db=db, variant_id=variant_id)
+    db_variant = crud.get_task_variant(db=db, variant_id=variant_id, with_details=True)
     if db_variant is None:
         raise HTTPException(status_code=404, detail="Task variant not found")
     return db_variant
@@ -127,11 +153,32 @@ def delete_task_variant(variant_id: int, db: Session = Depends(get_db)):
     return {"message": "Task variant deleted successfully"}
 
 @router.get("/{task_id}/detail", response_model=TaskDetailSummary)
-def read_task_detail(task_id: int, db: Session = Depends(get_db)):
-    summary = crud.get_task_detail_summary(db=db, task_id=task_id)
-    if summary is None:
+async def read_task_detail(request: Request, task_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Cached per task version; every write to the task's graph bumps it (see app.core.response_cache)
+    version = await async_crud.get_task_version(db=db, task_id=task_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    return summary
+    # The version also tags the document for conditional GETs
+    etag = resource_etag(request, settings.TASK_DETAIL_ENGINE, version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise NotModified(etag)
+    document = task_detail_cache.get(task_id, version)
+    if document is None:
+        document = await _render_task_detail(db, task_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        # Read after the version, so it is never older than the version it is cached under
+        task_detail_cache.put(task_id, version, document)
+    return Response(content=document, media_type="application/json", headers=etag_headers(etag))
+
+async def _render_task_detail(db: AsyncSession, task_id: int) -> Optional[bytes]:
+    if settings.TASK_DETAIL_ENGINE == "json":
+        # Postgres builds the whole document; sent as is, without re-validation
+        document = await async_crud.get_task_detail_json(db=db, task_id=task_id)
+        return document.encode() if document is not None else None
+
+    summary = await async_crud.get_task_detail_summary(db=db, task_id=task_id)
+    return summary.model_dump_json().encode() if summary is not None else None
 
 # Task Variant Items endpoints
 @router.post("/variants/{variant_id}/items/")
@@ -156,7 +203,8 @@ def remove_item_from_variant(
         raise HTTPException(status_code=404, detail="Task variant or item not found")
     return {"message": "Item removed from variant successfully"}
 
-@router.get("/variants/{variant_id}/items/", response_model=List[TaskVariantItemInfo])
+@router.get("/variants/{variant_id}/items/", response_model=List[TaskVariantItemInfo],
+            dependencies=[Depends(conditional_get("task_variants", "task_variant_to_items", "items"))])
 def get_variant_items(
     variant_id: int,
     db: Session = Depends(get_db)
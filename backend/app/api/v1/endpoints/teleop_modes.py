@@ -4,10 +4,13 @@ from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.models.teleop_mode import TeleopMode
+from app.core.request_timing import TimedRoute
+from app.api.v1.deps import conditional_get
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-@router.get("/", response_model=List[dict])
+@router.get("/", response_model=List[dict],
+            dependencies=[Depends(conditional_get("teleop_modes"))])
 def read_teleop_modes(db: Session = Depends(get_db)):
     """
     Retrieve all teleop modes.
@@ -22,7 +25,8 @@ def read_teleop_modes(db: Session = Depends(get_db)):
         for teleop_mode in teleop_modes
     ]
 
-@router.get("/{teleop_mode_id}", response_model=dict)
+@router.get("/{teleop_mode_id}", response_model=dict,
+            dependencies=[Depends(conditional_get("teleop_modes"))])
 def read_teleop_mode(teleop_mode_id: int, db: Session = Depends(get_db)):
     """
     Retrieve a specific teleop mode by ID.
@@ -2,8 +2,9 @@ import os
 from typing import List
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from app.core.gcs_service import gcs_service
+from app.core.request_timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/images")
 async def upload_task_images(
@@ -1,18 +1,28 @@
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel, EmailStr
 from fastapi import Request, status, HTTPException
-from authlib.integrations.starlette_client import OAuth
 from jose import JWTError, jwt
 from app.core.config import settings
 
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=settings.GOOGLE_AUTH_CLIENT_ID,
-    client_secret=settings.GOOGLE_AUTH_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'},
-)
+# Registered on the first login, so importing the app does not load authlib
+# and each worker fetches the provider metadata itself
+_oauth = None
+
+def get_oauth():
+    """OAuth registry with the Google client, created on first use."""
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+        oauth = OAuth()
+        oauth.register(
+            name='google',
+            client_id=settings.GOOGLE_AUTH_CLIENT_ID,
+            client_secret=settings.GOOGLE_AUTH_CLIENT_SECRET,
+            server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+            client_kwargs={'scope': 'openid email profile'},
+        )
+        _oauth = oauth
+    return _oauth
 
 class AuthRequest(BaseModel):
     code: str
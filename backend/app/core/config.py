@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict, List
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Robotics Data Manager"
@@ -12,6 +12,12 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASSWORD: str
     CONNECTION_TYPE: str
+    # Sync driver: pg8000 (pure Python, works with the Cloud SQL connector), or the
+    # C-accelerated psycopg / psycopg2, which need a DSN in DATABASE_URL
+    DB_DRIVER: str = "pg8000"
+    # Plain DSN (e.g. local Postgres or the Cloud SQL Auth Proxy) used instead of the
+    # connector; async engines use the same DSN with asyncpg
+    DATABASE_URL: Optional[str] = None
     
     BACKEND_URL: str
 
@@ -27,9 +33,44 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 20
     DB_POOL_TIMEOUT: int = 30
     DB_POOL_RECYCLE: int = 3600  # 1 hour
+    DB_PING_IDLE_SECONDS: float = 60.0  # Ping pooled connections idle longer than this on checkout; 0 pings every checkout
+    DB_POOL_WARMUP: bool = True  # Open DB_POOL_SIZE connections per engine at startup
+    DB_POOL_WARMUP_TIMEOUT: float = 30.0  # Per pool and attempt
+    DB_POOL_WARMUP_RETRY_SECONDS: float = 5.0  # Delay before retrying a failed warm-up; /ready is 503 until one succeeds
     
+    # Read replicas (Cloud SQL instance connection names, or DSNs) serving GET requests
+    CLOUDSQL_READ_REPLICAS: List[str] = []
+    DB_REPLICA_STRATEGY: str = "round_robin"  # round_robin or least_loaded
+    READ_YOUR_WRITES_SECONDS: int = 5  # After a write, the client reads from the primary this long
+
     GCP_MEDIA_BUCKET_NAME: str
 
+    # Per-request query budgets: off, warn (structured log) or raise (dev/test)
+    QUERY_BUDGET_MODE: str = "warn"
+    QUERY_BUDGET_DEFAULT: int = 25
+    QUERY_BUDGET_REPEAT_LIMIT: int = 5
+    QUERY_BUDGETS: Dict[str, int] = {}  # Route template -> budget, e.g. {"/api/v1/tasks/": 5}
+
+    # Cross-worker performance stats (memory-mapped file per worker)
+    PERF_SHARED_DIR: str = ""  # Defaults to <tmp>/mimic-hub-perf
+    PERF_PUBLISH_INTERVAL: float = 2.0
+    PERF_SHARED_REGION_SIZE: int = 1024 * 1024
+
+    # GET /tasks/{id}/detail: "json" (one statement, document built by Postgres) or "orm"
+    TASK_DETAIL_ENGINE: str = "json"
+
+    # Per-worker budget for cached task detail documents (bytes); 0 disables the cache
+    TASK_DETAIL_CACHE_BYTES: int = 64 * 1024 * 1024
+
+    # Requests slower than this (seconds) are logged with the SQL they ran; 0 disables
+    SLOW_REQUEST_THRESHOLD: float = 1.0
+    SLOW_REQUEST_MAX_STATEMENTS: int = 100
+
+    # On-demand request profiling, triggered by the header X-Profile: <token>
+    PROFILING_TOKEN: str = ""  # Empty disables profiling
+    PROFILING_INTERVAL: float = 0.005  # Seconds between stack samples
+    PROFILING_MAX_PROFILES: int = 20
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,19 +1,46 @@
 import os
 import mimetypes
+import threading
 from typing import Optional
-from google.cloud import storage
 from google.oauth2 import service_account
 from app.core.config import settings
+from app.core.performance_monitor import phase_timer
 
 class GCSService:
     def __init__(self):
-        # Initialize Google Cloud Storage client with service account
-        self.client = storage.Client()
-        
         # Bucket name from settings
         self.bucket_name = settings.GCP_MEDIA_BUCKET_NAME
-        self.bucket = self.client.bucket(self.bucket_name)
+
+        # The storage client is created on first use in each process, see client
+        self._client = None
+        self._bucket = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Forget a client inherited from the parent process; its sessions must not be shared."""
+        self._client = None
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Google Cloud Storage client, created on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google.cloud import storage
+                    self._client = storage.Client()
+        return self._client
+
+    @property
+    def bucket(self):
+        """The media bucket; creating the handle does not call the API."""
+        if self._bucket is None:
+            self._bucket = self.client.bucket(self.bucket_name)
+        return self._bucket
     
+    @phase_timer("gcs")
     def upload_image(self, image_data: bytes, filename: str, content_type: Optional[str] = None) -> str:
         """
         Upload an image to Google Cloud Storage
@@ -59,6 +86,7 @@ class GCSService:
         """
         return f"{task_id}_{variant_id}_{image_type}{file_extension}"
     
+    @phase_timer("gcs")
     def get_image_as_base64(self, gsutil_uri: str) -> str:
         """
         Download an image from Google Cloud Storage and return it as base64-encoded data
@@ -99,6 +127,7 @@ class GCSService:
         
         return gsutil_uri  # Return as-is if not a gsutil URI
 
+    @phase_timer("gcs")
     def delete_image(self, gsutil_uri: str) -> bool:
         """
         Delete an image from Google Cloud Storage
@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+OFFSET pages make the database read and discard every skipped row, so deep
+pages get slower. List endpoints also accept an opaque `cursor`: it holds
+the sort key of the last row of the previous page, and the next page starts
+with an index range scan right after it. Pages are ordered by
+(sort key, id), id alone where the sort key is id.
+
+The cursor for the following page is returned in the X-Next-Cursor header
+(absent on the last page), so response bodies and skip/limit are unchanged.
+"""
+
+import json
+import base64
+import binascii
+from typing import Optional, Sequence
+
+from fastapi import Query, Response
+from sqlalchemy import BigInteger, Integer, SmallInteger, String, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Bounds of the integer column types, most specific first: Postgres fails
+# the statement (a 500) on a parameter out of its column's range
+INTEGER_BOUNDS = ((SmallInteger, 2 ** 15), (BigInteger, 2 ** 63), (Integer, 2 ** 31))
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not produced by next_cursor (answered with 400)."""
+
+
+def encode_cursor(values: Sequence) -> str:
+    payload = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or not values or not all(
+        isinstance(value, (int, str)) and not isinstance(value, bool) for value in values
+    ):
+        raise InvalidCursor("Invalid cursor")
+    return tuple(values)
+
+
+def page_cursor(
+    cursor: Optional[str] = Query(None, description=f"Continue after the previous page ({NEXT_CURSOR_HEADER} header)")
+) -> Optional[tuple]:
+    """Dependency decoding the `cursor` query parameter into keyset values."""
+    return decode_cursor(cursor) if cursor else None
+
+
+def _check_key_value(column, value) -> None:
+    """InvalidCursor unless value fits the column's type (integers in range, strings without NUL)."""
+    column_type = column.type
+    if isinstance(column_type, Integer):
+        bound = next(bound for integer_type, bound in INTEGER_BOUNDS if isinstance(column_type, integer_type))
+        valid = isinstance(value, int) and not isinstance(value, bool) and -bound <= value < bound
+    elif isinstance(column_type, String):
+        valid = isinstance(value, str) and "\x00" not in value
+    else:
+        valid = isinstance(value, column_type.python_type)
+    if not valid:
+        raise InvalidCursor("Invalid cursor")
+
+
+def keyset(query, after: Optional[tuple], *columns):
+    """Order a Query or select by columns, starting after the keyset values of a cursor."""
+    if after is not None:
+        if len(after) != len(columns):
+            raise InvalidCursor("Invalid cursor")
+        for column, value in zip(columns, after):
+            _check_key_value(column, value)
+        if len(columns) == 1:
+            query = query.filter(columns[0] > after[0])
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*after))
+    return query.order_by(*columns)
+
+
+def next_cursor(rows: Sequence, limit: int, keys: Sequence[str] = ("id",)) -> Optional[str]:
+    """Cursor for the page after rows, or None if rows was the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    # ORM instances, or dicts from the ORM-free reads (app.crud.rows)
+    if isinstance(last, dict):
+        return encode_cursor([last[key] for key in keys])
+    return encode_cursor([getattr(last, key) for key in keys])
+
+
+def first_cursor() -> str:
+    """Cursor of the first page of a list keyed by a SERIAL id (ids start at 1)."""
+    return encode_cursor([0])
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int, keys: Sequence[str] = ("id",)):
+    cursor = next_cursor(rows, limit, keys)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -1,74 +1,334 @@
 """
 Performance monitoring utilities for database operations.
 Helps track connection times, query performance, and identify bottlenecks.
+
+Durations are kept in fixed-size log-bucketed histograms over sliding time
+windows, so memory and the cost of reading the stats stay constant no matter
+how long a worker has been running.
 """
 
+import math
 import time
+import asyncio
 import logging
+import threading
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Dict, List, Optional
 from contextlib import contextmanager
 
+from app.core.request_context import get_request_context
+
 logger = logging.getLogger(__name__)
 
+# Histogram resolution: bucket boundaries grow geometrically by HISTOGRAM_GROWTH,
+# so any reported percentile is within ~2.5% of the true value.
+HISTOGRAM_MIN_VALUE = 1e-5   # 10us, anything faster lands in the first bucket
+HISTOGRAM_MAX_VALUE = 600.0  # 10min, anything slower lands in the last bucket
+HISTOGRAM_GROWTH = 1.05
+
+# Sliding windows reported by get_stats, as (label, seconds)
+WINDOWS = (("1m", 60), ("5m", 300), ("15m", 900))
+SLOT_SECONDS = 10
+
+PERCENTILES = (50, 90, 99)
+
+_LOG_GROWTH = math.log(HISTOGRAM_GROWTH)
+_BUCKET_COUNT = int(math.ceil(math.log(HISTOGRAM_MAX_VALUE / HISTOGRAM_MIN_VALUE) / _LOG_GROWTH)) + 1
+
+
+def bucket_index(value: float) -> int:
+    """Map a duration in seconds to its histogram bucket."""
+    if value <= HISTOGRAM_MIN_VALUE:
+        return 0
+    index = int(math.log(value / HISTOGRAM_MIN_VALUE) / _LOG_GROWTH) + 1
+    return min(index, _BUCKET_COUNT - 1)
+
+
+def bucket_value(index: int) -> float:
+    """Representative duration (geometric midpoint) of a histogram bucket."""
+    if index == 0:
+        return HISTOGRAM_MIN_VALUE
+    return HISTOGRAM_MIN_VALUE * HISTOGRAM_GROWTH ** (index - 0.5)
+
+
+class LatencyHistogram:
+    """Sparse log-bucketed histogram of durations."""
+
+    __slots__ = ("buckets", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def record(self, duration: float):
+        index = bucket_index(duration)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if self.count == 0 or duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        self.count += 1
+        self.total += duration
+
+    def merge(self, other: "LatencyHistogram"):
+        if not other.count:
+            return
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        if self.count == 0 or other.min < self.min:
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, pct: float) -> float:
+        """Approximate percentile, clamped to the observed min/max."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(math.ceil(self.count * pct / 100.0)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(bucket_value(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        """Plain-JSON form, used to share histograms between worker processes."""
+        return {
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.buckets = {int(index): count for index, count in data.get("buckets", {}).items()}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    def summary(self) -> dict:
+        summary = {
+            "count": self.count,
+            "avg_time": self.total / self.count if self.count else 0,
+        }
+        for pct in PERCENTILES:
+            summary[f"p{pct}"] = self.percentile(pct)
+        summary["max_time"] = self.max
+        return summary
+
+
+class WindowedHistogram:
+    """
+    Latency histogram over sliding time windows.
+
+    Samples go into a ring of SLOT_SECONDS-wide slots covering the longest
+    window; a window is the merge of its most recent slots. Lifetime count,
+    sum, min and max are kept as plain scalars.
+    """
+
+    def __init__(self, windows=WINDOWS, slot_seconds: int = SLOT_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.windows = windows
+        self.slot_seconds = slot_seconds
+        self.clock = clock
+        self.slot_count = max(seconds for _, seconds in windows) // slot_seconds
+        self._slots: List[Optional[LatencyHistogram]] = [None] * self.slot_count
+        self._slot_epochs: List[Optional[int]] = [None] * self.slot_count
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def record(self, duration: float):
+        epoch = int(self.clock() // self.slot_seconds)
+        position = epoch % self.slot_count
+        with self._lock:
+            if self._slot_epochs[position] != epoch:
+                self._slots[position] = LatencyHistogram()
+                self._slot_epochs[position] = epoch
+            self._slots[position].record(duration)
+            if self.count == 0 or duration < self.min:
+                self.min = duration
+            if duration > self.max:
+                self.max = duration
+            self.count += 1
+            self.total += duration
+
+    def window(self, seconds: int) -> LatencyHistogram:
+        """Merged histogram of the last `seconds` (rounded up to whole slots)."""
+        current = int(self.clock() // self.slot_seconds)
+        oldest = current - int(math.ceil(seconds / self.slot_seconds)) + 1
+        merged = LatencyHistogram()
+        with self._lock:
+            for position, epoch in enumerate(self._slot_epochs):
+                if epoch is not None and oldest <= epoch <= current:
+                    merged.merge(self._slots[position])
+        return merged
+
+    def lifetime(self) -> LatencyHistogram:
+        """Lifetime count, sum, min and max (without buckets)."""
+        histogram = LatencyHistogram()
+        histogram.count = self.count
+        histogram.total = self.total
+        histogram.min = self.min
+        histogram.max = self.max
+        return histogram
+
+    def get_stats(self) -> dict:
+        return metric_stats(self.lifetime(), {label: self.window(seconds) for label, seconds in self.windows})
+
+    def snapshot(self) -> dict:
+        """Mergeable snapshot of the lifetime scalars and every window."""
+        return {
+            "lifetime": self.lifetime().to_dict(),
+            "windows": {label: self.window(seconds).to_dict() for label, seconds in self.windows},
+        }
+
+
+class WindowedCounter:
+    """Event counter over the same sliding windows as WindowedHistogram."""
+
+    def __init__(self, windows=WINDOWS, slot_seconds: int = SLOT_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.windows = windows
+        self.slot_seconds = slot_seconds
+        self.clock = clock
+        self.slot_count = max(seconds for _, seconds in windows) // slot_seconds
+        self._slots: List[int] = [0] * self.slot_count
+        self._slot_epochs: List[Optional[int]] = [None] * self.slot_count
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def increment(self, amount: int = 1):
+        epoch = int(self.clock() // self.slot_seconds)
+        position = epoch % self.slot_count
+        with self._lock:
+            if self._slot_epochs[position] != epoch:
+                self._slots[position] = 0
+                self._slot_epochs[position] = epoch
+            self._slots[position] += amount
+            self.total += amount
+
+    def window(self, seconds: int) -> int:
+        """Events in the last `seconds` (rounded up to whole slots)."""
+        current = int(self.clock() // self.slot_seconds)
+        oldest = current - int(math.ceil(seconds / self.slot_seconds)) + 1
+        with self._lock:
+            return sum(
+                count for count, epoch in zip(self._slots, self._slot_epochs)
+                if epoch is not None and oldest <= epoch <= current
+            )
+
+    def snapshot(self) -> dict:
+        return {
+            "total": self.total,
+            "windows": {label: self.window(seconds) for label, seconds in self.windows},
+        }
+
+
+def merge_counter_snapshots(snapshots: List[dict]) -> dict:
+    """Sum WindowedCounter snapshots."""
+    merged = {"total": 0, "windows": {}}
+    for data in snapshots:
+        merged["total"] += data["total"]
+        for label, count in data["windows"].items():
+            merged["windows"][label] = merged["windows"].get(label, 0) + count
+    return merged
+
+
+def metric_stats(lifetime: LatencyHistogram, windows: Dict[str, LatencyHistogram]) -> dict:
+    """Stats for one metric in the format served by /performance."""
+    return {
+        "count": lifetime.count,
+        "avg_time": lifetime.total / lifetime.count if lifetime.count else 0,
+        "min_time": lifetime.min,
+        "max_time": lifetime.max,
+        "windows": {label: histogram.summary() for label, histogram in windows.items()},
+    }
+
+
+def merge_histogram_snapshots(snapshots: List[dict]) -> dict:
+    """Combine WindowedHistogram snapshots into stats."""
+    lifetime = LatencyHistogram()
+    windows: Dict[str, LatencyHistogram] = {}
+    for data in snapshots:
+        lifetime.merge(LatencyHistogram.from_dict(data["lifetime"]))
+        for label, window in data["windows"].items():
+            windows.setdefault(label, LatencyHistogram()).merge(LatencyHistogram.from_dict(window))
+    return metric_stats(lifetime, windows)
+
+
+def merge_snapshots(snapshots: List[dict]) -> dict:
+    """Combine PerformanceMonitor snapshots (e.g. from several workers) into stats."""
+    grouped: Dict[str, List[dict]] = {}
+    for snapshot in snapshots:
+        for metric, data in snapshot.items():
+            grouped.setdefault(metric, []).append(data)
+    return {metric: merge_histogram_snapshots(datas) for metric, datas in grouped.items()}
+
+
 class PerformanceMonitor:
     """Monitor database performance metrics."""
-    
+
     def __init__(self):
-        self.connection_times = []
-        self.query_times = []
-        self.total_connections = 0
-        self.total_queries = 0
-    
+        self.histograms: Dict[str, WindowedHistogram] = {
+            "connections": WindowedHistogram(),
+            "queries": WindowedHistogram(),
+        }
+
+    def record(self, metric: str, duration: float):
+        """Record a duration for the given metric, creating it on first use."""
+        histogram = self.histograms.get(metric)
+        if histogram is None:
+            histogram = self.histograms.setdefault(metric, WindowedHistogram())
+        histogram.record(duration)
+
     def record_connection_time(self, duration: float):
         """Record a database connection time."""
-        self.connection_times.append(duration)
-        self.total_connections += 1
-    
+        self.record("connections", duration)
+
     def record_query_time(self, duration: float):
         """Record a database query time."""
-        self.query_times.append(duration)
-        self.total_queries += 1
-    
+        self.record("queries", duration)
+
+    @property
+    def total_connections(self) -> int:
+        return self.histograms["connections"].count
+
+    @property
+    def total_queries(self) -> int:
+        return self.histograms["queries"].count
+
     def get_stats(self) -> dict:
         """Get performance statistics."""
-        if not self.connection_times and not self.query_times:
-            return {
-                "connections": {"count": 0, "avg_time": 0, "min_time": 0, "max_time": 0},
-                "queries": {"count": 0, "avg_time": 0, "min_time": 0, "max_time": 0}
-            }
-        
-        conn_stats = {
-            "count": len(self.connection_times),
-            "avg_time": sum(self.connection_times) / len(self.connection_times) if self.connection_times else 0,
-            "min_time": min(self.connection_times) if self.connection_times else 0,
-            "max_time": max(self.connection_times) if self.connection_times else 0
-        }
-        
-        query_stats = {
-            "count": len(self.query_times),
-            "avg_time": sum(self.query_times) / len(self.query_times) if self.query_times else 0,
-            "min_time": min(self.query_times) if self.query_times else 0,
-            "max_time": max(self.query_times) if self.query_times else 0
-        }
-        
-        return {
-            "connections": conn_stats,
-            "queries": query_stats
-        }
-    
-    def log_stats(self):
+        return {metric: histogram.get_stats() for metric, histogram in list(self.histograms.items())}
+
+    def snapshot(self) -> dict:
+        """Mergeable snapshot of every metric, see merge_snapshots."""
+        return {metric: histogram.snapshot() for metric, histogram in list(self.histograms.items())}
+
+    def log_stats(self, stats: Optional[dict] = None):
         """Log current performance statistics."""
-        stats = self.get_stats()
+        stats = stats or self.get_stats()
         logger.info("Database Performance Stats:")
-        logger.info(f"  Connections: {stats['connections']['count']} total, "
-                   f"{stats['connections']['avg_time']:.3f}s avg, "
-                   f"{stats['connections']['min_time']:.3f}s min, "
-                   f"{stats['connections']['max_time']:.3f}s max")
-        logger.info(f"  Queries: {stats['queries']['count']} total, "
-                   f"{stats['queries']['avg_time']:.3f}s avg, "
-                   f"{stats['queries']['min_time']:.3f}s min, "
-                   f"{stats['queries']['max_time']:.3f}s max")
+        for metric in ("connections", "queries"):
+            window = stats[metric]["windows"][WINDOWS[0][0]]
+            logger.info(f"  {metric.title()}: {stats[metric]['count']} total, "
+                       f"{stats[metric]['avg_time']:.3f}s avg, "
+                       f"{stats[metric]['min_time']:.3f}s min, "
+                       f"{stats[metric]['max_time']:.3f}s max, "
+                       f"last {WINDOWS[0][0]}: p50 {window['p50']:.3f}s, "
+                       f"p99 {window['p99']:.3f}s")
 
 # Global performance monitor instance
 performance_monitor = PerformanceMonitor()
@@ -76,41 +336,74 @@ performance_monitor = PerformanceMonitor()
 @contextmanager
 def time_operation(operation_type: str):
     """Context manager to time database operations."""
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
         yield
     finally:
-        duration = time.time() - start_time
+        duration = time.perf_counter() - start_time
         if operation_type == "connection":
             performance_monitor.record_connection_time(duration)
         elif operation_type == "query":
             performance_monitor.record_query_time(duration)
-        
+
         logger.debug(f"{operation_type.title()} took {duration:.3f}s")
 
+@contextmanager
+def time_phase(phase: str):
+    """Context manager adding the enclosed time to a phase of the current request."""
+    context = get_request_context()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        if context is not None:
+            context.add_phase(phase, time.perf_counter() - start_time)
+
+def phase_timer(phase: str):
+    """Decorator attributing a function's time to a phase of the current request."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            with time_phase(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
 def monitor_performance(operation_type: str = "query"):
     """Decorator to monitor function performance."""
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            start_time = time.time()
+            start_time = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
                 return result
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 if operation_type == "connection":
                     performance_monitor.record_connection_time(duration)
                 elif operation_type == "query":
                     performance_monitor.record_query_time(duration)
-                
+
                 logger.debug(f"{func.__name__} ({operation_type}) took {duration:.3f}s")
-        
+
         return wrapper
     return decorator
 
 def query_timer(func: Callable) -> Callable:
-    """Simple decorator to time database query functions."""
+    """Simple decorator to time database query functions, sync or async."""
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start_time
+                logger.info(f"Query {func.__name__} took {duration:.3f}s")
+                performance_monitor.record_query_time(duration)
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.perf_counter()
@@ -129,4 +422,4 @@ def get_performance_stats() -> dict:
 
 def log_performance_stats():
     """Log current performance statistics."""
-    performance_monitor.log_stats() 
\ No newline at end of file
+    performance_monitor.log_stats()
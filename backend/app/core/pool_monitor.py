@@ -0,0 +1,165 @@
+"""
+Connection pool telemetry.
+
+Records how long callers wait to check a connection out of the pool, how long
+connections are held, timeouts, invalidations, liveness pings of idle
+connections and the dead ones they found, and new connections, all over the same sliding windows as the
+performance monitor. Current checked-out / overflow counts are read from the
+pool when stats are requested.
+"""
+
+import time
+import logging
+from typing import Dict, List
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.request_context import get_request_context
+from app.core.performance_monitor import (
+    WindowedCounter, WindowedHistogram,
+    merge_counter_snapshots, merge_histogram_snapshots
+)
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("checkouts", "connects", "timeouts", "invalidations", "soft_invalidations",
+            "pings", "ping_failures")
+GAUGES = ("pool_size", "checked_out", "checked_in", "overflow")
+
+
+class PoolMonitor:
+    """Telemetry for one engine's connection pool."""
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.counters: Dict[str, WindowedCounter] = {counter: WindowedCounter() for counter in COUNTERS}
+        self.checkout_wait = WindowedHistogram()
+        self.hold_time = WindowedHistogram()
+
+    def gauges(self) -> dict:
+        pool = self.engine.pool
+        if not isinstance(pool, QueuePool):
+            return {gauge: 0 for gauge in GAUGES}
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # QueuePool counts overflow from -pool_size; only connections beyond the pool matter
+            "overflow": max(0, pool.overflow()),
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "gauges": self.gauges(),
+            "counters": {name: counter.snapshot() for name, counter in self.counters.items()},
+            "checkout_wait": self.checkout_wait.snapshot(),
+            "hold_time": self.hold_time.snapshot(),
+        }
+
+
+class InstrumentedPoolMixin:
+    """Times pool checkouts (waiting for a slot, connecting and liveness pings) and counts timeouts."""
+
+    monitor = None
+
+    def connect(self):
+        start_time = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            if self.monitor is not None:
+                self.monitor.counters["timeouts"].increment()
+            raise
+        finally:
+            duration = time.perf_counter() - start_time
+            if self.monitor is not None:
+                self.monitor.checkout_wait.record(duration)
+            context = get_request_context()
+            if context is not None:
+                context.add_phase("pool", duration)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    """QueuePool reporting to a PoolMonitor."""
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool (used by asyncio engines) reporting to a PoolMonitor."""
+
+
+# Pool monitors by engine name
+pool_monitors: Dict[str, PoolMonitor] = {}
+
+
+def install_pool_monitor(engine, name: str = "primary") -> PoolMonitor:
+    """
+    Attach pool telemetry to an engine created with an instrumented poolclass.
+    For asyncio engines pass engine.sync_engine.
+    """
+    monitor = PoolMonitor(name, engine)
+    pool_monitors[name] = monitor
+    if isinstance(engine.pool, InstrumentedPoolMixin):
+        engine.pool.monitor = monitor
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        monitor.counters["connects"].increment()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        monitor.counters["checkouts"].increment()
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            monitor.hold_time.record(time.perf_counter() - checked_out_at)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        monitor.counters["invalidations"].increment()
+        # A failed liveness ping (or pool_pre_ping) invalidates with a DisconnectionError
+        if isinstance(exception, exc.DisconnectionError):
+            monitor.counters["ping_failures"].increment()
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        monitor.counters["soft_invalidations"].increment()
+
+    return monitor
+
+
+def pool_snapshot() -> dict:
+    """Snapshots of every monitored pool, keyed by engine name."""
+    return {name: monitor.snapshot() for name, monitor in list(pool_monitors.items())}
+
+
+def merge_pool_snapshots(snapshots: List[dict]) -> dict:
+    """Combine pool snapshots (e.g. from several workers); gauges are summed."""
+    grouped: Dict[str, List[dict]] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            grouped.setdefault(name, []).append(data)
+
+    merged = {}
+    for name, datas in grouped.items():
+        merged[name] = {
+            **{gauge: sum(data["gauges"][gauge] for data in datas) for gauge in GAUGES},
+            "counters": {
+                # Snapshots from workers of an older release may lack newer counters
+                counter: merge_counter_snapshots([data["counters"][counter] for data in datas
+                                                  if counter in data["counters"]])
+                for counter in COUNTERS
+            },
+            "checkout_wait": merge_histogram_snapshots([data["checkout_wait"] for data in datas]),
+            "hold_time": merge_histogram_snapshots([data["hold_time"] for data in datas]),
+        }
+    return merged
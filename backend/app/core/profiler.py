@@ -0,0 +1,294 @@
+"""
+On-demand sampling profiler for single requests.
+
+A request carrying the header ``X-Profile: <PROFILING_TOKEN>`` is served
+while a background thread samples the stacks of every busy thread of the
+worker (the event loop plus the threadpool running sync endpoints) every
+PROFILING_INTERVAL seconds. Samples are aggregated into collapsed stacks
+(the input format of flamegraph.pl and speedscope) and broken down by where
+the time went: the pg8000 driver, ORM hydration, SQLAlchemy core, pydantic /
+JSON serialization or application code.
+
+Profiles are written to the shared stats directory and pruned to the newest
+PROFILING_MAX_PROFILES, so whichever worker answers /performance/profiles can
+serve a profile captured by another one.
+
+Samples are taken per worker, not per request: other requests served
+concurrently by the same worker show up in the profile too. Each profile
+records how many were in flight so a polluted profile can be recognised.
+"""
+
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.request_context import UNMATCHED_ROUTE
+from app.core.request_metrics import request_metrics
+from app.core.shared_stats import stats_directory
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Directory holding the app package (WORKDIR of the image), stripped from frame labels
+SOURCE_ROOT = Path(__file__).parents[2].as_posix() + "/"
+
+# Checked in order against the whole stack; the first category with a matching frame wins
+CATEGORIES = (
+    ("driver", ("/pg8000/", "/asyncpg/", "/psycopg/", "/psycopg2/")),
+    ("orm", ("/sqlalchemy/orm/",)),
+    ("sqlalchemy", ("/sqlalchemy/",)),
+    ("serialization", ("/pydantic/", "/fastapi/encoders.py", "/fastapi/_compat.py", "/starlette/responses.py")),
+    ("app", (f"{SOURCE_ROOT}app/",)),
+)
+
+# Innermost frames of threads that are parked rather than working
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("selectors.py", "poll"),
+}
+
+_frame_labels: dict = {}
+
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        filename = code.co_filename.replace("\\", "/")
+        if filename.startswith(SOURCE_ROOT):
+            filename = filename[len(SOURCE_ROOT):]
+        elif "/site-packages/" in filename:
+            filename = filename.split("/site-packages/", 1)[1]
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        _frame_labels[code] = label
+    return label
+
+
+def classify(filenames: List[str]) -> str:
+    """Category of a sample from the filenames of its frames."""
+    for category, markers in CATEGORIES:
+        for filename in filenames:
+            if any(marker in filename for marker in markers):
+                return category
+    return "other"
+
+
+class RequestProfiler:
+    """Samples every busy thread of this process until stopped."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.samples = 0
+        self.max_in_flight = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling; join waits for a sample in progress."""
+        self._stop.set()
+
+    def join(self):
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        own_thread = threading.get_ident()
+        self.max_in_flight = max(self.max_in_flight, request_metrics.in_flight)
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes.reverse()
+            self.stacks[";".join(_frame_label(code) for code in codes)] += 1
+            self.categories[classify([code.co_filename.replace("\\", "/") for code in codes])] += 1
+            self.samples += 1
+
+
+class ProfileStore:
+    """Bounded ring of captured profiles, one JSON file each."""
+
+    def directory(self) -> str:
+        return os.path.join(stats_directory(), "profiles")
+
+    def _paths(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory())
+        except FileNotFoundError:
+            return []
+        paths = [os.path.join(self.directory(), name) for name in names if name.endswith(".json")]
+        return sorted(paths, key=_mtime, reverse=True)
+
+    def save(self, profile: dict):
+        os.makedirs(self.directory(), exist_ok=True)
+        path = os.path.join(self.directory(), f"{profile['id']}.json")
+        # Write then rename so readers never see a partial file
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(profile, f)
+        os.replace(f"{path}.tmp", path)
+        for stale in self._paths()[settings.PROFILING_MAX_PROFILES:]:
+            try:
+                os.unlink(stale)
+            except OSError:
+                pass
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory(), f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self) -> List[dict]:
+        """Profile metadata, newest first."""
+        profiles = []
+        for path in self._paths():
+            try:
+                with open(path) as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                continue
+            profile.pop("stacks", None)
+            profiles.append(profile)
+        return profiles
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+# Global profile store
+profile_store = ProfileStore()
+
+
+def collapsed_stacks(profile: dict) -> str:
+    """Profile stacks in the collapsed ("folded") format, heaviest first."""
+    stacks = sorted(profile["stacks"].items(), key=lambda item: item[1], reverse=True)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+
+def profiling_authorized(token: Optional[str]) -> bool:
+    return bool(settings.PROFILING_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode(), settings.PROFILING_TOKEN.encode()
+    )
+
+
+def require_profiling_token(x_profile: Optional[str] = Header(None)):
+    """Dependency guarding the profile endpoints with the same header as profiled requests."""
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    if not profiling_authorized(x_profile):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running authorized requests under the sampling profiler."""
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self._active = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.PROFILING_TOKEN:
+            await self.app(scope, receive, send)
+            return
+        token = dict(scope["headers"]).get(PROFILE_HEADER)
+        if token is None or not profiling_authorized(token.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+        # One profile at a time: concurrent profilers would sample each other's requests
+        if not self._active.acquire(blocking=False):
+            logger.warning(f"Profile of {scope.get('path')} skipped, another request is being profiled")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        profiler = RequestProfiler(settings.PROFILING_INTERVAL)
+        started_at = time.time()
+        start_time = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start_time
+            profiler.stop()
+            try:
+                # Joining the sampler and writing the profile block: both run off the event loop
+                await run_in_threadpool(profiler.join)
+            finally:
+                self._active.release()
+            route = scope.get("route")
+            await run_in_threadpool(self._save, profile_id, {
+                "id": profile_id,
+                "pid": os.getpid(),
+                "captured_at": started_at,
+                "method": scope.get("method", ""),
+                "path": scope.get("path", ""),
+                "route": getattr(route, "path_format", None) or UNMATCHED_ROUTE,
+                "status_code": status_code,
+                "duration": duration,
+                "interval": profiler.interval,
+                "samples": profiler.samples,
+                "concurrent_requests": max(0, profiler.max_in_flight - 1),
+                "categories": {
+                    category: {
+                        "samples": count,
+                        "share": round(count / profiler.samples, 4),
+                    }
+                    for category, count in profiler.categories.most_common()
+                },
+                "stacks": dict(profiler.stacks),
+            })
+
+    def _save(self, profile_id: str, profile: dict):
+        try:
+            self.store.save(profile)
+            logger.info(f"Captured profile {profile_id} of {profile['method']} {profile['path']}: "
+                        f"{profile['samples']} samples in {profile['duration']:.3f}s")
+        except OSError as e:
+            logger.warning(f"Failed to store profile {profile_id}: {e}")
@@ -0,0 +1,94 @@
+"""
+Per-request SQL query budgets and N+1 detection.
+
+Every statement executed while serving a request is counted on its
+RequestContext, both in total and per fingerprint. A request that runs more
+statements than its route's budget, or repeats one fingerprint more than
+QUERY_BUDGET_REPEAT_LIMIT times (the usual shape of an N+1 lazy load), is
+reported with a structured warning. With QUERY_BUDGET_MODE=raise the
+offending statement fails instead, so tests and local runs catch regressions.
+"""
+
+import json
+import logging
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.request_context import RequestContext, get_request_context
+from app.core.sql_monitor import fingerprint
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_WARN = "warn"
+MODE_RAISE = "raise"
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in raise mode when a request goes over its query budget."""
+
+
+def route_budget(context: RequestContext) -> int:
+    """Statement budget for the request's route."""
+    return settings.QUERY_BUDGETS.get(context.route, settings.QUERY_BUDGET_DEFAULT)
+
+
+def record_statement(statement: str):
+    """Count a statement against the current request's budget."""
+    if settings.QUERY_BUDGET_MODE == MODE_OFF:
+        return
+    context = get_request_context()
+    if context is None:
+        return
+
+    key = fingerprint(statement)
+    context.statements += 1
+    context.fingerprints[key] += 1
+
+    if settings.QUERY_BUDGET_MODE != MODE_RAISE:
+        return
+    budget = route_budget(context)
+    if context.statements > budget:
+        raise QueryBudgetExceeded(
+            f"{context.method} {context.route} ran {context.statements} statements, budget is {budget}"
+        )
+    if context.fingerprints[key] > settings.QUERY_BUDGET_REPEAT_LIMIT:
+        raise QueryBudgetExceeded(
+            f"{context.method} {context.route} repeated a statement {context.fingerprints[key]} times "
+            f"(limit {settings.QUERY_BUDGET_REPEAT_LIMIT}), likely an N+1 query: {key}"
+        )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record_statement(statement)
+
+
+def install_query_budget(engine):
+    """Count an engine's statements against request budgets."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def report_query_budget(context: RequestContext):
+    """Log a structured warning if the finished request went over its budget."""
+    if settings.QUERY_BUDGET_MODE == MODE_OFF or not context.statements:
+        return
+
+    budget = route_budget(context)
+    repeated = [
+        {"fingerprint": key, "count": count}
+        for key, count in context.fingerprints.most_common()
+        if count > settings.QUERY_BUDGET_REPEAT_LIMIT
+    ]
+    if context.statements <= budget and not repeated:
+        return
+
+    logger.warning(json.dumps({
+        "event": "query_budget_exceeded",
+        "method": context.method,
+        "route": context.route,
+        "statements": context.statements,
+        "budget": budget,
+        "repeat_limit": settings.QUERY_BUDGET_REPEAT_LIMIT,
+        "repeated": repeated,
+    }))
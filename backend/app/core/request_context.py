@@ -0,0 +1,64 @@
+"""
+Per-request state shared by the instrumentation layers.
+
+The request metrics middleware opens a RequestContext for every HTTP request
+and stores it in a context variable. Context variables are copied into the
+threadpool that runs sync endpoints, so database event hooks see the same
+(mutable) context object as the middleware.
+"""
+
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Label used for requests that did not match any route, to keep cardinality bounded
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestContext:
+    """Mutable per-request bookkeeping."""
+
+    __slots__ = ("scope", "statements", "fingerprints", "phases", "queries", "read_primary", "sessions")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.fingerprints: Counter = Counter()
+        # Seconds spent per phase (db, pool, orm, serialize, gcs), reported in Server-Timing
+        self.phases: Dict[str, float] = defaultdict(float)
+        # (statement, seconds) of executed SQL, kept for the slow-request log
+        self.queries: List[Tuple[str, float]] = []
+        # Set when the request must read its own writes from the primary
+        self.read_primary = False
+        # Database sessions opened by get_db / get_async_db, released when the endpoint returns
+        self.sessions: list = []
+
+    @property
+    def method(self) -> str:
+        return self.scope.get("method", "")
+
+    @property
+    def route(self) -> str:
+        """Route template, available once the router has matched the request."""
+        route = self.scope.get("route")
+        return getattr(route, "path_format", None) or UNMATCHED_ROUTE
+
+    def add_phase(self, phase: str, duration: float):
+        self.phases[phase] += duration
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """Context of the request being served, or None outside a request."""
+    return _request_context.get()
+
+
+def set_request_context(context: Optional[RequestContext]):
+    """Install a request context; returns a token for reset_request_context."""
+    return _request_context.set(context)
+
+
+def reset_request_context(token):
+    _request_context.reset(token)
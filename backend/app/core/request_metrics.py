@@ -0,0 +1,202 @@
+"""
+Per-route HTTP request metrics.
+
+A pure ASGI middleware records request count, error count, in-flight requests
+and a latency histogram for every route, labelled by the route template
+(e.g. /api/v1/subdatasets/{subdataset_id}) rather than the raw path. The
+metrics are rendered in the Prometheus text exposition format.
+"""
+
+import time
+import logging
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from app.core.performance_monitor import performance_monitor
+from app.core.request_context import RequestContext, set_request_context, reset_request_context
+from app.core.query_budget import report_query_budget
+from app.core.request_timing import server_timing, report_slow_request
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the exported latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RouteMetrics:
+    """Counters and latency histogram for one (method, route) pair."""
+
+    __slots__ = ("count", "errors", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        # One slot per LATENCY_BUCKETS bound plus the +Inf overflow slot
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, duration: float, error: bool):
+        self.count += 1
+        self.total += duration
+        self.buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        if error:
+            self.errors += 1
+
+
+class RequestMetrics:
+    """Registry of per-route request metrics for this process."""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+
+    def record(self, method: str, route: str, duration: float, status_code: int):
+        key = (method, route)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes.setdefault(key, RouteMetrics())
+        metrics.record(duration, status_code >= 500)
+        performance_monitor.record("requests", duration)
+
+    def snapshot(self) -> dict:
+        """Plain-JSON copy of the counters, used to share them between workers."""
+        return {
+            "in_flight": self.in_flight,
+            "routes": [
+                [method, route, metrics.count, metrics.errors, metrics.total, list(metrics.buckets)]
+                for (method, route), metrics in list(self.routes.items())
+            ],
+        }
+
+    def merge_snapshot(self, snapshot: dict):
+        """Add another worker's counters into this registry."""
+        self.in_flight += snapshot["in_flight"]
+        for method, route, count, errors, total, buckets in snapshot["routes"]:
+            metrics = self.routes.setdefault((method, route), RouteMetrics())
+            metrics.count += count
+            metrics.errors += errors
+            metrics.total += total
+            metrics.buckets = [a + b for a, b in zip(metrics.buckets, buckets)]
+
+    def get_stats(self) -> dict:
+        """Per-route summary for the /performance endpoint."""
+        return {
+            "in_flight": self.in_flight,
+            "routes": [
+                {
+                    "method": method,
+                    "route": route,
+                    "count": metrics.count,
+                    "errors": metrics.errors,
+                    "avg_time": metrics.total / metrics.count if metrics.count else 0,
+                }
+                for (method, route), metrics in sorted(list(self.routes.items()), key=lambda item: item[0][1])
+            ],
+        }
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        routes = sorted(list(self.routes.items()), key=lambda item: (item[0][1], item[0][0]))
+        lines: List[str] = [
+            "# HELP http_requests_total Total HTTP requests by route.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), metrics in routes:
+            lines.append(f"http_requests_total{{{_labels(method, route)}}} {metrics.count}")
+
+        lines += [
+            "# HELP http_request_errors_total HTTP requests that failed with a 5xx status or an exception.",
+            "# TYPE http_request_errors_total counter",
+        ]
+        for (method, route), metrics in routes:
+            lines.append(f"http_request_errors_total{{{_labels(method, route)}}} {metrics.errors}")
+
+        lines += [
+            "# HELP http_requests_in_flight HTTP requests currently being served by this worker.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds HTTP request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), metrics in routes:
+            labels = _labels(method, route)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {metrics.total}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {metrics.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(method: str, route: str) -> str:
+    return f'method="{_escape(method)}",route="{_escape(route)}"'
+
+
+# Global request metrics instance
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request.
+
+    It also opens the request's RequestContext, which the database hooks use
+    to count statements against the route's query budget and to time request
+    phases, and adds the phases to the response as a Server-Timing header.
+
+    The route template is read from the scope after the router has matched
+    it, so in-flight requests are only tracked per worker, not per route.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        context = RequestContext(scope)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timing = server_timing(context, time.perf_counter() - start_time)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        token = set_request_context(context)
+        self.metrics.in_flight += 1
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status_code = 500
+            raise
+        finally:
+            duration = time.perf_counter() - start_time
+            self.metrics.in_flight -= 1
+            self.metrics.record(context.method, context.route, duration, status_code)
+            report_query_budget(context)
+            report_slow_request(context, duration, status_code)
+            reset_request_context(token)
+
+
+def get_request_stats() -> dict:
+    """Get current per-route request statistics."""
+    return request_metrics.get_stats()
+
+
+def render_metrics() -> str:
+    """Render request metrics in the Prometheus text format."""
+    return request_metrics.render()
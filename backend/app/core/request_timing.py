@@ -0,0 +1,146 @@
+"""
+Per-request phase timing.
+
+Wall time of a request is split into phases recorded on its RequestContext:
+
+- db: time in cursor execution (recorded by the SQL monitor hooks)
+- pool: checking connections out of the pool, including connecting
+- gcs: Cloud Storage calls (GCSService methods use phase_timer)
+- orm: the endpoint function minus db, pool and gcs, i.e. building queries,
+  hydrating ORM objects and the endpoint's own code
+- serialize: the rest of the route handler minus db, pool and gcs, i.e. request
+  validation, response model validation and JSON encoding
+
+The phases are returned in a Server-Timing header, and requests slower than
+SLOW_REQUEST_THRESHOLD are logged with every SQL statement they executed.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from functools import wraps
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+from app.core.request_context import RequestContext, get_request_context
+from app.db.request_session import release_sessions, release_sessions_async
+
+logger = logging.getLogger(__name__)
+
+# Phases timed by hooks below the endpoint, excluded from the orm and serialize phases
+EXTERNAL_PHASES = ("db", "pool", "gcs")
+
+PHASE_DESCRIPTIONS = {
+    "db": "Database",
+    "pool": "Connection checkout",
+    "orm": "ORM hydration and endpoint code",
+    "serialize": "Validation and serialization",
+    "gcs": "Cloud Storage",
+}
+
+
+def _phase_marks(context: Optional[RequestContext]) -> tuple:
+    if context is None:
+        return 0.0, 0.0, 0.0
+    external = sum(context.phases.get(phase, 0.0) for phase in EXTERNAL_PHASES)
+    return time.perf_counter(), external, context.phases.get("orm", 0.0)
+
+
+def _add_exclusive_phase(context: Optional[RequestContext], phase: str, marks: tuple):
+    """Record time since marks in phase, minus external and orm time recorded meanwhile."""
+    if context is None:
+        return
+    start_time, external, orm = marks
+    _, external_now, orm_now = _phase_marks(context)
+    elapsed = time.perf_counter() - start_time
+    context.add_phase(phase, max(0.0, elapsed - (external_now - external) - (orm_now - orm)))
+
+
+def _timed_endpoint(call: Callable) -> Callable:
+    """Wrap an endpoint to time the orm phase and release its DB sessions once it returns."""
+    if asyncio.iscoroutinefunction(call):
+        @wraps(call)
+        async def timed_call(*args, **kwargs):
+            context = get_request_context()
+            marks = _phase_marks(context)
+            failed = True
+            try:
+                result = await call(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                await release_sessions_async(context, failed)
+                _add_exclusive_phase(context, "orm", marks)
+    else:
+        @wraps(call)
+        def timed_call(*args, **kwargs):
+            context = get_request_context()
+            marks = _phase_marks(context)
+            failed = True
+            try:
+                result = call(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                release_sessions(context, failed)
+                _add_exclusive_phase(context, "orm", marks)
+    return timed_call
+
+
+class TimedRoute(APIRoute):
+    """APIRoute recording the orm and serialize phases of the current request and releasing its DB sessions early."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The handler built in __init__ looks the endpoint up on the dependant for every request
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            context = get_request_context()
+            marks = _phase_marks(context)
+            try:
+                return await handler(request)
+            finally:
+                _add_exclusive_phase(context, "serialize", marks)
+
+        return timed_handler
+
+
+def server_timing(context: RequestContext, total: float) -> str:
+    """Server-Timing header value for the phases recorded so far."""
+    entries = [
+        f'{phase};dur={context.phases[phase] * 1000:.1f};desc="{description}"'
+        for phase, description in PHASE_DESCRIPTIONS.items()
+        if phase in context.phases
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def report_slow_request(context: RequestContext, duration: float, status_code: int):
+    """Log one structured record with the executed SQL if the request was slow."""
+    threshold = settings.SLOW_REQUEST_THRESHOLD
+    if threshold <= 0 or duration < threshold:
+        return
+
+    logger.warning(json.dumps({
+        "event": "slow_request",
+        "method": context.method,
+        "route": context.route,
+        "path": context.scope.get("path", ""),
+        "status_code": status_code,
+        "duration_ms": round(duration * 1000, 1),
+        "threshold_ms": round(threshold * 1000, 1),
+        "phases_ms": {phase: round(seconds * 1000, 1) for phase, seconds in context.phases.items()},
+        "queries": [
+            {"statement": statement, "duration_ms": round(seconds * 1000, 2)}
+            for statement, seconds in context.queries
+        ],
+        "queries_truncated": len(context.queries) >= settings.SLOW_REQUEST_MAX_STATEMENTS,
+    }))
@@ -0,0 +1,133 @@
+"""
+Versioned in-process cache of rendered response bodies.
+
+Entries are keyed by a row id and hold the body rendered at a version of
+that row, e.g. the task detail document at tasks.version. Writers never
+touch the cache: triggers bump the version in the database (see alembic
+0004), a reader finding a different version misses and replaces the entry,
+so every worker and replica converges without cross-process messages.
+
+Each worker keeps at most max_bytes of bodies and evicts the least recently
+used ones first. Hits, misses and evictions are published with the other
+per-worker stats (app.core.shared_stats).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+from app.core.config import settings
+
+COUNTERS = ("hits", "misses", "evictions")
+GAUGES = ("entries", "bytes", "max_bytes")
+
+
+class ResponseCache:
+    """LRU of (version, body) by key, bounded by the total size of the bodies."""
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.size = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        # Sync endpoints run in the threadpool
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version) -> Optional[bytes]:
+        """The body cached for key at exactly this version, else None (a miss)."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version, body: bytes):
+        """Cache body for key at version, replacing any other version of it."""
+        with self._lock:
+            self._remove(key)
+            if len(body) > self.max_bytes:
+                # Would evict everything else and still not fit
+                return
+            self.entries[key] = (version, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.counters["evictions"] += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Response caches by name
+response_caches: Dict[str, ResponseCache] = {}
+
+
+def register_response_cache(name: str, max_bytes: int) -> ResponseCache:
+    cache = ResponseCache(name, max_bytes)
+    response_caches[name] = cache
+    return cache
+
+
+def cache_snapshot() -> dict:
+    """Snapshots of every response cache, keyed by name."""
+    return {name: cache.snapshot() for name, cache in list(response_caches.items())}
+
+
+def merge_cache_snapshots(snapshots: List[dict]) -> dict:
+    """Combine cache snapshots (e.g. from several workers); counters and gauges are summed."""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            totals = merged.setdefault(name, dict.fromkeys(COUNTERS + GAUGES, 0))
+            for field in COUNTERS + GAUGES:
+                totals[field] += data.get(field, 0)
+    for totals in merged.values():
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_ratio"] = round(totals["hits"] / lookups, 4) if lookups else None
+    return merged
+
+
+def render_cache_metrics(merged: dict) -> str:
+    """Prometheus text exposition of merged cache snapshots."""
+    lines: List[str] = []
+    for field, kind, help_text in (
+        ("hits", "counter", "Response cache lookups answered from the cache."),
+        ("misses", "counter", "Response cache lookups that rendered the response."),
+        ("evictions", "counter", "Response cache entries evicted to stay within max_bytes."),
+        ("entries", "gauge", "Responses currently cached."),
+        ("bytes", "gauge", "Size of the currently cached response bodies."),
+    ):
+        metric = f"response_cache_{field}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, totals in sorted(merged.items()):
+            lines.append(f'{metric}{{cache="{name}"}} {totals[field]}')
+    return "\n".join(lines) + "\n"
+
+
+# GET /tasks/{id}/detail documents, keyed by task id at tasks.version
+task_detail_cache = register_response_cache("task_detail", settings.TASK_DETAIL_CACHE_BYTES)
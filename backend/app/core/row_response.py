@@ -0,0 +1,26 @@
+"""
+JSON responses for rows mapped to dicts (app.crud.rows).
+
+A route returning a Response skips FastAPI's response_model validation and
+serialization. to_jsonable_python encodes datetimes and nested models with
+the same pydantic serializers the response model uses, and JSONResponse is
+FastAPI's default response class, so the body is byte for byte what the
+route returned before. Headers set on the route's injected Response (the
+cursor, the ETag, cookies) are carried over as raw headers, so repeated
+ones like set-cookie are all kept; FastAPI only merges them into responses
+it builds itself.
+"""
+
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic_core import to_jsonable_python
+
+
+def row_response(response: Response, content: Any) -> JSONResponse:
+    rendered = JSONResponse(to_jsonable_python(content))
+    rendered.raw_headers.extend(
+        (name, value) for name, value in response.raw_headers if name != b"content-length"
+    )
+    return rendered
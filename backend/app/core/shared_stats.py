@@ -0,0 +1,263 @@
+"""
+Cross-worker aggregation of performance statistics.
+
+Under gunicorn every worker process has its own monitors, so /performance
+would only describe whichever worker answered. Each worker therefore
+publishes a snapshot of its mergeable state (histogram buckets, route
+counters, statement fingerprints) into a memory-mapped file it alone writes
+to. Any worker can read every live worker's file and merge them.
+
+Files are updated with a seqlock: the writer bumps a sequence number to an
+odd value, writes the payload and bumps it back to even; readers retry when
+the sequence is odd or changed while copying. No locks are shared between
+processes.
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import logging
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.performance_monitor import performance_monitor, merge_snapshots
+from app.core.request_metrics import RequestMetrics, request_metrics
+from app.core.sql_monitor import SQLMonitor, sql_monitor
+from app.core.pool_monitor import pool_snapshot, merge_pool_snapshots
+from app.core.response_cache import cache_snapshot, merge_cache_snapshots, render_cache_metrics
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MHPERF01"
+# magic, sequence, pid, published_at, payload length
+HEADER = struct.Struct("<8sQqdI")
+SEQUENCE_OFFSET = 8
+READ_RETRIES = 5
+
+
+def stats_directory() -> str:
+    return settings.PERF_SHARED_DIR or os.path.join(tempfile.gettempdir(), "mimic-hub-perf")
+
+
+def worker_path(pid: int) -> str:
+    return os.path.join(stats_directory(), f"worker-{pid}.stats")
+
+
+class StatsRegion:
+    """Single-writer memory-mapped region holding one worker's snapshot."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.sequence = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def write(self, payload: bytes) -> bool:
+        if HEADER.size + len(payload) > self.size:
+            logger.warning(f"Performance snapshot of {len(payload)} bytes does not fit in {self.path}")
+            return False
+        # Odd sequence marks the region as being written
+        self.sequence += 1
+        struct.pack_into("<Q", self.map, SEQUENCE_OFFSET, self.sequence)
+        self.map[HEADER.size:HEADER.size + len(payload)] = payload
+        self.sequence += 1
+        HEADER.pack_into(self.map, 0, MAGIC, self.sequence, os.getpid(), time.time(), len(payload))
+        return True
+
+    def close(self, remove: bool = True):
+        self.map.close()
+        if remove:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def read_region(path: str) -> Optional[tuple]:
+    """Consistent (pid, published_at, payload) from a worker file, or None."""
+    try:
+        with open(path, "rb") as f:
+            region = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        for _ in range(READ_RETRIES):
+            magic, sequence, pid, published_at, length = HEADER.unpack_from(region, 0)
+            if magic != MAGIC:
+                return None
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            payload = region[HEADER.size:HEADER.size + length]
+            if struct.unpack_from("<Q", region, SEQUENCE_OFFSET)[0] == sequence:
+                return pid, published_at, payload
+        return None
+    finally:
+        region.close()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def local_snapshot() -> dict:
+    """This worker's current mergeable state."""
+    return {
+        "pid": os.getpid(),
+        "performance": performance_monitor.snapshot(),
+        "requests": request_metrics.snapshot(),
+        "statements": sql_monitor.snapshot(),
+        "pools": pool_snapshot(),
+        "caches": cache_snapshot(),
+    }
+
+
+class SharedStatsPublisher:
+    """Background thread publishing this worker's snapshot every PERF_PUBLISH_INTERVAL seconds."""
+
+    def __init__(self):
+        self.region: Optional[StatsRegion] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        try:
+            self.region = StatsRegion(worker_path(os.getpid()), settings.PERF_SHARED_REGION_SIZE)
+        except OSError as e:
+            logger.warning(f"Cross-worker performance stats disabled: {e}")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="perf-stats-publisher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(settings.PERF_PUBLISH_INTERVAL):
+            self.publish()
+
+    def publish(self):
+        if self.region is None:
+            return
+        try:
+            self.region.write(json.dumps(local_snapshot(), separators=(",", ":")).encode())
+        except Exception as e:
+            logger.warning(f"Failed to publish performance snapshot: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        if self.region is not None:
+            self.region.close()
+            self.region = None
+
+# Global publisher, started per worker on application startup
+shared_stats_publisher = SharedStatsPublisher()
+
+
+def collect_snapshots() -> List[dict]:
+    """Fresh snapshot of this worker plus the last published snapshot of every other live worker."""
+    own_pid = os.getpid()
+    snapshots = [local_snapshot()]
+    directory = stats_directory()
+    max_age = max(30.0, settings.PERF_PUBLISH_INTERVAL * 10)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return snapshots
+
+    for name in names:
+        if not (name.startswith("worker-") and name.endswith(".stats")):
+            continue
+        path = os.path.join(directory, name)
+        region = read_region(path)
+        if region is None:
+            continue
+        pid, published_at, payload = region
+        if pid == own_pid:
+            continue
+        if not _process_alive(pid):
+            # Leftover from a worker that exited without cleaning up
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        if time.time() - published_at > max_age:
+            continue
+        try:
+            snapshots.append(json.loads(payload))
+        except ValueError:
+            continue
+    return snapshots
+
+
+def get_instance_stats() -> dict:
+    """Performance, request, statement and pool stats merged across all workers of this instance."""
+    snapshots = collect_snapshots()
+    requests = RequestMetrics()
+    statements = SQLMonitor()
+    for snapshot in snapshots:
+        requests.merge_snapshot(snapshot["requests"])
+        statements.merge_snapshot(snapshot["statements"])
+    return {
+        "workers": sorted(snapshot["pid"] for snapshot in snapshots),
+        "performance": merge_snapshots([snapshot["performance"] for snapshot in snapshots]),
+        "requests": requests.get_stats(),
+        "slow_queries": statements.get_stats(),
+        "pools": merge_pool_snapshots([snapshot.get("pools", {}) for snapshot in snapshots]),
+        "caches": merge_cache_snapshots([snapshot.get("caches", {}) for snapshot in snapshots]),
+    }
+
+
+# (monotonic time, stats) of the last get_health_stats aggregate
+_health_stats: Optional[Tuple[float, dict]] = None
+_health_stats_lock = threading.Lock()
+
+
+def get_health_stats() -> dict:
+    """
+    Worker pids and performance stats merged across workers, for /health.
+    Health checks poll often and other workers publish only every
+    PERF_PUBLISH_INTERVAL, so the aggregate is reused for that long instead
+    of reading every worker's file on each call.
+    """
+    global _health_stats
+    with _health_stats_lock:
+        if _health_stats is not None and time.monotonic() - _health_stats[0] < settings.PERF_PUBLISH_INTERVAL:
+            return _health_stats[1]
+        snapshots = collect_snapshots()
+        stats = {
+            "workers": sorted(snapshot["pid"] for snapshot in snapshots),
+            "performance": merge_snapshots([snapshot["performance"] for snapshot in snapshots]),
+        }
+        _health_stats = (time.monotonic(), stats)
+        return stats
+
+
+def render_instance_metrics() -> str:
+    """Prometheus text exposition of request and response cache metrics merged across all workers."""
+    snapshots = collect_snapshots()
+    requests = RequestMetrics()
+    for snapshot in snapshots:
+        requests.merge_snapshot(snapshot["requests"])
+    caches = merge_cache_snapshots([snapshot.get("caches", {}) for snapshot in snapshots])
+    return requests.render() + render_cache_metrics(caches)
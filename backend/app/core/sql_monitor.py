@@ -0,0 +1,190 @@
+"""
+Statement-level SQL monitoring.
+
+Hooks the engine's cursor events to time every statement, normalizes the SQL
+into a fingerprint (literals, bind parameters and IN-lists collapsed) and keeps
+a bounded table of the most expensive fingerprints, together with the crud
+function that issued them.
+"""
+
+import re
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.performance_monitor import performance_monitor
+from app.core.request_context import get_request_context
+
+logger = logging.getLogger(__name__)
+
+# Number of fingerprints tracked at once; the cheapest one is evicted when full
+MAX_TRACKED_STATEMENTS = 200
+# Number of fingerprints reported by get_stats
+TOP_N = 20
+# Distinct callers remembered per fingerprint
+MAX_CALLERS = 5
+
+# One pass, so that "--" inside a literal or a quote inside a comment is not misread
+_STRING_OR_COMMENT = re.compile(r"('(?:[^']|'')*')|--[^\n]*|/\*.*?\*/", re.S)
+_BIND = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")
+_NUMBER = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_CAST = re.compile(r"\?::[\w\[\]]+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES = re.compile(r"VALUES\s*\(\?\)(?:\s*,\s*\(\?\))*", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so that executions differing only in literals group together."""
+    sql = _STRING_OR_COMMENT.sub(lambda match: "?" if match.group(1) else " ", statement)
+    sql = _BIND.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _CAST.sub("?", sql)
+    sql = _LIST.sub("(?)", sql)
+    sql = _VALUES.sub("VALUES (?)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def find_caller() -> str:
+    """Name of the innermost crud function (or other app function) on the stack."""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.crud"):
+            return f"{module}.{frame.f_code.co_name}"
+        if fallback is None and module.startswith("app.") and not module.startswith(("app.core", "app.db")):
+            fallback = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "<unknown>"
+
+
+class StatementStats:
+    """Aggregated timings for one statement fingerprint."""
+
+    __slots__ = ("calls", "total", "max", "rows", "callers")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.callers: Counter = Counter()
+
+    def record(self, duration: float, rows: int, caller: str):
+        self.calls += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        if rows > 0:
+            self.rows += rows
+        if caller in self.callers or len(self.callers) < MAX_CALLERS:
+            self.callers[caller] += 1
+
+
+class SQLMonitor:
+    """Bounded top-N table of statement fingerprints."""
+
+    def __init__(self, capacity: int = MAX_TRACKED_STATEMENTS):
+        self.capacity = capacity
+        self.statements: dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float, rows: int, caller: str):
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                if len(self.statements) >= self.capacity:
+                    cheapest = min(self.statements, key=lambda k: self.statements[k].total)
+                    del self.statements[cheapest]
+                stats = self.statements[key] = StatementStats()
+            stats.record(duration, rows, caller)
+        performance_monitor.record("statements", duration)
+
+    def get_stats(self, limit: int = TOP_N) -> list:
+        """Most expensive fingerprints by total time."""
+        with self._lock:
+            ranked = sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+            return [
+                {
+                    "fingerprint": key,
+                    "calls": stats.calls,
+                    "total_time": stats.total,
+                    "mean_time": stats.total / stats.calls,
+                    "max_time": stats.max,
+                    "rows": stats.rows,
+                    "callers": [caller for caller, _ in stats.callers.most_common()],
+                }
+                for key, stats in ranked
+            ]
+
+    def snapshot(self, limit: int = TOP_N * 2) -> list:
+        """Plain-JSON copy of the most expensive fingerprints, used to share them between workers."""
+        with self._lock:
+            ranked = sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+            return [
+                [key, stats.calls, stats.total, stats.max, stats.rows, dict(stats.callers)]
+                for key, stats in ranked
+            ]
+
+    def merge_snapshot(self, snapshot: list):
+        """Add another worker's fingerprints into this table (without evicting)."""
+        with self._lock:
+            for key, calls, total, max_time, rows, callers in snapshot:
+                stats = self.statements.get(key)
+                if stats is None:
+                    stats = self.statements[key] = StatementStats()
+                stats.calls += calls
+                stats.total += total
+                stats.max = max(stats.max, max_time)
+                stats.rows += rows
+                stats.callers.update(callers)
+
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+
+# Global SQL monitor instance
+sql_monitor = SQLMonitor()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, not conn.info: conn.info outlives the
+    # checkout, and after_cursor_execute does not fire for a statement that raises
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_time = getattr(context, "_query_start", None)
+    if start_time is None:
+        return
+    duration = time.perf_counter() - start_time
+    rows = getattr(cursor, "rowcount", -1) if not executemany else -1
+    sql_monitor.record(statement, duration, rows, find_caller())
+
+    request_context = get_request_context()
+    if request_context is not None:
+        request_context.add_phase("db", duration)
+        if len(request_context.queries) < settings.SLOW_REQUEST_MAX_STATEMENTS:
+            request_context.queries.append((statement, duration))
+
+
+def install_sql_monitor(engine):
+    """Attach statement timing to an engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def get_query_stats(limit: Optional[int] = None) -> list:
+    """Get the most expensive statement fingerprints."""
+    return sql_monitor.get_stats(limit or TOP_N)
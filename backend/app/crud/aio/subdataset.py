@@ -0,0 +1,150 @@
+"""
+Async subdataset and raw episode reads, mirroring app.crud.subdataset.
+"""
+
+from typing import List, Optional
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models.subdataset import Subdataset
+from app.models.raw_episode import RawEpisode
+from app.schemas.subdataset import SubdatasetList, SubdatasetListWithStats, RawEpisode as RawEpisodeSchema
+from app.crud.subdataset import (
+    episode_stats_query, attach_episode_stats, attach_episode_window, episode_stats_by_subdataset,
+    filter_subdatasets, subdataset_rows_query, subdataset_row_dict, raw_episode_rows_query
+)
+from app.crud.rows import row_dict
+from app.core.performance_monitor import query_timer
+from app.core.pagination import keyset
+
+async def get_subdataset(
+    db: AsyncSession,
+    subdataset_id: int,
+    episode_limit: Optional[int] = None
+) -> Optional[Subdataset]:
+    query = select(Subdataset).options(
+        joinedload(Subdataset.embodiment),
+        joinedload(Subdataset.teleop_mode)
+    )
+    if episode_limit is None:
+        query = query.options(selectinload(Subdataset.raw_episodes))
+    subdataset = (await db.execute(query.filter(Subdataset.id == subdataset_id))).scalars().first()
+
+    if subdataset:
+        attach_episode_stats([subdataset], await db.execute(episode_stats_query([subdataset_id])))
+        if episode_limit is not None:
+            raw_episodes = await get_raw_episodes(db, subdataset_id, limit=episode_limit) if episode_limit else []
+            attach_episode_window(subdataset, raw_episodes, episode_limit)
+
+    return subdataset
+
+@query_timer
+async def get_subdatasets(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    task_id: Optional[int] = None,
+    variant_id: Optional[int] = None,
+    after: Optional[tuple] = None,
+    with_stats: bool = False
+) -> List[Subdataset]:
+    query = filter_subdatasets(select(Subdataset), task_id, variant_id)
+
+    query = query.options(
+        joinedload(Subdataset.embodiment),
+        joinedload(Subdataset.teleop_mode)
+    )
+    result = await db.execute(
+        keyset(query, after, Subdataset.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    subdatasets = result.scalars().all()
+
+    if with_stats and subdatasets:
+        # One query for the whole page
+        subdataset_ids = [subdataset.id for subdataset in subdatasets]
+        attach_episode_stats(subdatasets, await db.execute(episode_stats_query(subdataset_ids)))
+    return subdatasets
+
+@query_timer
+async def get_subdataset_rows(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    task_id: Optional[int] = None,
+    variant_id: Optional[int] = None,
+    after: Optional[tuple] = None,
+    with_stats: bool = False
+) -> List[dict]:
+    """
+    get_subdatasets as SubdatasetList (SubdatasetListWithStats with_stats)
+    response dicts, without the ORM (see app.crud.rows).
+    """
+    rows = (await db.execute(subdataset_rows_query(
+        SubdatasetList, skip, limit, after, task_id=task_id, variant_id=variant_id
+    ))).all()
+
+    if not (with_stats and rows):
+        return [subdataset_row_dict(row, SubdatasetList) for row in rows]
+    subdataset_ids = [row.id for row in rows]
+    stats = episode_stats_by_subdataset(subdataset_ids, await db.execute(episode_stats_query(subdataset_ids)))
+    return [subdataset_row_dict(row, SubdatasetListWithStats, episode_stats=stats[row.id]) for row in rows]
+
+async def subdataset_exists(db: AsyncSession, subdataset_id: int) -> bool:
+    return (await db.execute(select(exists().where(Subdataset.id == subdataset_id)))).scalar()
+
+async def get_raw_episode(
+    db: AsyncSession,
+    raw_episode_id: int,
+    subdataset_id: Optional[int] = None
+) -> Optional[RawEpisode]:
+    query = select(RawEpisode).filter(RawEpisode.id == raw_episode_id)
+    if subdataset_id is not None:
+        query = query.filter(RawEpisode.subdataset_id == subdataset_id)
+    return (await db.execute(query)).scalars().first()
+
+async def get_raw_episodes(
+    db: AsyncSession,
+    subdataset_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    label: Optional[str] = None,
+    after: Optional[tuple] = None
+) -> List[RawEpisode]:
+    query = select(RawEpisode).filter(RawEpisode.subdataset_id == subdataset_id)
+
+    if label is not None:
+        query = query.filter(RawEpisode.label == label)
+
+    return (await db.execute(keyset(query, after, RawEpisode.id).offset(skip).limit(limit))).scalars().all()
+
+async def get_all_raw_episodes(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    label: Optional[str] = None,
+    after: Optional[tuple] = None
+) -> List[RawEpisode]:
+    query = select(RawEpisode)
+
+    if label is not None:
+        query = query.filter(RawEpisode.label == label)
+
+    return (await db.execute(keyset(query, after, RawEpisode.id).offset(skip).limit(limit))).scalars().all()
+
+async def get_raw_episode_rows(
+    db: AsyncSession,
+    subdataset_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    label: Optional[str] = None,
+    after: Optional[tuple] = None
+) -> List[dict]:
+    """
+    get_raw_episodes, or get_all_raw_episodes without subdataset_id, as
+    RawEpisode response dicts without the ORM (see app.crud.rows).
+    """
+    rows = await db.execute(raw_episode_rows_query(subdataset_id, skip, limit, label, after))
+    return [row_dict(row, RawEpisodeSchema) for row in rows]
@@ -0,0 +1,11 @@
+"""
+Async table version reads, mirroring app.crud.table_version.
+"""
+
+from typing import Dict, Iterable
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.table_version import table_versions_query
+
+async def get_table_versions(db: AsyncSession, tables: Iterable[str]) -> Dict[str, int]:
+    return {row.table_name: row.version for row in await db.execute(table_versions_query(tables))}
@@ -0,0 +1,148 @@
+"""
+Async task reads for endpoints running on the event loop.
+
+Relationships the response models touch are always eager-loaded: lazy
+loading is not available on an AsyncSession.
+"""
+
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models.task import Task
+from app.models.task_variant import TaskVariant
+from app.models.task_variant_to_items import TaskVariantToItems
+from app.models.item import Item
+from app.models.subdataset import Subdataset
+from app.models.training_run import TrainingRun, TrainingRunsToTasks
+from app.models.evaluation import Evaluation
+from app.models.task_variants_to_subdatasets import TaskVariantsToSubdatasets
+from app.schemas.task import TaskDetailSummary
+from app.crud.task import build_task_detail_summary, compact_json, TASK_DETAIL_JSON, task_rows_query, variant_rows_query, task_row_dicts
+from app.core.performance_monitor import query_timer
+from app.core.pagination import keyset
+
+def _with_variants():
+    return (
+        selectinload(Task.variants).joinedload(TaskVariant.embodiment),
+        selectinload(Task.variants).joinedload(TaskVariant.teleop_mode)
+    )
+
+async def get_task(db: AsyncSession, task_id: int, with_variants: bool = False) -> Optional[Task]:
+    query = select(Task).filter(Task.id == task_id)
+    if with_variants:
+        query = query.options(*_with_variants())
+    return (await db.execute(query)).scalars().first()
+
+async def get_task_version(db: AsyncSession, task_id: int) -> Optional[int]:
+    """tasks.version of a task, or None if there is no such task."""
+    return (await db.execute(select(Task.version).filter(Task.id == task_id))).scalar()
+
+async def get_tasks(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    is_external: Optional[bool] = None,
+    with_variants: bool = False,
+    after: Optional[tuple] = None
+) -> List[Task]:
+    query = select(Task)
+
+    if with_variants:
+        query = query.options(*_with_variants())
+
+    if status is not None:
+        query = query.filter(Task.status == status)
+    if is_external is not None:
+        query = query.filter(Task.is_external == is_external)
+
+    result = await db.execute(keyset(query, after, Task.id).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_task_rows(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    is_external: Optional[bool] = None,
+    with_variants: bool = False,
+    after: Optional[tuple] = None
+) -> List[dict]:
+    """
+    get_tasks as TaskList response dicts, or Task dicts with_variants
+    (one more query for the page), without the ORM (see app.crud.rows).
+    """
+    rows = (await db.execute(task_rows_query(with_variants, skip, limit, status, is_external, after))).all()
+    if not with_variants:
+        return task_row_dicts(rows)
+    variant_rows = (await db.execute(variant_rows_query([row.id for row in rows]))).all() if rows else []
+    return task_row_dicts(rows, variant_rows)
+
+@query_timer
+async def get_task_detail_summary(db: AsyncSession, task_id: int) -> Optional[TaskDetailSummary]:
+    task = await get_task(db, task_id)
+    if not task:
+        return None
+
+    variants = (await db.execute(
+        select(TaskVariant)
+        .options(
+            joinedload(TaskVariant.embodiment),
+            joinedload(TaskVariant.teleop_mode)
+        )
+        .filter(TaskVariant.task_id == task_id)
+        .order_by(TaskVariant.id)
+    )).scalars().all()
+
+    if not variants:
+        return build_task_detail_summary(task, [], [], [], [], [], [])
+
+    variant_ids = [v.id for v in variants]
+
+    item_links = (await db.execute(
+        select(TaskVariantToItems, Item)
+        .join(Item, TaskVariantToItems.item_id == Item.id)
+        .filter(TaskVariantToItems.task_variant_id.in_(variant_ids))
+        .order_by(Item.id)
+    )).all()
+
+    variant_subdataset_links = (await db.execute(
+        select(TaskVariantsToSubdatasets)
+        .filter(TaskVariantsToSubdatasets.task_variant_id.in_(variant_ids))
+        .order_by(TaskVariantsToSubdatasets.id)
+    )).scalars().all()
+
+    subdataset_ids = list(set([link.subdataset_id for link in variant_subdataset_links]))
+
+    subdatasets = []
+    if subdataset_ids:
+        subdatasets = (await db.execute(
+            select(Subdataset)
+            .options(
+                joinedload(Subdataset.embodiment),
+                joinedload(Subdataset.teleop_mode)
+            )
+            .filter(Subdataset.id.in_(subdataset_ids))
+        )).scalars().all()
+
+    training_runs = (await db.execute(
+        select(TrainingRun)
+        .join(TrainingRunsToTasks, TrainingRun.id == TrainingRunsToTasks.training_run_id)
+        .filter(TrainingRunsToTasks.task_id == task_id)
+        .order_by(TrainingRun.id)
+    )).scalars().all()
+
+    evaluations = (await db.execute(
+        select(Evaluation).filter(Evaluation.task_id == task_id).order_by(Evaluation.id)
+    )).scalars().all()
+
+    return build_task_detail_summary(
+        task, variants, item_links, variant_subdataset_links, subdatasets, training_runs, evaluations
+    )
+
+@query_timer
+async def get_task_detail_json(db: AsyncSession, task_id: int) -> Optional[str]:
+    """The task detail summary as a JSON document built by Postgres (see TASK_DETAIL_JSON)."""
+    return compact_json((await db.execute(TASK_DETAIL_JSON, {"task_id": task_id})).scalar())
@@ -1,14 +1,50 @@
 from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 from app.models.episode import Episode
+from app.models.episode_conversion_version import EpisodeConversionVersion
+from app.schemas import episode as schemas
+from app.crud.rows import schema_columns, row_dict, joined_dict
+from app.core.pagination import keyset
 
 # CRUD for processed episodes
-def get_episodes_by_subdataset(db: Session, subdataset_id: int, skip: int = 0, limit: int = 100) -> List[Episode]:
-    return (
-        db.query(Episode)
-        .filter(Episode.subdataset_id == subdataset_id)
+def get_episodes_by_subdataset(
+    db: Session,
+    subdataset_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple] = None
+) -> List[Episode]:
+    query = db.query(Episode)\
+        .filter(Episode.subdataset_id == subdataset_id)\
         .options(selectinload(Episode.conversion_version))
+    return (
+        keyset(query, after, Episode.id)
         .offset(skip)
         .limit(limit)
         .all()
-    ) 
\ No newline at end of file
+    )
+
+def get_episode_rows_by_subdataset(
+    db: Session,
+    subdataset_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple] = None
+) -> List[dict]:
+    """get_episodes_by_subdataset as Episode response dicts, without the ORM (see app.crud.rows)."""
+    versions = EpisodeConversionVersion.__table__
+    query = select(
+        *schema_columns(Episode.__table__, schemas.Episode),
+        *schema_columns(versions, schemas.ConversionVersion, "conversion_version__")
+    )\
+        .select_from(Episode.__table__.outerjoin(versions, versions.c.id == Episode.conversion_version_id))\
+        .filter(Episode.subdataset_id == subdataset_id)
+    rows = db.execute(keyset(query, after, Episode.id).offset(skip).limit(limit))
+    return [
+        row_dict(
+            row, schemas.Episode,
+            conversion_version=joined_dict(row, schemas.ConversionVersion, "conversion_version__")
+        )
+        for row in rows
+    ]
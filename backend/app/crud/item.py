@@ -1,8 +1,12 @@
 from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.models.item import Item
+from app.schemas import item as schemas
 from app.schemas.item import ItemCreate, ItemUpdate
+from app.crud.rows import schema_columns, row_dict
+from app.core.pagination import keyset
 
 # Item CRUD operations
 def create_item(db: Session, item: ItemCreate) -> Item:
@@ -23,9 +27,21 @@ def get_item(db: Session, item_id: int) -> Optional[Item]:
 def get_items(
     db: Session,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    after: Optional[tuple] = None
 ) -> List[Item]:
-    return db.query(Item).offset(skip).limit(limit).all()
+    return keyset(db.query(Item), after, Item.id).offset(skip).limit(limit).all()
+
+def get_item_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple] = None
+) -> List[dict]:
+    """get_items as Item response dicts, without the ORM (see app.crud.rows)."""
+    query = select(*schema_columns(Item.__table__, schemas.Item))
+    rows = db.execute(keyset(query, after, Item.id).offset(skip).limit(limit))
+    return [row_dict(row, schemas.Item) for row in rows]
 
 def update_item(db: Session, item_id: int, item: ItemUpdate) -> Optional[Item]:
     db_item = get_item(db, item_id)
@@ -0,0 +1,47 @@
+"""
+ORM-free reads for the list endpoints.
+
+Selecting ORM entities puts every row in the session's identity map with
+attribute instrumentation, and FastAPI then validates each instance into
+the response model (from_attributes). The *_rows functions next to the ORM
+reads select only the columns a response schema has with SQLAlchemy Core
+and map each row to a plain dict in the schema's field order, which
+app.core.row_response encodes to the same bytes as the response model.
+
+Columns are labelled prefix + field name, so one row can hold a record and
+the records joined to it (e.g. "embodiment__id").
+"""
+
+from typing import List, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Table
+
+
+def schema_columns(table: Table, schema: Type[BaseModel], prefix: str = "") -> List:
+    """The columns of table named like the fields of schema, in field order."""
+    return [table.c[name].label(prefix + name) for name in schema.model_fields if name in table.c]
+
+
+def row_dict(row, schema: Type[BaseModel], prefix: str = "", **values) -> dict:
+    """
+    The fields of schema from a row selected with schema_columns. values
+    fills the fields that are not columns; the rest get their defaults.
+    """
+    mapping = row._mapping
+    result = {}
+    for name, field in schema.model_fields.items():
+        if name in values:
+            result[name] = values[name]
+        elif prefix + name in mapping:
+            result[name] = mapping[prefix + name]
+        else:
+            result[name] = field.get_default()
+    return result
+
+
+def joined_dict(row, schema: Type[BaseModel], prefix: str) -> Optional[dict]:
+    """row_dict of an outer joined record, None where the join found no row."""
+    if row._mapping[prefix + "id"] is None:
+        return None
+    return row_dict(row, schema, prefix)
@@ -1,21 +1,28 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Type
+from pydantic import BaseModel
 from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import and_, func, case
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, exists, func, select, text
 
 from app.models.subdataset import Subdataset
 from app.models.raw_episode import RawEpisode
+from app.models.episode import Episode
+from app.models.subdataset_episode_stats import SubdatasetEpisodeStats, SubdatasetProcessedEpisodeStats
 from app.models.embodiment import Embodiment
 from app.models.teleop_mode import TeleopMode
 from app.schemas.subdataset import (
     SubdatasetCreate, SubdatasetUpdate,
     RawEpisodeCreate, RawEpisodeUpdate,
-    EpisodeStats
+    EpisodeStats, ProcessedEpisodeCount, EmbodimentInfo, TeleopModeInfo
 )
+from app.schemas import subdataset as schemas
 from app.models.tasks_to_subdatasets import TasksToSubdatasets
 from app.models.task import Task
 from app.models.task_variant import TaskVariant
 from app.models.task_variants_to_subdatasets import TaskVariantsToSubdatasets
 from app.core.performance_monitor import query_timer
+from app.crud.rows import schema_columns, row_dict, joined_dict
+from app.core.pagination import keyset, next_cursor, first_cursor
 
 # Subdataset CRUD operations
 def create_subdataset(db: Session, subdataset: SubdatasetCreate) -> Subdataset:
@@ -31,45 +38,161 @@ def create_subdataset(db: Session, subdataset: SubdatasetCreate) -> Subdataset:
     db.refresh(db_subdataset)
     return db_subdataset
 
-def get_subdataset(db: Session, subdataset_id: int) -> Optional[Subdataset]:
-    subdataset = db.query(Subdataset)\
+def get_subdataset(db: Session, subdataset_id: int, episode_limit: Optional[int] = None) -> Optional[Subdataset]:
+    """
+    Subdataset with its episode stats and raw episodes. With episode_limit
+    only the first episode_limit raw episodes are loaded, and
+    raw_episodes_next_cursor continues them on the paginated episodes endpoint
+    (see attach_episode_window).
+    """
+    query = db.query(Subdataset)\
         .options(
             joinedload(Subdataset.embodiment),
-            joinedload(Subdataset.teleop_mode),
-            joinedload(Subdataset.raw_episodes)
-        )\
-        .filter(Subdataset.id == subdataset_id)\
-        .first()
+            joinedload(Subdataset.teleop_mode)
+        )
+    if episode_limit is None:
+        query = query.options(joinedload(Subdataset.raw_episodes))
+    subdataset = query.filter(Subdataset.id == subdataset_id).first()
     
     if subdataset:
-        # Calculate episode stats
-        stats = db.query(
-            func.count(RawEpisode.id).label('total'),
-            func.sum(case((RawEpisode.label == 'good', 1), else_=0)).label('good'),
-            func.sum(case((RawEpisode.label == 'bad', 1), else_=0)).label('bad')
-        ).filter(RawEpisode.subdataset_id == subdataset_id).first()
-        
-        subdataset.episode_stats = EpisodeStats(
-            total=stats.total or 0,
-            good=stats.good or 0,
-            bad=stats.bad or 0
-        )
+        attach_episode_stats([subdataset], db.execute(episode_stats_query([subdataset_id])))
+        if episode_limit is not None:
+            raw_episodes = get_raw_episodes(db, subdataset_id, limit=episode_limit) if episode_limit else []
+            attach_episode_window(subdataset, raw_episodes, episode_limit)
     
     return subdataset
 
-@query_timer
-def get_subdatasets(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
-    task_id: Optional[int] = None,
-    variant_id: Optional[int] = None
-) -> List[Subdataset]:
-    query = db.query(Subdataset)
+def attach_episode_window(subdataset: Subdataset, raw_episodes: List[RawEpisode], episode_limit: int) -> None:
+    """
+    Set the first episode_limit raw episodes and the cursor continuing them.
+    With episode_limit 0 nothing is loaded and the cursor is that of the
+    first page, if the subdataset has raw episodes (by its episode_stats).
+    """
+    # Set as loaded, so serializing raw_episodes does not lazy load the rest
+    set_committed_value(subdataset, "raw_episodes", raw_episodes)
+    if episode_limit == 0:
+        subdataset.raw_episodes_next_cursor = first_cursor() if subdataset.episode_stats.total else None
+    else:
+        subdataset.raw_episodes_next_cursor = next_cursor(raw_episodes, episode_limit)
+
+EPISODE_STAT_COLUMNS = ("total", "good", "bad", "contains_correction", "corrupted", "processed")
+
+def episode_stats_query(subdataset_ids: List[int]):
+    """Counters (maintained by triggers) of several subdatasets, one row per conversion version."""
+    return select(SubdatasetEpisodeStats, SubdatasetProcessedEpisodeStats)\
+        .outerjoin(
+            SubdatasetProcessedEpisodeStats,
+            SubdatasetProcessedEpisodeStats.subdataset_id == SubdatasetEpisodeStats.subdataset_id
+        )\
+        .filter(SubdatasetEpisodeStats.subdataset_id.in_(subdataset_ids))\
+        .order_by(SubdatasetEpisodeStats.subdataset_id, SubdatasetProcessedEpisodeStats.conversion_version_id)
 
+def attach_episode_stats(subdatasets: List[Subdataset], rows) -> None:
+    """Set episode_stats on each subdataset from the rows of episode_stats_query."""
+    stats = episode_stats_by_subdataset([subdataset.id for subdataset in subdatasets], rows)
+    for subdataset in subdatasets:
+        subdataset.episode_stats = stats[subdataset.id]
+
+def episode_stats_by_subdataset(subdataset_ids: List[int], rows) -> Dict[int, EpisodeStats]:
+    """EpisodeStats of each subdataset from the rows of episode_stats_query."""
+    stats: Dict[int, SubdatasetEpisodeStats] = {}
+    versions: Dict[int, List[ProcessedEpisodeCount]] = {}
+    for counters, version in rows:
+        stats[counters.subdataset_id] = counters
+        if version is not None and version.total:
+            versions.setdefault(counters.subdataset_id, []).append(
+                ProcessedEpisodeCount(conversion_version_id=version.conversion_version_id, total=version.total)
+            )
+
+    result = {}
+    for subdataset_id in subdataset_ids:
+        # No stats row means no episode was ever added to the subdataset
+        counters = stats.get(subdataset_id)
+        result[subdataset_id] = EpisodeStats(
+            **{column: getattr(counters, column) if counters else 0 for column in EPISODE_STAT_COLUMNS},
+            processed_by_version=versions.get(subdataset_id, [])
+        )
+    return result
+
+def rebuild_episode_stats(db: Session, subdataset_ids: Optional[List[int]] = None) -> List[int]:
+    """
+    Recount the episode stats tables from raw_episodes and episodes and fix
+    the rows that drifted. Returns the ids of the subdatasets that were fixed;
+    the caller commits (or rolls back for a dry run).
+    """
+    # Writers wait until the caller commits, so no trigger update races the recount
+    db.execute(text("LOCK TABLE preproduction.raw_episodes, preproduction.episodes IN SHARE MODE"))
+
+    def scoped(query, column):
+        return query.filter(column.in_(subdataset_ids)) if subdataset_ids is not None else query
+
+    label_counts = [func.count()] + [
+        func.count().filter(RawEpisode.label == label)
+        for label in ("good", "bad", "contains correction", "corrupted")
+    ]
+    expected: Dict[int, tuple] = {}
+    for subdataset_id, *counts in scoped(db.query(RawEpisode.subdataset_id, *label_counts), RawEpisode.subdataset_id)\
+            .filter(RawEpisode.subdataset_id.isnot(None))\
+            .group_by(RawEpisode.subdataset_id):
+        expected[subdataset_id] = (*counts, 0)
+
+    expected_versions: Dict[int, Dict[int, int]] = {}
+    for subdataset_id, version_id, count in scoped(
+            db.query(Episode.subdataset_id, Episode.conversion_version_id, func.count()), Episode.subdataset_id)\
+            .filter(Episode.subdataset_id.isnot(None))\
+            .group_by(Episode.subdataset_id, Episode.conversion_version_id):
+        *labels, processed = expected.get(subdataset_id, (0, 0, 0, 0, 0, 0))
+        expected[subdataset_id] = (*labels, processed + count)
+        if version_id is not None:
+            expected_versions.setdefault(subdataset_id, {})[version_id] = count
+
+    current = {
+        row.subdataset_id: tuple(getattr(row, column) for column in EPISODE_STAT_COLUMNS)
+        for row in scoped(db.query(SubdatasetEpisodeStats), SubdatasetEpisodeStats.subdataset_id)
+        if any(getattr(row, column) for column in EPISODE_STAT_COLUMNS)
+    }
+    current_versions: Dict[int, Dict[int, int]] = {}
+    for row in scoped(db.query(SubdatasetProcessedEpisodeStats), SubdatasetProcessedEpisodeStats.subdataset_id):
+        if row.total:
+            current_versions.setdefault(row.subdataset_id, {})[row.conversion_version_id] = row.total
+
+    drifted = sorted(
+        subdataset_id for subdataset_id in set(expected) | set(current) | set(expected_versions) | set(current_versions)
+        if expected.get(subdataset_id) != current.get(subdataset_id)
+        or expected_versions.get(subdataset_id) != current_versions.get(subdataset_id)
+    )
+    if not drifted:
+        return []
+
+    db.query(SubdatasetProcessedEpisodeStats)\
+        .filter(SubdatasetProcessedEpisodeStats.subdataset_id.in_(drifted))\
+        .delete(synchronize_session=False)
+    db.query(SubdatasetEpisodeStats)\
+        .filter(SubdatasetEpisodeStats.subdataset_id.in_(drifted))\
+        .delete(synchronize_session=False)
+    for subdataset_id in drifted:
+        if subdataset_id in expected:
+            db.add(SubdatasetEpisodeStats(
+                subdataset_id=subdataset_id, **dict(zip(EPISODE_STAT_COLUMNS, expected[subdataset_id]))
+            ))
+        for version_id, count in expected_versions.get(subdataset_id, {}).items():
+            db.add(SubdatasetProcessedEpisodeStats(
+                subdataset_id=subdataset_id, conversion_version_id=version_id, total=count
+            ))
+    db.flush()
+    return drifted
+
+def filter_subdatasets(
+    query,
+    task_id: Optional[int] = None,
+    variant_id: Optional[int] = None,
+    embodiment_id: Optional[int] = None,
+    teleop_mode_id: Optional[int] = None
+):
+    """Apply the subdataset list filters to a Query or select of subdatasets."""
     # Unassigned logic: if -1, return subdatasets not linked to any variant
     if variant_id == -1 or task_id == -1:
-        assigned_subdataset_ids = db.query(TaskVariantsToSubdatasets.subdataset_id).distinct()
+        assigned_subdataset_ids = select(TaskVariantsToSubdatasets.subdataset_id).distinct()
         query = query.filter(~Subdataset.id.in_(assigned_subdataset_ids))
     elif variant_id is not None:
         # Filter subdatasets linked to the given variant using JOIN
@@ -81,21 +204,110 @@ def get_subdatasets(
             .join(TaskVariant, TaskVariantsToSubdatasets.task_variant_id == TaskVariant.id)\
             .filter(TaskVariant.task_id == task_id)
 
-    return query\
-        .options(
-            joinedload(Subdataset.embodiment),
-            joinedload(Subdataset.teleop_mode)
-        )\
+    if embodiment_id is not None:
+        query = query.filter(Subdataset.embodiment_id == embodiment_id)
+    if teleop_mode_id is not None:
+        query = query.filter(Subdataset.teleop_mode_id == teleop_mode_id)
+    return query
+
+@query_timer
+def get_subdatasets(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    task_id: Optional[int] = None,
+    variant_id: Optional[int] = None,
+    after: Optional[tuple] = None,
+    with_stats: bool = False,
+    embodiment_id: Optional[int] = None,
+    teleop_mode_id: Optional[int] = None
+) -> List[Subdataset]:
+    query = filter_subdatasets(db.query(Subdataset), task_id, variant_id, embodiment_id, teleop_mode_id)
+
+    query = query.options(
+        joinedload(Subdataset.embodiment),
+        joinedload(Subdataset.teleop_mode)
+    )
+    subdatasets = keyset(query, after, Subdataset.id)\
         .offset(skip)\
         .limit(limit)\
         .all()
 
+    if with_stats and subdatasets:
+        # One query for the whole page
+        subdataset_ids = [subdataset.id for subdataset in subdatasets]
+        attach_episode_stats(subdatasets, db.execute(episode_stats_query(subdataset_ids)))
+    return subdatasets
+
+def subdataset_rows_query(
+    schema: Type[BaseModel],
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple] = None,
+    **filters
+):
+    """The columns of a subdataset response schema and its embodiment and teleop mode (see app.crud.rows)."""
+    subdatasets, embodiments, teleop_modes = Subdataset.__table__, Embodiment.__table__, TeleopMode.__table__
+    query = select(
+        *schema_columns(subdatasets, schema),
+        *schema_columns(embodiments, EmbodimentInfo, "embodiment__"),
+        *schema_columns(teleop_modes, TeleopModeInfo, "teleop_mode__")
+    ).select_from(
+        subdatasets
+        .outerjoin(embodiments, embodiments.c.id == subdatasets.c.embodiment_id)
+        .outerjoin(teleop_modes, teleop_modes.c.id == subdatasets.c.teleop_mode_id)
+    )
+    return keyset(filter_subdatasets(query, **filters), after, Subdataset.id).offset(skip).limit(limit)
+
+def subdataset_row_dict(row, schema: Type[BaseModel], **values) -> dict:
+    return row_dict(
+        row, schema,
+        embodiment=joined_dict(row, EmbodimentInfo, "embodiment__"),
+        teleop_mode=joined_dict(row, TeleopModeInfo, "teleop_mode__"),
+        **values
+    )
+
+@query_timer
+def get_subdataset_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    embodiment_id: Optional[int] = None,
+    teleop_mode_id: Optional[int] = None,
+    after: Optional[tuple] = None
+) -> List[dict]:
+    """
+    A page of Subdataset response dicts with all their raw episodes (two
+    queries), without the ORM (see app.crud.rows).
+    """
+    rows = db.execute(subdataset_rows_query(
+        schemas.Subdataset, skip, limit, after, embodiment_id=embodiment_id, teleop_mode_id=teleop_mode_id
+    )).all()
+    raw_episodes: Dict[int, List[dict]] = {}
+    if rows:
+        episode_rows = db.execute(
+            select(*schema_columns(RawEpisode.__table__, schemas.RawEpisode))
+            .filter(RawEpisode.subdataset_id.in_([row.id for row in rows]))
+            .order_by(RawEpisode.subdataset_id, RawEpisode.id)
+        )
+        for episode in episode_rows:
+            raw_episodes.setdefault(episode.subdataset_id, []).append(row_dict(episode, schemas.RawEpisode))
+    return [
+        subdataset_row_dict(row, schemas.Subdataset, raw_episodes=raw_episodes.get(row.id, []))
+        for row in rows
+    ]
+
+def subdataset_exists(db: Session, subdataset_id: int) -> bool:
+    # Primary key probe, loads nothing
+    return db.query(exists().where(Subdataset.id == subdataset_id)).scalar()
+
 def update_subdataset(
     db: Session,
     subdataset_id: int,
     subdataset: SubdatasetUpdate
 ) -> Optional[Subdataset]:
-    db_subdataset = get_subdataset(db, subdataset_id)
+    # Without the raw episodes; the response loads them once when serializing
+    db_subdataset = db.get(Subdataset, subdataset_id)
     if not db_subdataset:
         return None
     
@@ -105,14 +317,18 @@ def update_subdataset(
     
     db.commit()
     db.refresh(db_subdataset)
+    attach_episode_stats([db_subdataset], db.execute(episode_stats_query([subdataset_id])))
     return db_subdataset
 
 def delete_subdataset(db: Session, subdataset_id: int) -> bool:
-    db_subdataset = get_subdataset(db, subdataset_id)
-    if not db_subdataset:
+    # Bulk deletes instead of loading every raw episode for the ORM cascade;
+    # the rowcount tells whether the subdataset existed
+    db.query(RawEpisode).filter(RawEpisode.subdataset_id == subdataset_id).delete(synchronize_session=False)
+    deleted = db.query(Subdataset).filter(Subdataset.id == subdataset_id).delete(synchronize_session=False)
+    if not deleted:
+        db.rollback()
         return False
     
-    db.delete(db_subdataset)
     db.commit()
     return True
 
@@ -136,28 +352,33 @@ def create_raw_episode(
     db.refresh(db_raw_episode)
     return db_raw_episode
 
-def get_raw_episode(db: Session, raw_episode_id: int) -> Optional[RawEpisode]:
-    return db.query(RawEpisode).filter(RawEpisode.id == raw_episode_id).first()
+def get_raw_episode(db: Session, raw_episode_id: int, subdataset_id: Optional[int] = None) -> Optional[RawEpisode]:
+    query = db.query(RawEpisode).filter(RawEpisode.id == raw_episode_id)
+    if subdataset_id is not None:
+        query = query.filter(RawEpisode.subdataset_id == subdataset_id)
+    return query.first()
 
 def get_raw_episodes(
     db: Session,
     subdataset_id: int,
     skip: int = 0,
     limit: int = 100,
-    label: Optional[str] = None
+    label: Optional[str] = None,
+    after: Optional[tuple] = None
 ) -> List[RawEpisode]:
     query = db.query(RawEpisode).filter(RawEpisode.subdataset_id == subdataset_id)
     
     if label is not None:
         query = query.filter(RawEpisode.label == label)
     
-    return query.offset(skip).limit(limit).all()
+    return keyset(query, after, RawEpisode.id).offset(skip).limit(limit).all()
 
 def get_all_raw_episodes(
     db: Session,
     skip: int = 0,
     limit: int = 100,
-    label: Optional[str] = None
+    label: Optional[str] = None,
+    after: Optional[tuple] = None
 ) -> List[RawEpisode]:
     """
     Get all raw episodes with optional filtering.
@@ -167,14 +388,32 @@ def get_all_raw_episodes(
     if label is not None:
         query = query.filter(RawEpisode.label == label)
     
-    return query.offset(skip).limit(limit).all()
+    return keyset(query, after, RawEpisode.id).offset(skip).limit(limit).all()
+
+def raw_episode_rows_query(
+    subdataset_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    label: Optional[str] = None,
+    after: Optional[tuple] = None
+):
+    """The RawEpisode response columns of get_raw_episodes, or of get_all_raw_episodes without subdataset_id."""
+    query = select(*schema_columns(RawEpisode.__table__, schemas.RawEpisode))
+
+    if subdataset_id is not None:
+        query = query.filter(RawEpisode.subdataset_id == subdataset_id)
+    if label is not None:
+        query = query.filter(RawEpisode.label == label)
+
+    return keyset(query, after, RawEpisode.id).offset(skip).limit(limit)
 
 def update_raw_episode(
     db: Session,
     raw_episode_id: int,
-    raw_episode: RawEpisodeUpdate
+    raw_episode: RawEpisodeUpdate,
+    subdataset_id: Optional[int] = None
 ) -> Optional[RawEpisode]:
-    db_raw_episode = get_raw_episode(db, raw_episode_id)
+    db_raw_episode = get_raw_episode(db, raw_episode_id, subdataset_id)
     if not db_raw_episode:
         return None
     
@@ -186,8 +425,8 @@ def update_raw_episode(
     db.refresh(db_raw_episode)
     return db_raw_episode
 
-def delete_raw_episode(db: Session, raw_episode_id: int) -> bool:
-    db_raw_episode = get_raw_episode(db, raw_episode_id)
+def delete_raw_episode(db: Session, raw_episode_id: int, subdataset_id: Optional[int] = None) -> bool:
+    db_raw_episode = get_raw_episode(db, raw_episode_id, subdataset_id)
     if not db_raw_episode:
         return False
     
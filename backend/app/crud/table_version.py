@@ -0,0 +1,11 @@
+from typing import Dict, Iterable
+from sqlalchemy.orm import Session
+
+from app.models.table_version import TableVersion
+
+def table_versions_query(tables: Iterable[str]):
+    return TableVersion.__table__.select().where(TableVersion.table_name.in_(list(tables)))
+
+def get_table_versions(db: Session, tables: Iterable[str]) -> Dict[str, int]:
+    """Change counter of each table; tables without a counter (see alembic 0005) are missing."""
+    return {row.table_name: row.version for row in db.execute(table_versions_query(tables))}
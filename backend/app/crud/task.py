@@ -1,12 +1,14 @@
-from typing import List, Optional
+import json
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import and_, func
+from sqlalchemy import String, and_, column, func, select, text
 
 from app.models.task import Task
 from app.models.task_variant import TaskVariant
 from app.models.task_variant_to_items import TaskVariantToItems
 from app.models.item import Item
 from app.schemas.task import TaskCreate, TaskUpdate, TaskVariantCreate, TaskVariantUpdate, TaskDetailSummary, TaskVariantSubdatasets
+from app.schemas import task as schemas
 from app.schemas.item import TaskVariantItemInfo
 from app.models.tasks_to_subdatasets import TasksToSubdatasets
 from app.models.subdataset import Subdataset
@@ -16,7 +18,12 @@ from app.schemas.subdataset import SubdatasetList, EmbodimentInfo, TeleopModeInf
 from app.schemas.training_run import TrainingRunSummary
 from app.schemas.evaluation import EvaluationSummary
 from app.models.task_variants_to_subdatasets import TaskVariantsToSubdatasets
+from app.models.embodiment import Embodiment
+from app.models.teleop_mode import TeleopMode
+from app.crud.rows import schema_columns, row_dict, joined_dict
 from app.core.performance_monitor import query_timer
+from app.core.pagination import keyset
+from app.db.routing import READ_ONLY_OPTION
 
 # Task CRUD operations
 def create_task(db: Session, task: TaskCreate) -> Task:
@@ -34,22 +41,82 @@ def create_task(db: Session, task: TaskCreate) -> Task:
 def get_task(db: Session, task_id: int) -> Optional[Task]:
     return db.query(Task).filter(Task.id == task_id).first()
 
+def get_task_version(db: Session, task_id: int) -> Optional[int]:
+    """tasks.version of a task, or None if there is no such task."""
+    return db.query(Task.version).filter(Task.id == task_id).scalar()
+
 def get_tasks(
     db: Session,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
-    is_external: Optional[bool] = None
+    is_external: Optional[bool] = None,
+    with_variants: bool = False,
+    after: Optional[tuple] = None
 ) -> List[Task]:
     query = db.query(Task)
+
+    if with_variants:
+        # Load variants for the whole page up front instead of one query per task
+        query = query.options(
+            selectinload(Task.variants).joinedload(TaskVariant.embodiment),
+            selectinload(Task.variants).joinedload(TaskVariant.teleop_mode)
+        )
     
     if status is not None:
         query = query.filter(Task.status == status)
     if is_external is not None:
         query = query.filter(Task.is_external == is_external)
     
-    # Add ordering for consistent results and better performance
-    return query.order_by(Task.id).offset(skip).limit(limit).all()
+    # Ordered by id for consistent pages; a cursor (after) continues past the previous page
+    return keyset(query, after, Task.id).offset(skip).limit(limit).all()
+
+def task_rows_query(
+    with_variants: bool = False,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    is_external: Optional[bool] = None,
+    after: Optional[tuple] = None
+):
+    """The response columns of get_tasks: Task with_variants, else TaskList (see app.crud.rows)."""
+    query = select(*schema_columns(Task.__table__, schemas.Task if with_variants else schemas.TaskList))
+
+    if status is not None:
+        query = query.filter(Task.status == status)
+    if is_external is not None:
+        query = query.filter(Task.is_external == is_external)
+
+    return keyset(query, after, Task.id).offset(skip).limit(limit)
+
+def variant_rows_query(task_ids: List[int]):
+    """The TaskVariant response columns of the variants of tasks, with their embodiment and teleop mode."""
+    variants, embodiments, teleop_modes = TaskVariant.__table__, Embodiment.__table__, TeleopMode.__table__
+    return select(
+        *schema_columns(variants, schemas.TaskVariant),
+        *schema_columns(embodiments, EmbodimentInfo, "embodiment__"),
+        *schema_columns(teleop_modes, TeleopModeInfo, "teleop_mode__")
+    ).select_from(
+        variants
+        .outerjoin(embodiments, embodiments.c.id == variants.c.embodiment_id)
+        .outerjoin(teleop_modes, teleop_modes.c.id == variants.c.teleop_mode_id)
+    )\
+        .filter(TaskVariant.task_id.in_(task_ids))\
+        .order_by(TaskVariant.task_id, TaskVariant.id)
+
+def task_row_dicts(rows, variant_rows=None) -> List[dict]:
+    """TaskList dicts of the rows of task_rows_query, or Task dicts given the rows of variant_rows_query."""
+    if variant_rows is None:
+        return [row_dict(row, schemas.TaskList) for row in rows]
+
+    variants: Dict[int, List[dict]] = {}
+    for row in variant_rows:
+        variants.setdefault(row.task_id, []).append(row_dict(
+            row, schemas.TaskVariant,
+            embodiment=joined_dict(row, EmbodimentInfo, "embodiment__"),
+            teleop_mode=joined_dict(row, TeleopModeInfo, "teleop_mode__")
+        ))
+    return [row_dict(row, schemas.Task, variants=variants.get(row.id, [])) for row in rows]
 
 def update_task(db: Session, task_id: int, task: TaskUpdate) -> Optional[Task]:
     db_task = get_task(db, task_id)
@@ -89,8 +156,15 @@ def create_task_variant(db: Session, task_id: int, variant: TaskVariantCreate) -
     db.refresh(db_variant)
     return db_variant
 
-def get_task_variant(db: Session, variant_id: int) -> Optional[TaskVariant]:
-    return db.query(TaskVariant).filter(TaskVariant.id == variant_id).first()
+def _variant_details():
+    # Loaded with the variant so serializing it does not lazy-load after the session was released
+    return (joinedload(TaskVariant.embodiment), joinedload(TaskVariant.teleop_mode))
+
+def get_task_variant(db: Session, variant_id: int, with_details: bool = False) -> Optional[TaskVariant]:
+    query = db.query(TaskVariant)
+    if with_details:
+        query = query.options(*_variant_details())
+    return query.filter(TaskVariant.id == variant_id).first()
 
 def get_task_variants(
     db: Session,
@@ -99,6 +173,7 @@ def get_task_variants(
     limit: int = 100
 ) -> List[TaskVariant]:
     return db.query(TaskVariant)\
+        .options(*_variant_details())\
         .filter(TaskVariant.task_id == task_id)\
         .order_by(TaskVariant.id)\
         .offset(skip)\
@@ -138,29 +213,19 @@ def get_task_detail_summary(db: Session, task_id: int) -> TaskDetailSummary:
     if not task:
         return None
 
-    # Get all variants for this task with preloaded relationships
+    # Get all variants for this task with preloaded relationships; every
+    # list in id order, as in the TASK_DETAIL_JSON document
     variants = db.query(TaskVariant)\
         .options(
             joinedload(TaskVariant.embodiment),
             joinedload(TaskVariant.teleop_mode)
         )\
         .filter(TaskVariant.task_id == task_id)\
+        .order_by(TaskVariant.id)\
         .all()
 
     if not variants:
-        return TaskDetailSummary(
-            id=task.id,
-            name=task.name,
-            description=task.description,
-            status=task.status,
-            created_at=task.created_at,
-            is_external=task.is_external,
-            variants=[],
-            subdatasets=[],
-            subdatasets_by_variant=[],
-            training_runs=[],
-            evaluations=[]
-        )
+        return build_task_detail_summary(task, [], [], [], [], [], [])
 
     # Get all variant IDs for bulk operations
     variant_ids = [v.id for v in variants]
@@ -169,25 +234,13 @@ def get_task_detail_summary(db: Session, task_id: int) -> TaskDetailSummary:
     item_links = db.query(TaskVariantToItems, Item)\
         .join(Item, TaskVariantToItems.item_id == Item.id)\
         .filter(TaskVariantToItems.task_variant_id.in_(variant_ids))\
+        .order_by(Item.id)\
         .all()
 
-    # Group items by variant_id for efficient lookup
-    items_by_variant = {}
-    for link, item in item_links:
-        if link.task_variant_id not in items_by_variant:
-            items_by_variant[link.task_variant_id] = []
-        items_by_variant[link.task_variant_id].append(TaskVariantItemInfo(
-            item_id=item.id,
-            item_name=item.name,
-            quantity=link.quantity,
-            url=item.url,
-            images=item.images,
-            notes=item.notes
-        ))
-
     # Bulk fetch all task variant to subdataset links
     variant_subdataset_links = db.query(TaskVariantsToSubdatasets)\
         .filter(TaskVariantsToSubdatasets.task_variant_id.in_(variant_ids))\
+        .order_by(TaskVariantsToSubdatasets.id)\
         .all()
 
     # Get all unique subdataset IDs
@@ -204,28 +257,167 @@ def get_task_detail_summary(db: Session, task_id: int) -> TaskDetailSummary:
             .filter(Subdataset.id.in_(subdataset_ids))\
             .all()
 
-    # Create subdataset lookup by ID
-    subdataset_lookup = {sd.id: sd for sd in subdatasets}
-
-    # Group subdatasets by variant_id
-    subdatasets_by_variant_id = {}
-    for link in variant_subdataset_links:
-        if link.task_variant_id not in subdatasets_by_variant_id:
-            subdatasets_by_variant_id[link.task_variant_id] = []
-        if link.subdataset_id in subdataset_lookup:
-            subdatasets_by_variant_id[link.task_variant_id].append(subdataset_lookup[link.subdataset_id])
-
     # Bulk fetch training runs
     training_runs = db.query(TrainingRun)\
         .join(TrainingRunsToTasks, TrainingRun.id == TrainingRunsToTasks.training_run_id)\
         .filter(TrainingRunsToTasks.task_id == task_id)\
+        .order_by(TrainingRun.id)\
         .all()
 
     # Bulk fetch evaluations
     evaluations = db.query(Evaluation)\
         .filter(Evaluation.task_id == task_id)\
+        .order_by(Evaluation.id)\
         .all()
 
+    return build_task_detail_summary(
+        task, variants, item_links, variant_subdataset_links, subdatasets, training_runs, evaluations
+    )
+
+# The TaskDetailSummary document built by Postgres in one statement (the
+# "json" TASK_DETAIL_ENGINE): same fields as build_task_detail_summary,
+# lists ordered by id. created_at is rendered as pydantic writes a UTC
+# datetime (microseconds only when non-zero, Z suffix), whatever the
+# session TimeZone. Cast to text so every driver returns it unparsed;
+# marked read only, so the routing session may send it to a replica.
+TASK_DETAIL_JSON = text("""
+WITH variant_rows AS (
+    SELECT tv.id,
+           json_build_object(
+               'name', tv.name, 'description', tv.description,
+               'embodiment_id', tv.embodiment_id, 'teleop_mode_id', tv.teleop_mode_id,
+               'notes', tv.notes, 'media', tv.media, 'id', tv.id, 'task_id', tv.task_id,
+               'embodiment', CASE WHEN e.id IS NOT NULL THEN json_build_object('id', e.id, 'name', e.name) END,
+               'teleop_mode', CASE WHEN tm.id IS NOT NULL THEN json_build_object('id', tm.id, 'name', tm.name) END,
+               'items', COALESCE(items.items, '[]'::json)
+           ) AS variant,
+           COALESCE(subdatasets.subdatasets, '[]'::json) AS subdatasets
+    FROM preproduction.task_variants tv
+    LEFT JOIN preproduction.embodiments e ON e.id = tv.embodiment_id
+    LEFT JOIN preproduction.teleop_modes tm ON tm.id = tv.teleop_mode_id
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+                   'item_id', i.id, 'item_name', i.name, 'quantity', l.quantity,
+                   'url', i.url, 'images', i.images, 'notes', i.notes
+               ) ORDER BY i.id) AS items
+        FROM preproduction.task_variant_to_items l
+        JOIN preproduction.items i ON i.id = l.item_id
+        WHERE l.task_variant_id = tv.id
+    ) items ON true
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+                   'name', sd.name, 'description', sd.description, 'notes', sd.notes,
+                   'embodiment_id', sd.embodiment_id, 'teleop_mode_id', sd.teleop_mode_id, 'id', sd.id,
+                   'embodiment', CASE WHEN se.id IS NOT NULL THEN json_build_object('id', se.id, 'name', se.name) END,
+                   'teleop_mode', CASE WHEN stm.id IS NOT NULL THEN json_build_object('id', stm.id, 'name', stm.name) END
+               ) ORDER BY l.id) AS subdatasets
+        FROM preproduction.task_variants_to_subdatasets l
+        JOIN preproduction.subdatasets sd ON sd.id = l.subdataset_id
+        LEFT JOIN preproduction.embodiments se ON se.id = sd.embodiment_id
+        LEFT JOIN preproduction.teleop_modes stm ON stm.id = sd.teleop_mode_id
+        WHERE l.task_variant_id = tv.id
+    ) subdatasets ON true
+    WHERE tv.task_id = :task_id
+)
+SELECT json_build_object(
+    'name', t.name, 'description', t.description, 'status', t.status, 'is_external', t.is_external,
+    'id', t.id,
+    'created_at', to_char(t.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS')
+        || CASE WHEN extract(microseconds FROM t.created_at)::bigint % 1000000 <> 0
+                THEN to_char(t.created_at AT TIME ZONE 'UTC', '.US') ELSE '' END
+        || 'Z',
+    'variants', COALESCE((SELECT json_agg(variant ORDER BY id) FROM variant_rows), '[]'::json),
+    'subdatasets', COALESCE((
+        SELECT json_agg(subdataset ORDER BY v.id, position)
+        FROM variant_rows v, json_array_elements(v.subdatasets) WITH ORDINALITY AS s(subdataset, position)
+    ), '[]'::json),
+    'subdatasets_by_variant', COALESCE((
+        SELECT json_agg(json_build_object('variant', variant, 'subdatasets', subdatasets) ORDER BY id)
+        FROM variant_rows
+    ), '[]'::json),
+    'training_runs', COALESCE((
+        SELECT json_agg(json_build_object('id', r.id, 'dataset_id', r.dataset_id, 'url', r.url) ORDER BY r.id)
+        FROM preproduction.training_runs r
+        JOIN preproduction.training_runs_to_tasks l ON l.training_run_id = r.id
+        WHERE l.task_id = t.id
+    ), '[]'::json),
+    'evaluations', COALESCE((
+        SELECT json_agg(json_build_object(
+                   'id', ev.id, 'task_id', ev.task_id, 'name', ev.name, 'description', ev.description,
+                   'media', ev.media, 'items', ev.items, 'embodiment_id', ev.embodiment_id, 'notes', ev.notes
+               ) ORDER BY ev.id)
+        FROM preproduction.evaluations ev
+        WHERE ev.task_id = t.id
+    ), '[]'::json)
+)::text AS document
+FROM preproduction.tasks t
+WHERE t.id = :task_id
+""").columns(column("document", String)).execution_options(**{READ_ONLY_OPTION: True})
+
+def compact_json(document: Optional[str]) -> Optional[str]:
+    """
+    A document of TASK_DETAIL_JSON with the separators of every other
+    response body: json_build_object writes "key" : value and json_agg ", ".
+    """
+    if document is None:
+        return None
+    return json.dumps(json.loads(document), ensure_ascii=False, separators=(",", ":"))
+
+@query_timer
+def get_task_detail_json(db: Session, task_id: int) -> Optional[str]:
+    """The task detail summary as a JSON document, or None if there is no such task."""
+    return compact_json(db.execute(TASK_DETAIL_JSON, {"task_id": task_id}).scalar())
+
+def build_task_detail_summary(
+    task: Task,
+    variants: List[TaskVariant],
+    item_links: list,
+    variant_subdataset_links: List[TaskVariantsToSubdatasets],
+    subdatasets: List[Subdataset],
+    training_runs: List[TrainingRun],
+    evaluations: List[Evaluation]
+) -> TaskDetailSummary:
+    """Assemble the task detail summary from pre-fetched rows (shared by the sync and async crud)."""
+    if not variants:
+        return TaskDetailSummary(
+            id=task.id,
+            name=task.name,
+            description=task.description,
+            status=task.status,
+            created_at=task.created_at,
+            is_external=task.is_external,
+            variants=[],
+            subdatasets=[],
+            subdatasets_by_variant=[],
+            training_runs=[],
+            evaluations=[]
+        )
+
+    # Group items by variant_id for efficient lookup
+    items_by_variant = {}
+    for link, item in item_links:
+        if link.task_variant_id not in items_by_variant:
+            items_by_variant[link.task_variant_id] = []
+        items_by_variant[link.task_variant_id].append(TaskVariantItemInfo(
+            item_id=item.id,
+            item_name=item.name,
+            quantity=link.quantity,
+            url=item.url,
+            images=item.images,
+            notes=item.notes
+        ))
+
+    # Create subdataset lookup by ID
+    subdataset_lookup = {sd.id: sd for sd in subdatasets}
+
+    # Group subdatasets by variant_id
+    subdatasets_by_variant_id = {}
+    for link in variant_subdataset_links:
+        if link.task_variant_id not in subdatasets_by_variant_id:
+            subdatasets_by_variant_id[link.task_variant_id] = []
+        if link.subdataset_id in subdataset_lookup:
+            subdatasets_by_variant_id[link.task_variant_id].append(subdataset_lookup[link.subdataset_id])
+
     # Helper function to convert ORM objects to dict
     def orm_to_dict(obj):
         return {k: v for k, v in obj.__dict__.items() if not k.startswith('_sa_')}
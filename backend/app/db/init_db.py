@@ -5,6 +5,8 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from sqlalchemy import text
+from alembic import command
+from alembic.config import Config
 from app.db.session import engine
 
 def init_db():
@@ -19,7 +21,11 @@ def init_db():
             connection.execute(text(schema_sql))
             connection.commit()
             print("✅ Database schema initialized successfully!")
-            return True
+
+        # Everything after schema.sql (indexes, later tables) is an Alembic migration
+        command.upgrade(Config(str(Path(__file__).parents[2] / "alembic.ini")), "head")
+        print("✅ Database migrated to the latest revision!")
+        return True
     except Exception as e:
         print(f"❌ Database schema initialization failed: {str(e)}")
         return False
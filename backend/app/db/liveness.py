@@ -0,0 +1,67 @@
+"""
+Connection liveness checks.
+
+pool_pre_ping costs a SELECT 1 round trip on every checkout, i.e. on every
+request. Instead, a connection is pinged on checkout only if it sat idle in
+the pool longer than DB_PING_IDLE_SECONDS, which is when proxies, Cloud SQL
+maintenance and idle timeouts tend to drop it. A dead connection found by the
+ping is replaced by the pool before the session sees it.
+
+A connection that dies while it was recently used is caught by the first
+statement of a transaction instead: ReconnectingSession invalidates it and
+retries that statement once on a fresh connection. Nothing has run in the
+transaction at that point, so the retry is safe.
+"""
+
+import time
+import logging
+
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def install_liveness_check(engine, idle_seconds: float):
+    """
+    Ping connections idle longer than idle_seconds on checkout (0 pings every checkout).
+    For asyncio engines pass engine.sync_engine.
+    """
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["idle_since"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        # Connections that were just opened have no idle_since and need no ping
+        idle_since = connection_record.info.pop("idle_since", None)
+        if idle_since is None or time.monotonic() - idle_since < idle_seconds:
+            return
+
+        monitor = getattr(engine.pool, "monitor", None)
+        if monitor is not None:
+            monitor.counters["pings"].increment()
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            logger.info(f"Connection idle for {time.monotonic() - idle_since:.0f}s failed its ping: {e}")
+            # The pool invalidates the connection and checks out another one
+            raise exc.DisconnectionError(f"Liveness ping failed: {e}") from e
+
+
+class ReconnectingSession(Session):
+    """Session retrying the first statement of a transaction once if its connection was dead."""
+
+    def execute(self, statement, *args, **kwargs):
+        # Only retry when nothing would be lost by rolling back
+        if self.in_transaction() or self.new or self.dirty or self.deleted:
+            return super().execute(statement, *args, **kwargs)
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except exc.DBAPIError as e:
+            if not e.connection_invalidated:
+                raise
+            logger.warning(f"Connection lost before the first statement of a transaction, retrying: {e.orig}")
+            self.rollback()
+            return super().execute(statement, *args, **kwargs)
@@ -0,0 +1,97 @@
+"""
+Early release of request sessions.
+
+A session checks a connection out of the pool on its first statement, so
+requests that never reach the database (cache hits, validation errors,
+early 4xx) never touch the pool. Once they have, the connection used to be
+held until get_db closed the session, which FastAPI does only after the
+response has been validated, serialized and sent.
+
+get_db and get_async_db register their session on the request context, and
+TimedRoute calls release_sessions when the endpoint function returns:
+
+- after a successful endpoint, a transaction that only read is committed
+  without expiring loaded objects, so serialization can still use them; a
+  lazy load it triggers checks a connection out again;
+- after an exception the transaction is rolled back, as closing the session
+  would have done.
+
+Transactions that may have written something not yet committed are left to
+get_db, so an endpoint's uncommitted changes are never committed here.
+"""
+
+import logging
+from typing import Optional, Union
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.request_context import RequestContext, get_request_context
+
+logger = logging.getLogger(__name__)
+
+
+def track_session(db: Union[Session, AsyncSession]):
+    """Register a session to be released when the current request's endpoint returns."""
+    context = get_request_context()
+    if context is not None:
+        context.sessions.append(db)
+
+
+def _releasable(session: Session) -> bool:
+    """Whether the session holds a transaction that only read."""
+    return (
+        session.in_transaction()
+        and not session.info.get("transaction_wrote")
+        and not (session.new or session.dirty or session.deleted)
+    )
+
+
+def _release(session: Session, failed: bool):
+    if failed:
+        session.rollback()
+    elif _releasable(session):
+        expire_on_commit = session.expire_on_commit
+        session.expire_on_commit = False
+        try:
+            session.commit()
+        finally:
+            session.expire_on_commit = expire_on_commit
+
+
+def release_sessions(context: Optional[RequestContext], failed: bool = False):
+    """Return the connections of the request's sync sessions to the pool."""
+    if context is None:
+        return
+    for db in context.sessions:
+        if isinstance(db, Session) and db.in_transaction():
+            try:
+                _release(db, failed)
+            except Exception as e:
+                # get_db still closes the session; the response must not fail here
+                logger.warning(f"Failed to release session early: {e}")
+
+
+async def release_sessions_async(context: Optional[RequestContext], failed: bool = False):
+    """Return the connections of all the request's sessions to the pool, from the event loop."""
+    if context is None:
+        return
+    for db in context.sessions:
+        if isinstance(db, AsyncSession) and db.in_transaction():
+            session = db.sync_session
+            try:
+                if failed:
+                    await db.rollback()
+                elif _releasable(session):
+                    expire_on_commit = session.expire_on_commit
+                    session.expire_on_commit = False
+                    try:
+                        await db.commit()
+                    finally:
+                        session.expire_on_commit = expire_on_commit
+            except Exception as e:
+                logger.warning(f"Failed to release session early: {e}")
+    if any(isinstance(db, Session) and db.in_transaction() for db in context.sessions):
+        # Committing a sync session blocks on the network: not on the event loop
+        await run_in_threadpool(release_sessions, context, failed)
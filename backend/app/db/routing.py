@@ -0,0 +1,139 @@
+"""
+Read-replica routing.
+
+Sessions are created with a RoutingSession class whose get_bind sends a
+statement to a read replica only when it is safe to:
+
+- the statement is a SELECT without FOR UPDATE/SHARE, or a textual
+  statement marked as a read with execution_options(read_only=True),
+- the session is serving a GET/HEAD request,
+- the request did not ask to read its own writes (X-Read-Your-Writes header,
+  or the cookie set after a successful write by the same client),
+- and the session has not written anything yet.
+
+Everything else (writes, locking selects, reads after either in the same
+session, scripts running outside a request) goes to the primary. A session keeps the replica
+it picked first, so one request reads from a single replica.
+"""
+
+import itertools
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.core.config import settings
+from app.core.request_context import get_request_context
+from app.db.liveness import ReconnectingSession
+
+READ_METHODS = ("GET", "HEAD")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+READ_YOUR_WRITES_HEADER = b"x-read-your-writes"
+READ_YOUR_WRITES_COOKIE = "read_primary"
+# Execution option marking a textual statement (text(), text().columns()) as a read
+READ_ONLY_OPTION = "read_only"
+
+STRATEGY_ROUND_ROBIN = "round_robin"
+STRATEGY_LEAST_LOADED = "least_loaded"
+
+
+class EngineRouter:
+    """Primary engine plus the replicas reads may be spread over."""
+
+    def __init__(self, primary: Engine, replicas: List[Engine], strategy: str = STRATEGY_ROUND_ROBIN):
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self._next = itertools.count()
+
+    def replica(self) -> Engine:
+        if self.strategy == STRATEGY_LEAST_LOADED:
+            return min(self.replicas, key=lambda engine: engine.pool.checkedout())
+        return self.replicas[next(self._next) % len(self.replicas)]
+
+
+def reads_from_replica() -> bool:
+    """Whether the current request may read from a replica."""
+    context = get_request_context()
+    return context is not None and context.method in READ_METHODS and not context.read_primary
+
+
+def is_locking(clause) -> bool:
+    """Whether clause is a SELECT ... FOR UPDATE/SHARE: row locks can only be taken on the primary."""
+    return isinstance(clause, Select) and clause._for_update_arg is not None
+
+
+def is_read(clause) -> bool:
+    """Whether clause only reads: a SELECT without row locks, or a statement marked with READ_ONLY_OPTION."""
+    if isinstance(clause, Select):
+        return not is_locking(clause)
+    return isinstance(clause, Executable) and bool(clause.get_execution_options().get(READ_ONLY_OPTION))
+
+
+class RoutingSession(ReconnectingSession):
+    """Session routing reads to replicas and everything else to the primary (see module docstring)."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        read = is_read(clause)
+        if self._flushing or not read:
+            # Anything but a SELECT may write, so the transaction is not released early
+            # (see app.db.request_session); reset when the transaction ends
+            self.info["transaction_wrote"] = True
+
+        router: Optional[EngineRouter] = self.info.get("router")
+        if router is None or not router.replicas:
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+        if self._flushing or isinstance(clause, UpdateBase) or is_locking(clause):
+            self.info["wrote"] = True
+        if self.info.get("wrote") or not read or not reads_from_replica():
+            return router.primary
+
+        replica = self.info.get("replica")
+        if replica is None:
+            replica = self.info["replica"] = router.replica()
+        return replica
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_transaction_wrote(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("transaction_wrote", None)
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware marking requests that must read from the primary.
+
+    After a successful write the client gets a short-lived cookie, so its
+    next reads are not served by a replica that has not caught up yet.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        context = get_request_context()
+        if scope["type"] != "http" or context is None or not settings.CLOUDSQL_READ_REPLICAS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        cookies = headers.get(b"cookie", b"").decode("latin-1")
+        context.read_primary = (
+            headers.get(READ_YOUR_WRITES_HEADER, b"").lower() in (b"1", b"true")
+            or f"{READ_YOUR_WRITES_COOKIE}=1" in cookies.replace(" ", "").split(";")
+        )
+
+        async def send_wrapper(message):
+            if (message["type"] == "http.response.start"
+                    and context.method in WRITE_METHODS and message["status"] < 400):
+                cookie = (f"{READ_YOUR_WRITES_COOKIE}=1; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                          f"Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
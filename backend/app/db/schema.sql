@@ -1,3 +1,5 @@
+-- Initial schema, applied by app/db/init_db.py. Later changes (indexes,
+-- new tables) are Alembic migrations in backend/alembic/versions.
 CREATE SCHEMA IF NOT EXISTS preproduction;
 SET search_path TO preproduction;
 
@@ -1,89 +1,285 @@
 import time
-from sqlalchemy import create_engine
+import asyncio
+import threading
+from functools import partial
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import QueuePool
-from google.cloud.sql.connector import Connector
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 import os
 import logging
 from google.oauth2 import service_account
 
 from app.core.config import settings
+from app.core.performance_monitor import time_operation
+from app.core.sql_monitor import install_sql_monitor
+from app.core.query_budget import install_query_budget
+from app.core.pool_monitor import InstrumentedQueuePool, InstrumentedAsyncQueuePool, install_pool_monitor
+from app.db.routing import EngineRouter, RoutingSession
+from app.db.liveness import install_liveness_check
+from app.db.request_session import track_session
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize Cloud SQL Python Connector with explicit credentials
-def create_connector():
-    """Create a Cloud SQL Connector with explicit service account credentials."""
+def load_credentials():
+    """Service account credentials from GOOGLE_APPLICATION_CREDENTIALS, or None for the defaults."""
     # Get the service account file path from environment
     credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
     if credentials_path and os.path.exists(credentials_path):
         logger.info(f"Using service account credentials from: {credentials_path}")
         # Load credentials from service account file
-        credentials = service_account.Credentials.from_service_account_file(
+        return service_account.Credentials.from_service_account_file(
             credentials_path,
             scopes=["https://www.googleapis.com/auth/cloud-platform"]
         )
-        return Connector(credentials=credentials)
-    else:
-        logger.warning("No service account file found, using default credentials")
-        # Fallback to default credentials (for development)
-        return Connector()
+    logger.warning("No service account file found, using default credentials")
+    # Fallback to default credentials (for development)
+    return None
+
+# Initialize Cloud SQL Python Connector with explicit credentials
+def create_connector(**kwargs):
+    """Create a Cloud SQL Connector with explicit service account credentials."""
+    # Imported here: the connector pulls in aiohttp and starts a background
+    # thread, neither of which belongs in a preloaded (pre-fork) app image
+    from google.cloud.sql.connector import Connector
+    return Connector(credentials=load_credentials(), **kwargs)
 
-connector = create_connector()
+# Created on the first connection of each process, see get_connector()
+connector = None
+_connector_lock = threading.Lock()
 
-def getconn():
+def get_connector():
+    """The process's Cloud SQL Connector, created on first use."""
+    global connector
+    if connector is None:
+        with _connector_lock:
+            if connector is None:
+                connector = create_connector()
+    return connector
+
+def getconn(instance: Optional[str] = None):
     """
     Get a database connection using Cloud SQL Python Connector.
     """
+    instance = instance or settings.CLOUDSQL_INSTANCE
     try:
-        logger.debug(f"Connecting to Cloud SQL instance: {settings.CLOUDSQL_INSTANCE}")
+        logger.debug(f"Connecting to Cloud SQL instance: {instance}")
         logger.debug(f"Database: {settings.DB_NAME}, User: {settings.DB_USER}")
         
         # Use the correct parameter format for pg8000
-        conn = connector.connect(
-            settings.CLOUDSQL_INSTANCE,
-            "pg8000",
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            db=settings.DB_NAME,
-            ip_type=settings.CONNECTION_TYPE,
-        )
+        with time_operation("connection"):
+            conn = get_connector().connect(
+                instance,
+                "pg8000",
+                user=settings.DB_USER,
+                password=settings.DB_PASSWORD,
+                db=settings.DB_NAME,
+                ip_type=settings.CONNECTION_TYPE,
+            )
         logger.debug("Successfully connected to Cloud SQL")
         return conn
     except Exception as e:
         logger.error(f"Failed to connect to Cloud SQL: {str(e)}")
-        logger.error(f"Instance: {settings.CLOUDSQL_INSTANCE}")
+        logger.error(f"Instance: {instance}")
         logger.error(f"Database: {settings.DB_NAME}")
         logger.error(f"User: {settings.DB_USER}")
         raise
 
-# Create engine with Cloud SQL Connector
-engine = create_engine(
-    "postgresql+pg8000://",
-    creator=getconn,
-    poolclass=QueuePool,
-    pool_size=settings.DB_POOL_SIZE,
-    max_overflow=settings.DB_MAX_OVERFLOW,
-    pool_timeout=settings.DB_POOL_TIMEOUT,
-    pool_recycle=settings.DB_POOL_RECYCLE,
-    pool_pre_ping=True,  # Verify connections before use
-    echo=False,  # Set to False for production to reduce overhead
+def install_connect_timing(engine):
+    """
+    Time the connections a DSN engine opens, as getconn / getconn_async do for
+    the connector. do_connect only fires for engines without a creator, so no
+    connection is counted twice.
+    """
+
+    @event.listens_for(engine, "do_connect")
+    def timed_connect(dialect, connection_record, cargs, cparams):
+        with time_operation("connection"):
+            return dialect.connect(*cargs, **cparams)
+
+def install_engine_hooks(engine, name: str):
+    """Attach query budgets, statement timing, pool telemetry and liveness checks to a (sync) engine."""
+    # Budget check first, so a statement it rejects is never timed
+    install_query_budget(engine)
+    install_sql_monitor(engine)
+    install_pool_monitor(engine, name=name)
+    install_liveness_check(engine, settings.DB_PING_IDLE_SECONDS)
+    install_connect_timing(engine)
+
+# SQLAlchemy dialect per sync driver; the Cloud SQL connector only provides pg8000 connections
+SYNC_DRIVERS = {
+    "pg8000": "postgresql+pg8000",
+    "psycopg": "postgresql+psycopg",
+    "psycopg2": "postgresql+psycopg2",
+}
+ASYNC_DRIVER = "postgresql+asyncpg"
+
+def is_dsn(target: str) -> bool:
+    """Whether an engine target is a DSN rather than a Cloud SQL instance connection name."""
+    return "://" in target
+
+def pool_options() -> dict:
+    return dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        # Idle connections are pinged on checkout instead, see app.db.liveness
+        pool_pre_ping=False,
+        echo=False,  # Set to False for production to reduce overhead
+    )
+
+def create_db_engine(target: str, name: str, driver: Optional[str] = None):
+    """
+    Create a sync engine for a Cloud SQL instance (through the connector) or a DSN.
+    """
+    driver = driver or settings.DB_DRIVER
+    if driver not in SYNC_DRIVERS:
+        raise ValueError(f"Unknown DB_DRIVER {driver!r}, expected one of {', '.join(SYNC_DRIVERS)}")
+    if is_dsn(target):
+        engine = create_engine(
+            make_url(target).set(drivername=SYNC_DRIVERS[driver]),
+            poolclass=InstrumentedQueuePool,
+            **pool_options(),
+        )
+    elif driver == "pg8000":
+        engine = create_engine(
+            "postgresql+pg8000://",
+            creator=partial(getconn, target),
+            poolclass=InstrumentedQueuePool,
+            **pool_options(),
+        )
+    else:
+        raise ValueError(f"DB_DRIVER {driver!r} needs a DSN (DATABASE_URL); the Cloud SQL connector only supports pg8000")
+    install_engine_hooks(engine, name)
+    return engine
+
+# The asyncpg connector must run on the application's event loop, so it is
+# created on the first async connection rather than at import
+async_connector = None
+
+async def getconn_async(instance: Optional[str] = None):
+    """
+    Get an asyncpg connection using the Cloud SQL Python Connector.
+    """
+    global async_connector
+    if async_connector is None:
+        async_connector = create_connector(loop=asyncio.get_running_loop())
+    instance = instance or settings.CLOUDSQL_INSTANCE
+    try:
+        with time_operation("connection"):
+            return await async_connector.connect_async(
+                instance,
+                "asyncpg",
+                user=settings.DB_USER,
+                password=settings.DB_PASSWORD,
+                db=settings.DB_NAME,
+                ip_type=settings.CONNECTION_TYPE,
+            )
+    except Exception as e:
+        logger.error(f"Failed to connect to Cloud SQL instance {instance} (asyncpg): {str(e)}")
+        raise
+
+def create_async_db_engine(target: str, name: str):
+    """Create an asyncpg engine for a Cloud SQL instance (through the connector) or a DSN."""
+    if is_dsn(target):
+        engine = create_async_engine(
+            make_url(target).set(drivername=ASYNC_DRIVER),
+            poolclass=InstrumentedAsyncQueuePool,
+            **pool_options(),
+        )
+    else:
+        engine = create_async_engine(
+            f"{ASYNC_DRIVER}://",
+            async_creator=partial(getconn_async, target),
+            poolclass=InstrumentedAsyncQueuePool,
+            **pool_options(),
+        )
+    # Event hooks live on the sync engine wrapped by the async one
+    install_engine_hooks(engine.sync_engine, name)
+    return engine
+
+# Primary engines, plus one pair per read replica
+primary_target = settings.DATABASE_URL or settings.CLOUDSQL_INSTANCE
+engine = create_db_engine(primary_target, "primary")
+# Async engine for the read endpoints that run on the event loop
+async_engine = create_async_db_engine(primary_target, "primary-async")
+
+replica_engines = [
+    create_db_engine(target, f"replica{index}")
+    for index, target in enumerate(settings.CLOUDSQL_READ_REPLICAS, start=1)
+]
+async_replica_engines = [
+    create_async_db_engine(target, f"replica{index}-async")
+    for index, target in enumerate(settings.CLOUDSQL_READ_REPLICAS, start=1)
+]
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    info={"router": EngineRouter(engine, replica_engines, settings.DB_REPLICA_STRATEGY)},
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+    info={"router": EngineRouter(
+        async_engine.sync_engine,
+        [replica.sync_engine for replica in async_replica_engines],
+        settings.DB_REPLICA_STRATEGY
+    )},
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _reset_after_fork():
+    """Drop connector and pooled connections inherited from the parent (gunicorn --preload)."""
+    global connector, _connector_lock, async_connector
+    connector = None
+    async_connector = None
+    _connector_lock = threading.Lock()
+    # close=False leaves the parent's sockets alone; the child opens its own
+    for db_engine in [engine, *replica_engines]:
+        db_engine.dispose(close=False)
+    for async_db_engine in [async_engine, *async_replica_engines]:
+        async_db_engine.sync_engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
 Base = declarative_base()
 
 def get_db():
+    # No connection is checked out until the first statement
     db = SessionLocal()
+    track_session(db)
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        track_session(db)
+        yield db
+
 # Cleanup function for the connector
 def cleanup_connector():
     """Clean up the Cloud SQL connector when the application shuts down."""
+    global connector
     if connector:
-        connector.close() 
\ No newline at end of file
+        connector.close()
+        connector = None
+
+async def cleanup_async_connector():
+    """Close the async engine's connections and its connector; must run on the application's event loop."""
+    global async_connector
+    for async_db_engine in [async_engine, *async_replica_engines]:
+        await async_db_engine.dispose()
+    if async_connector is not None:
+        await async_connector.close_async()
+        async_connector = None 
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Connection pool warm-up.
+
+A new Cloud SQL connection costs an ephemeral certificate fetch, a TLS
+handshake and authentication. Rather than letting the first requests after a
+deploy or scale-up pay for that, startup opens DB_POOL_SIZE connections per
+engine in parallel, validates each with SELECT 1 and returns them to the
+pool.
+
+Warm-up runs in the background, so the server answers probes meanwhile:
+/ready returns 503 until every pool validated at least one connection. A
+failed attempt (a pool without any connection, e.g. the database is not
+reachable yet) is retried every DB_POOL_WARMUP_RETRY_SECONDS. Each attempt
+waits at most DB_POOL_WARMUP_TIMEOUT per pool; connections still opening by
+then are closed when they arrive, on daemon threads that cannot hold up
+shutdown.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.db.session import engine, async_engine, replica_engines, async_replica_engines
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_QUERY = "SELECT 1"
+
+
+def warm_up_engine(db_engine: Engine, size: int, timeout: float) -> Tuple[int, List[str]]:
+    """Open size connections in parallel and validate them within timeout; returns (opened, errors)."""
+    connections, errors = [], []
+    lock = threading.Lock()
+    gave_up = False
+
+    def open_connection():
+        try:
+            connection = db_engine.connect()
+            try:
+                connection.exec_driver_sql(VALIDATION_QUERY)
+            except Exception:
+                connection.close()
+                raise
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        with lock:
+            if not gave_up:
+                connections.append(connection)
+                return
+        connection.close()
+
+    # Hold every connection until all are open, so the pool ends up with size distinct ones
+    threads = [
+        threading.Thread(target=open_connection, name=f"pool-warm-up-{index}", daemon=True)
+        for index in range(size)
+    ]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    with lock:
+        gave_up = True
+        opened = list(connections)
+        pending = sum(thread.is_alive() for thread in threads)
+    for connection in opened:
+        connection.close()
+    if pending:
+        errors.append(f"{pending} connections still opening after {timeout}s")
+    return len(opened), errors
+
+
+async def warm_up_async_engine(db_engine: AsyncEngine, size: int, timeout: float) -> Tuple[int, List[str]]:
+    """Async counterpart of warm_up_engine."""
+    async def open_connection():
+        connection = await db_engine.connect()
+        try:
+            await connection.exec_driver_sql(VALIDATION_QUERY)
+        except Exception:
+            await connection.close()
+            raise
+        return connection
+
+    tasks = [asyncio.create_task(open_connection()) for _ in range(size)]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    connections = [task.result() for task in done if task.exception() is None]
+    errors = [str(task.exception()) for task in done if task.exception() is not None]
+    for connection in connections:
+        await connection.close()
+    if pending:
+        errors.append(f"{len(pending)} connections still opening after {timeout}s")
+    return len(connections), errors
+
+
+class PoolWarmUp:
+    """Warms every engine's pool in the background and tracks whether the application is ready."""
+
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.results: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _timed(self, name: str, warm_up) -> None:
+        start_time = time.perf_counter()
+        opened, errors = await warm_up
+        self.results[name] = {
+            "connections": opened,
+            "errors": errors[:5],
+            "duration": round(time.perf_counter() - start_time, 3),
+        }
+        if errors:
+            logger.warning(f"Pool warm-up for {name}: {len(errors)} of {opened + len(errors)} connections failed: {errors[0]}")
+
+    def failed_pools(self) -> List[str]:
+        """Pools of the last attempt that did not validate a single connection."""
+        return [name for name, result in self.results.items() if result["connections"] == 0]
+
+    async def attempt(self) -> bool:
+        """One warm-up of every pool; whether each of them validated at least one connection."""
+        size, timeout = settings.DB_POOL_SIZE, settings.DB_POOL_WARMUP_TIMEOUT
+        warm_ups = [self._timed("primary", asyncio.to_thread(warm_up_engine, engine, size, timeout)),
+                    self._timed("primary-async", warm_up_async_engine(async_engine, size, timeout))]
+        for index, (replica, async_replica) in enumerate(zip(replica_engines, async_replica_engines), start=1):
+            warm_ups.append(self._timed(f"replica{index}", asyncio.to_thread(warm_up_engine, replica, size, timeout)))
+            warm_ups.append(self._timed(f"replica{index}-async", warm_up_async_engine(async_replica, size, timeout)))
+
+        self.attempts += 1
+        start_time = time.perf_counter()
+        await asyncio.gather(*warm_ups)
+        logger.info(f"Pool warm-up attempt {self.attempts} finished in "
+                    f"{time.perf_counter() - start_time:.3f}s: {self.results}")
+        return not self.failed_pools()
+
+    async def run(self):
+        """Warm up all pools until an attempt succeeds; the application is ready afterwards."""
+        if not settings.DB_POOL_WARMUP or settings.DB_POOL_SIZE <= 0:
+            self.ready = True
+            return
+        while not await self.attempt():
+            logger.warning(f"Pool warm-up failed for {', '.join(self.failed_pools())}, "
+                           f"retrying in {settings.DB_POOL_WARMUP_RETRY_SECONDS}s")
+            await asyncio.sleep(settings.DB_POOL_WARMUP_RETRY_SECONDS)
+        self.ready = True
+
+    def start(self):
+        """Run the warm-up in the background of the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global warm-up state, started from the application's startup event
+pool_warm_up = PoolWarmUp()
@@ -1,15 +1,22 @@
 from urllib.parse import urlparse
-from app.core.auth import User, create_access_token, get_current_user, oauth, AuthRequest
+from app.core.auth import User, create_access_token, get_current_user, get_oauth, AuthRequest
 from fastapi import FastAPI, Request, Response, status, HTTPException, Depends
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse, JSONResponse
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 import atexit
 
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.db.session import cleanup_connector
-from app.core.performance_monitor import get_performance_stats, log_performance_stats
+from app.db.session import cleanup_connector, cleanup_async_connector
+from app.db.routing import ReadYourWritesMiddleware
+from app.db.warmup import pool_warm_up
+from app.core.request_metrics import RequestMetricsMiddleware
+from app.core.shared_stats import shared_stats_publisher, get_health_stats, get_instance_stats, render_instance_metrics
+from app.core.profiler import ProfilingMiddleware, profile_store, collapsed_stacks, require_profiling_token
+from app.core.pagination import InvalidCursor, NEXT_CURSOR_HEADER
+from app.core.etag import NotModified, ETAG_HEADER, not_modified_response
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -24,6 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],
 )
 
 app.add_middleware(
@@ -31,18 +39,39 @@ app.add_middleware(
     secret_key=settings.GOOGLE_AUTH_SECRET_KEY
 )
 
+app.add_middleware(ProfilingMiddleware)
+
+# Needs the request context opened by RequestMetricsMiddleware
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Outermost middleware, so per-route latency covers the whole stack
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)})
+
+@app.exception_handler(NotModified)
+async def not_modified_handler(request: Request, exc: NotModified):
+    return not_modified_response(exc.etag)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize application startup."""
     print("🚀 Starting mimic hub API")
+    shared_stats_publisher.start()
+    pool_warm_up.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on application shutdown."""
     print("🛑 Shutting down mimic hub API")
+    shared_stats_publisher.stop()
+    await pool_warm_up.stop()
+    await cleanup_async_connector()
     cleanup_connector()
 
 # Register cleanup function for graceful shutdown
@@ -52,33 +81,64 @@ atexit.register(cleanup_connector)
 async def root():
     return {"message": "Welcome to mimic hub API"}
 
+def windows_ms(metric_stats: dict) -> dict:
+    """Per-window latency percentiles converted to milliseconds."""
+    return {
+        label: {
+            "count": window["count"],
+            "p50_ms": round(window["p50"] * 1000, 2),
+            "p90_ms": round(window["p90"] * 1000, 2),
+            "p99_ms": round(window["p99"] * 1000, 2),
+            "max_ms": round(window["max_time"] * 1000, 2)
+        }
+        for label, window in metric_stats["windows"].items()
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until a warm-up of the connection pools has succeeded."""
+    if not pool_warm_up.ready:
+        return JSONResponse(status_code=503, content={
+            "status": "warming_up", "attempts": pool_warm_up.attempts, "pools": pool_warm_up.results
+        })
+    return {"status": "ready", "pools": pool_warm_up.results}
+
 @app.get("/health")
 async def health_check():
-    """Enhanced health check with performance metrics."""
-    performance_stats = get_performance_stats()
+    """Enhanced health check with performance metrics, aggregated across workers (see get_health_stats)."""
+    instance_stats = get_health_stats()
+    performance_stats = instance_stats["performance"]
     
     return {
         "status": "healthy",
         "version": settings.VERSION,
         "database": "Cloud SQL Connector",
+        "workers": len(instance_stats["workers"]),
         "performance": {
             "connections": {
                 "total": performance_stats["connections"]["count"],
-                "average_time_ms": round(performance_stats["connections"]["avg_time"] * 1000, 2)
+                "average_time_ms": round(performance_stats["connections"]["avg_time"] * 1000, 2),
+                "windows": windows_ms(performance_stats["connections"])
             },
             "queries": {
                 "total": performance_stats["queries"]["count"],
-                "average_time_ms": round(performance_stats["queries"]["avg_time"] * 1000, 2)
+                "average_time_ms": round(performance_stats["queries"]["avg_time"] * 1000, 2),
+                "windows": windows_ms(performance_stats["queries"])
             }
         }
     }
 
 @app.get("/performance")
 async def performance_metrics():
-    """Detailed performance metrics endpoint."""
-    stats = get_performance_stats()
+    """Detailed performance metrics endpoint, aggregated across workers."""
+    instance_stats = get_instance_stats()
     return {
-        "database_performance": stats,
+        "workers": instance_stats["workers"],
+        "database_performance": instance_stats["performance"],
+        "requests": instance_stats["requests"],
+        "slow_queries": instance_stats["slow_queries"],
+        "pools": instance_stats["pools"],
+        "response_caches": instance_stats["caches"],
         "connection_method": "Cloud SQL Python Connector",
         "pool_settings": {
             "pool_size": settings.DB_POOL_SIZE,
@@ -86,7 +146,27 @@ async def performance_metrics():
             "pool_timeout": settings.DB_POOL_TIMEOUT,
             "pool_recycle": settings.DB_POOL_RECYCLE
         }
-    } 
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-route request metrics for all workers, in the Prometheus text exposition format."""
+    return PlainTextResponse(render_instance_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/performance/profiles", dependencies=[Depends(require_profiling_token)])
+async def list_profiles():
+    """Request profiles captured with the X-Profile header, newest first."""
+    return profile_store.list()
+
+@app.get("/performance/profiles/{profile_id}", dependencies=[Depends(require_profiling_token)])
+async def download_profile(profile_id: str, format: Optional[str] = None):
+    """Download a profile as JSON, or as collapsed stacks with ?format=collapsed."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(profile))
+    return profile
 
 @app.get("/auth/login/google")
 async def login_google(request: Request):
@@ -112,7 +192,7 @@ async def login_google(request: Request):
             detail=f"Origin {parsed_origin} not allowed"
         )
 
-    return await oauth.google.authorize_redirect(request, f"{settings.BACKEND_URL}/auth/google/callback")
+    return await get_oauth().google.authorize_redirect(request, f"{settings.BACKEND_URL}/auth/google/callback")
 
 @app.get("/auth/google/callback")
 async def auth_google_callback(request: Request):
@@ -122,7 +202,7 @@ async def auth_google_callback(request: Request):
     """
     try:
         # This now works correctly because the code is in the request's query params
-        token = await oauth.google.authorize_access_token(request)
+        token = await get_oauth().google.authorize_access_token(request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Could not log in: {e}")
 
@@ -12,6 +12,8 @@ from app.models.task_variants_to_subdatasets import TaskVariantsToSubdatasets
 from app.models.episode_conversion_version import EpisodeConversionVersion
 from app.models.item import Item
 from app.models.task_variant_to_items import TaskVariantToItems
+from app.models.subdataset_episode_stats import SubdatasetEpisodeStats, SubdatasetProcessedEpisodeStats
+from app.models.table_version import TableVersion
 
 __all__ = [
     "Task",
@@ -28,5 +30,8 @@ __all__ = [
     "Episode",
     "EpisodeConversionVersion",
     "Item",
-    "TaskVariantToItems"
+    "TaskVariantToItems",
+    "SubdatasetEpisodeStats",
+    "SubdatasetProcessedEpisodeStats",
+    "TableVersion"
 ] 
\ No newline at end of file
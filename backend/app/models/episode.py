@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 from app.models.episode_conversion_version import EpisodeConversionVersion
 
 class Episode(Base):
     __tablename__ = "episodes"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_episodes_subdataset_id_id", "subdataset_id", "id"),
+        Index("ix_episodes_raw_episode_id", "raw_episode_id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subdataset_id = Column(Integer, ForeignKey("preproduction.subdatasets.id", ondelete="CASCADE"))
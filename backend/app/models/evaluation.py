@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from app.db.session import Base
 
 class Evaluation(Base):
     __tablename__ = "evaluations"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_evaluations_task_id", "task_id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("preproduction.tasks.id"))
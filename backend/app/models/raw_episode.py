@@ -1,11 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Index
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base
 
 class RawEpisode(Base):
     __tablename__ = "raw_episodes"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_raw_episodes_subdataset_id_id", "subdataset_id", "id"),
+        Index("ix_raw_episodes_subdataset_id_label_id", "subdataset_id", "label", "id"),
+        Index("ix_raw_episodes_label_id", "label", "id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subdataset_id = Column(Integer, ForeignKey("preproduction.subdatasets.id", ondelete="CASCADE"))
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, ForeignKey
+
+from app.db.session import Base
+
+# Maintained by triggers on raw_episodes and episodes (alembic revision 0003);
+# never written by the API
+class SubdatasetEpisodeStats(Base):
+    __tablename__ = "subdataset_episode_stats"
+    __table_args__ = {"schema": "preproduction"}
+
+    subdataset_id = Column(Integer, ForeignKey("preproduction.subdatasets.id", ondelete="CASCADE"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    good = Column(Integer, nullable=False, default=0)
+    bad = Column(Integer, nullable=False, default=0)
+    contains_correction = Column(Integer, nullable=False, default=0)
+    corrupted = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+
+class SubdatasetProcessedEpisodeStats(Base):
+    __tablename__ = "subdataset_processed_episode_stats"
+    __table_args__ = {"schema": "preproduction"}
+
+    subdataset_id = Column(Integer, ForeignKey("preproduction.subdatasets.id", ondelete="CASCADE"), primary_key=True)
+    conversion_version_id = Column(
+        Integer, ForeignKey("preproduction.episode_conversion_versions.id", ondelete="CASCADE"), primary_key=True
+    )
+    total = Column(Integer, nullable=False, default=0)
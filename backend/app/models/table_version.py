@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, BigInteger
+
+from app.db.session import Base
+
+# One change counter per table, bumped when a transaction writing the table
+# commits (alembic revisions 0005, 0006); never written by the API
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    __table_args__ = {"schema": "preproduction"}
+
+    table_name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
@@ -1,11 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, func, Index
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base
 
 class Task(Base):
     __tablename__ = "tasks"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_tasks_status_id", "status", "id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
@@ -13,6 +16,8 @@ class Task(Base):
     status = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_external = Column(Boolean)
+    # Bumped by triggers on every write to the task detail graph (alembic 0004)
+    version = Column(BigInteger, nullable=False, server_default="1")
 
     # Relationships
     variants = relationship("TaskVariant", back_populates="task", cascade="all, delete-orphan") 
\ No newline at end of file
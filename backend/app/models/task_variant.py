@@ -1,11 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, ARRAY
+from sqlalchemy import Column, Integer, String, ForeignKey, ARRAY, Index
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base
 
 class TaskVariant(Base):
     __tablename__ = "task_variants"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_task_variants_task_id_id", "task_id", "id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("preproduction.tasks.id", ondelete="CASCADE"))
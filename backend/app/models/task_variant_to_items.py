@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, PrimaryKeyConstraint
+from sqlalchemy import Column, Integer, ForeignKey, PrimaryKeyConstraint, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -16,5 +16,6 @@ class TaskVariantToItems(Base):
     
     __table_args__ = (
         PrimaryKeyConstraint('task_variant_id', 'item_id'),
+        Index('ix_task_variant_to_items_item_id', 'item_id'),
         {"schema": "preproduction"}
     ) 
\ No newline at end of file
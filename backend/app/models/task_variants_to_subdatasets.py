@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from app.db.session import Base
 
 class TaskVariantsToSubdatasets(Base):
     __tablename__ = "task_variants_to_subdatasets"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_task_variants_to_subdatasets_task_variant_id_subdataset_id", "task_variant_id", "subdataset_id"),
+        Index("ix_task_variants_to_subdatasets_subdataset_id", "subdataset_id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_variant_id = Column(Integer, ForeignKey("preproduction.task_variants.id", ondelete="CASCADE"), nullable=False)
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from app.db.session import Base
 
 class TasksToSubdatasets(Base):
     __tablename__ = "tasks_to_subdatasets"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_tasks_to_subdatasets_subdataset_id", "subdataset_id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("preproduction.tasks.id", ondelete="CASCADE"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from app.db.session import Base
 
 class TrainingRun(Base):
@@ -11,7 +11,10 @@ class TrainingRun(Base):
 
 class TrainingRunsToTasks(Base):
     __tablename__ = "training_runs_to_tasks"
-    __table_args__ = {"schema": "preproduction"}
+    __table_args__ = (
+        Index("ix_training_runs_to_tasks_task_id", "task_id"),
+        {"schema": "preproduction"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     training_run_id = Column(Integer, ForeignKey("preproduction.training_runs.id", ondelete="CASCADE"), nullable=False)
@@ -53,20 +53,35 @@ class SubdatasetList(SubdatasetBase):
     class Config:
         from_attributes = True
 
+class SubdatasetListWithStats(SubdatasetList):
+    episode_stats: "EpisodeStats"
+
 class Subdataset(SubdatasetBase):
     id: int
     embodiment: Optional[EmbodimentInfo] = None
     teleop_mode: Optional[TeleopModeInfo] = None
     raw_episodes: List["RawEpisode"] = []
+    # Set when raw_episodes is only the first page (episode_limit); with
+    # episode_limit=0, the cursor of the first page
+    raw_episodes_next_cursor: Optional[str] = None
     episode_stats: Optional["EpisodeStats"] = None
 
     class Config:
         from_attributes = True
 
+class ProcessedEpisodeCount(BaseModel):
+    conversion_version_id: int
+    total: int
+
 class EpisodeStats(BaseModel):
     total: int
     good: int
     bad: int
+    contains_correction: int = 0
+    corrupted: int = 0
+    processed: int = 0
+    processed_by_version: List[ProcessedEpisodeCount] = []
 
 # Update forward references
+SubdatasetListWithStats.model_rebuild()
 Subdataset.model_rebuild() 
\ No newline at end of file
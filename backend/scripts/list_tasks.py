@@ -6,7 +6,7 @@ from datetime import datetime
 # Add the parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from app.db.session import SessionLocal
 from app.models.task import Task
 from app.models.task_variant import TaskVariant
@@ -19,7 +19,7 @@ def datetime_handler(x):
 def list_tasks():
     db = SessionLocal()
     try:
-        tasks = db.query(Task).all()
+        tasks = db.query(Task).options(selectinload(Task.variants)).all()
         
         if not tasks:
             print(json.dumps({"tasks": []}))
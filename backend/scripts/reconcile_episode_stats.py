@@ -0,0 +1,43 @@
+"""
+Rebuild the per subdataset episode stats (subdataset_episode_stats and
+subdataset_processed_episode_stats) from raw_episodes and episodes.
+
+The tables are maintained by triggers, so this is only needed after the
+triggers were disabled or rows were changed with session_replication_role
+= replica. Writes to raw_episodes and episodes wait while it runs.
+
+    python scripts/reconcile_episode_stats.py [--subdataset-id ID ...] [--dry-run]
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.db.session import SessionLocal
+from app.crud.subdataset import rebuild_episode_stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subdataset-id", type=int, action="append", dest="subdataset_ids",
+                        help="Only recount this subdataset (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Report drifted subdatasets without fixing them")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        drifted = rebuild_episode_stats(db, args.subdataset_ids)
+        if args.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    finally:
+        db.close()
+
+    action = "drifted" if args.dry_run else "fixed"
+    print(f"{len(drifted)} subdataset(s) {action}" + (f": {', '.join(map(str, drifted))}" if drifted else ""))
+
+if __name__ == "__main__":
+    main()
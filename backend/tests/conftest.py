@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+# Add the backend directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Settings only need to validate; tests that talk to a database bring their own URL
+DUMMY_ENV = {
+    "CLOUDSQL_INSTANCE": "project:region:instance",
+    "DB_NAME": "iliad",
+    "DB_USER": "iliad",
+    "DB_PASSWORD": "iliad",
+    "CONNECTION_TYPE": "PUBLIC",
+    "BACKEND_URL": "http://localhost:8000",
+    "GOOGLE_AUTH_CLIENT_ID": "client-id",
+    "GOOGLE_AUTH_CLIENT_SECRET": "client-secret",
+    "GOOGLE_AUTH_SECRET_KEY": "secret-key",
+    "GOOGLE_AUTH_ALLOWED_DOMAINS": "example.com",
+    "GOOGLE_AUTH_ALLOWED_ORIGINS": "http://localhost:3000",
+    "GCP_MEDIA_BUCKET_NAME": "bucket",
+}
+
+for name, value in DUMMY_ENV.items():
+    os.environ.setdefault(name, value)
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """
+    Engine on TEST_DATABASE_URL with the schema created (app/db/schema.sql)
+    and migrated to head. Tests using it are skipped without TEST_DATABASE_URL.
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL (a disposable Postgres) not set")
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.begin() as connection:
+        if connection.execute(text("SELECT to_regclass('preproduction.tasks')")).scalar() is None:
+            connection.exec_driver_sql((BACKEND_DIR / "app" / "db" / "schema.sql").read_text())
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", TEST_DATABASE_URL.replace("%", "%%"))
+    command.upgrade(config, "head")
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def connection(engine):
+    """Connection in a transaction that is rolled back after the test."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def insert(connection):
+    """insert(statement, **parameters) -> id of the row an INSERT adds on the test's connection."""
+    def insert(statement: str, **parameters):
+        return connection.execute(text(statement + " RETURNING id"), parameters).scalar()
+
+    return insert
+
+
+@pytest.fixture
+def db(connection):
+    """Session on the test's connection; its commits are savepoints, rolled back with the test."""
+    with Session(bind=connection, join_transaction_mode="create_savepoint") as db:
+        yield db
+
+
+@pytest.fixture
+def client(db):
+    """
+    call(method, path, headers=None, json_body=None) -> (status, headers, body):
+    a request served in process by the app (starlette's TestClient does not
+    run on the installed httpx). Sync routes use the test's session; async
+    routes get their own asyncpg session, which only sees committed rows.
+    """
+    from app.db.session import ASYNC_DRIVER, get_async_db, get_db
+    from app.main import app
+
+    # No pooled connections: each call runs on its own event loop
+    async_engine = create_async_engine(make_url(TEST_DATABASE_URL).set(drivername=ASYNC_DRIVER), poolclass=NullPool)
+
+    async def get_test_async_db():
+        async with AsyncSession(async_engine) as async_db:
+            yield async_db
+
+    def call(method: str, path: str, headers: dict = None, json_body=None):
+        path, _, query = path.partition("?")
+        body = b"" if json_body is None else json.dumps(json_body).encode()
+        headers = {**(headers or {}), **({"Content-Type": "application/json"} if body else {})}
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+            "method": method, "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(b"host", b"testserver")] + [
+                (name.lower().encode(), value.encode()) for name, value in headers.items()
+            ],
+            "client": ("testclient", 50000), "server": ("testserver", 80),
+        }
+        asyncio.run(app(scope, receive, send))
+        start = next(message for message in messages if message["type"] == "http.response.start")
+        return (
+            start["status"],
+            {name.decode(): value.decode() for name, value in start["headers"]},
+            b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body"),
+        )
+
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_async_db] = get_test_async_db
+    yield call
+    app.dependency_overrides.pop(get_db)
+    app.dependency_overrides.pop(get_async_db)
+    asyncio.run(async_engine.dispose())
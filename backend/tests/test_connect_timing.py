@@ -0,0 +1,78 @@
+"""
+Connection creation time of the engines built by app.db.session, recorded in
+performance_monitor's "connections" metric.
+
+Needs a local Postgres:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_connect_timing.py
+"""
+
+import asyncio
+
+import pg8000
+import pytest
+from sqlalchemy import text
+
+from app.core.performance_monitor import performance_monitor
+from app.core.pool_monitor import pool_monitors
+from app.db import session
+from app.db.session import create_async_db_engine, create_db_engine
+
+
+@pytest.fixture
+def url(engine):
+    yield engine.url.render_as_string(hide_password=False)
+    for name in ("timing", "timing-async", "timing-connector"):
+        pool_monitors.pop(name, None)
+
+
+class LocalConnector:
+    """Stands in for the Cloud SQL connector, opening pg8000 connections to the test database."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def connect(self, instance, driver, **kwargs):
+        host = self.url.query.get("host")
+        return pg8000.connect(
+            user=self.url.username, password=self.url.password, database=self.url.database,
+            # A host directory is a unix socket
+            unix_sock=f"{host}/.s.PGSQL.{self.url.port or 5432}" if host else None,
+            host=self.url.host or "localhost", port=self.url.port or 5432,
+        )
+
+
+def test_dsn_engine_times_new_connections(url):
+    timed_engine = create_db_engine(url, "timing", driver="psycopg2")
+    connections = performance_monitor.total_connections
+    for _ in range(2):
+        with timed_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    timed_engine.dispose()
+    # The second checkout reuses the pooled connection
+    assert performance_monitor.total_connections == connections + 1
+
+
+def test_async_dsn_engine_times_new_connections(url):
+    timed_engine = create_async_db_engine(url, "timing-async")
+    connections = performance_monitor.total_connections
+
+    async def connect():
+        for _ in range(2):
+            async with timed_engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        await timed_engine.dispose()
+
+    asyncio.run(connect())
+    assert performance_monitor.total_connections == connections + 1
+
+
+def test_connector_engine_counts_each_connection_once(engine, url, monkeypatch):
+    monkeypatch.setattr(session, "get_connector", lambda: LocalConnector(engine.url))
+    timed_engine = create_db_engine("project:region:instance", "timing-connector", driver="pg8000")
+    connections = performance_monitor.total_connections
+    with timed_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    timed_engine.dispose()
+    # Timed in getconn; do_connect does not fire for an engine with a creator
+    assert performance_monitor.total_connections == connections + 1
@@ -0,0 +1,145 @@
+"""
+Per subdataset episode counters: the raw_episodes / episodes triggers of
+alembic 0003 and rebuild_episode_stats (scripts/reconcile_episode_stats.py).
+
+Needs a local Postgres migrated to head:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_episode_stats.py
+
+Every test runs in a transaction that is rolled back.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from app.crud import subdataset as subdataset_crud
+
+
+@pytest.fixture
+def ids(insert):
+    """Two subdatasets without episodes and two conversion versions."""
+    return {
+        "subdataset": insert("INSERT INTO preproduction.subdatasets (name) VALUES ('stats-subdataset')"),
+        "other_subdataset": insert("INSERT INTO preproduction.subdatasets (name) VALUES ('stats-other')"),
+        "version": insert("INSERT INTO preproduction.episode_conversion_versions (version) VALUES ('stats-v1')"),
+        "other_version": insert("INSERT INTO preproduction.episode_conversion_versions (version) VALUES ('stats-v2')"),
+    }
+
+
+def stats(db, subdataset_id: int) -> dict:
+    """The subdataset's EpisodeStats as served, processed_by_version as {version id: count}."""
+    episode_stats = subdataset_crud.episode_stats_by_subdataset(
+        [subdataset_id], db.execute(subdataset_crud.episode_stats_query([subdataset_id]))
+    )[subdataset_id]
+    return {
+        **episode_stats.model_dump(exclude={"processed_by_version"}),
+        "processed_by_version": {
+            count.conversion_version_id: count.total for count in episode_stats.processed_by_version
+        },
+    }
+
+
+def counts(total=0, good=0, bad=0, contains_correction=0, corrupted=0, processed=0, processed_by_version=None):
+    return {
+        "total": total, "good": good, "bad": bad, "contains_correction": contains_correction,
+        "corrupted": corrupted, "processed": processed, "processed_by_version": processed_by_version or {},
+    }
+
+
+def add_raw_episodes(db, subdataset_id: int, *labels) -> list:
+    return [
+        db.execute(text(
+            "INSERT INTO preproduction.raw_episodes (subdataset_id, label) VALUES (:subdataset, :label) RETURNING id"
+        ), {"subdataset": subdataset_id, "label": label}).scalar()
+        for label in labels
+    ]
+
+
+def test_raw_episode_counters(db, ids):
+    subdataset, other = ids["subdataset"], ids["other_subdataset"]
+    assert stats(db, subdataset) == counts()
+
+    good, bad, correction, _ = add_raw_episodes(db, subdataset, "good", "bad", "contains correction", "corrupted")
+    add_raw_episodes(db, subdataset, "good", None)
+    assert stats(db, subdataset) == counts(total=6, good=2, bad=1, contains_correction=1, corrupted=1)
+
+    # Label change
+    db.execute(text("UPDATE preproduction.raw_episodes SET label = 'good' WHERE id = :id"), {"id": bad})
+    assert stats(db, subdataset) == counts(total=6, good=3, contains_correction=1, corrupted=1)
+    # Columns that are not counted leave the counters alone
+    db.execute(text("UPDATE preproduction.raw_episodes SET url = 'gs://stats/1' WHERE id = :id"), {"id": good})
+    assert stats(db, subdataset) == counts(total=6, good=3, contains_correction=1, corrupted=1)
+
+    # Move to another subdataset
+    db.execute(text("UPDATE preproduction.raw_episodes SET subdataset_id = :other WHERE id IN (:a, :b)"),
+               {"other": other, "a": good, "b": correction})
+    assert stats(db, subdataset) == counts(total=4, good=2, corrupted=1)
+    assert stats(db, other) == counts(total=2, good=1, contains_correction=1)
+
+    # Delete
+    db.execute(text("DELETE FROM preproduction.raw_episodes WHERE id = :id"), {"id": good})
+    assert stats(db, other) == counts(total=1, contains_correction=1)
+    db.execute(text("DELETE FROM preproduction.raw_episodes WHERE subdataset_id = :subdataset"),
+               {"subdataset": subdataset})
+    assert stats(db, subdataset) == counts()
+
+
+def test_processed_episode_counters(db, ids):
+    subdataset, other = ids["subdataset"], ids["other_subdataset"]
+    version, other_version = ids["version"], ids["other_version"]
+    raw_episode, = add_raw_episodes(db, subdataset, "good")
+
+    episodes = [
+        db.execute(text(
+            "INSERT INTO preproduction.episodes (subdataset_id, raw_episode_id, conversion_version_id) "
+            "VALUES (:subdataset, :raw_episode, :version) RETURNING id"
+        ), {"subdataset": subdataset, "raw_episode": raw_episode, "version": episode_version}).scalar()
+        for episode_version in (version, version, other_version, None)
+    ]
+    assert stats(db, subdataset) == counts(
+        total=1, good=1, processed=4, processed_by_version={version: 2, other_version: 1}
+    )
+
+    # Conversion version change
+    db.execute(text("UPDATE preproduction.episodes SET conversion_version_id = :v WHERE id = :id"),
+               {"v": other_version, "id": episodes[0]})
+    assert stats(db, subdataset)["processed_by_version"] == {version: 1, other_version: 2}
+
+    # Move to another subdataset
+    db.execute(text("UPDATE preproduction.episodes SET subdataset_id = :other WHERE id = :id"),
+               {"other": other, "id": episodes[1]})
+    assert stats(db, subdataset) == counts(total=1, good=1, processed=3, processed_by_version={other_version: 2})
+    assert stats(db, other) == counts(processed=1, processed_by_version={version: 1})
+
+    # Delete
+    db.execute(text("DELETE FROM preproduction.episodes WHERE subdataset_id = :subdataset"),
+               {"subdataset": subdataset})
+    assert stats(db, subdataset) == counts(total=1, good=1)
+
+
+def test_rebuild_fixes_drifted_counters(db, ids):
+    subdataset, other = ids["subdataset"], ids["other_subdataset"]
+    raw_episode, _ = add_raw_episodes(db, subdataset, "good", "bad")
+    add_raw_episodes(db, other, "corrupted")
+    db.execute(text(
+        "INSERT INTO preproduction.episodes (subdataset_id, raw_episode_id, conversion_version_id) "
+        "VALUES (:subdataset, :raw_episode, :version)"
+    ), {"subdataset": subdataset, "raw_episode": raw_episode, "version": ids["version"]})
+    expected = {subdataset: stats(db, subdataset), other: stats(db, other)}
+    assert subdataset_crud.rebuild_episode_stats(db, [subdataset, other]) == []
+
+    # Drift: a wrong counter, a lost per version row and a lost stats row
+    db.execute(text("UPDATE preproduction.subdataset_episode_stats SET good = 7 WHERE subdataset_id = :id"),
+               {"id": subdataset})
+    db.execute(text("DELETE FROM preproduction.subdataset_processed_episode_stats WHERE subdataset_id = :id"),
+               {"id": subdataset})
+    db.execute(text("DELETE FROM preproduction.subdataset_episode_stats WHERE subdataset_id = :id"), {"id": other})
+    assert stats(db, subdataset) != expected[subdataset]
+
+    assert subdataset_crud.rebuild_episode_stats(db, [subdataset, other]) == sorted([subdataset, other])
+    assert {subdataset: stats(db, subdataset), other: stats(db, other)} == expected
+    assert subdataset_crud.rebuild_episode_stats(db, [subdataset, other]) == []
+
+    # The rebuilt rows keep counting
+    add_raw_episodes(db, other, "good")
+    assert stats(db, other) == counts(total=2, good=1, corrupted=1)
@@ -0,0 +1,140 @@
+"""
+ETags for conditional GETs and the table_versions counters behind them.
+
+The counter and route tests need a local Postgres migrated to head:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_etag.py
+"""
+
+import pytest
+from sqlalchemy import text
+from starlette.requests import Request
+
+from app.core.etag import resource_etag, etag_matches
+from app.crud import table_version as table_version_crud
+
+
+def request(path: str, query: str = "") -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": []})
+
+
+def test_etag_depends_on_url_and_versions():
+    etag = resource_etag(request("/api/v1/items/", "skip=0&limit=10"), [["items", 1]])
+    assert etag.startswith('"') and etag.endswith('"')
+    # Query parameter order does not matter
+    assert resource_etag(request("/api/v1/items/", "limit=10&skip=0"), [["items", 1]]) == etag
+    assert resource_etag(request("/api/v1/items/", "skip=10&limit=10"), [["items", 1]]) != etag
+    assert resource_etag(request("/api/v1/items/list", "skip=0&limit=10"), [["items", 1]]) != etag
+    assert resource_etag(request("/api/v1/items/", "skip=0&limit=10"), [["items", 2]]) != etag
+
+
+def test_if_none_match():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches("", '"abc"')
+
+
+def fire_deferred_bumps(db):
+    """Run the commit time counter bumps now; the tests' savepoints never commit."""
+    db.execute(text("SET CONSTRAINTS ALL IMMEDIATE"))
+
+
+def test_counters_move_once_per_transaction_at_commit(db):
+    versions = table_version_crud.get_table_versions(db, ["items", "embodiments"])
+    assert set(versions) == {"items", "embodiments"}
+
+    db.execute(text("INSERT INTO preproduction.items (name) VALUES ('etag-1'), ('etag-2')"))
+    db.execute(text("UPDATE preproduction.items SET notes = 'changed' WHERE name LIKE 'etag-%'"))
+    db.execute(text("DELETE FROM preproduction.items WHERE name LIKE 'etag-%'"))
+    # Deferred to the commit
+    assert table_version_crud.get_table_versions(db, ["items"]) == {"items": versions["items"]}
+
+    fire_deferred_bumps(db)
+    after = table_version_crud.get_table_versions(db, ["items", "embodiments"])
+    assert after["items"] == versions["items"] + 1
+    assert after["embodiments"] == versions["embodiments"]
+
+    # Once the queued bump ran, the next write queues another
+    db.execute(text("INSERT INTO preproduction.items (name) VALUES ('etag-3')"))
+    assert table_version_crud.get_table_versions(db, ["items"]) == {"items": versions["items"] + 2}
+
+
+def test_task_version_bumps_leave_the_tasks_counter(db):
+    task = db.execute(text(
+        "INSERT INTO preproduction.tasks (name, status) VALUES ('etag-task', 'created') RETURNING id"
+    )).scalar()
+    fire_deferred_bumps(db)
+    versions = table_version_crud.get_table_versions(db, ["tasks", "task_variants"])
+
+    # Bumps tasks.version of the task (alembic 0004), not the tasks table counter
+    db.execute(text("UPDATE preproduction.task_variants SET notes = 'changed' WHERE task_id = :task"), {"task": task})
+    after = table_version_crud.get_table_versions(db, ["tasks", "task_variants"])
+    assert after == {"tasks": versions["tasks"], "task_variants": versions["task_variants"] + 1}
+
+    db.execute(text("UPDATE preproduction.tasks SET status = 'done' WHERE id = :task"), {"task": task})
+    assert table_version_crud.get_table_versions(db, ["tasks"]) == {"tasks": versions["tasks"] + 1}
+
+
+@pytest.fixture
+def committed_names(engine):
+    """Prefix of item and embodiment names committed by a test, deleted afterwards."""
+    yield "etag-concurrent-"
+    with engine.begin() as connection:
+        for table in ("items", "embodiments"):
+            connection.execute(text(f"DELETE FROM preproduction.{table} WHERE name LIKE 'etag-concurrent-%'"))
+
+
+def test_concurrent_writers_neither_wait_nor_deadlock(engine, committed_names):
+    # Under the counters of 0005 the second writer of items waited for the
+    # first to commit, and these opposite orders deadlocked
+    first, second = engine.connect(), engine.connect()
+    try:
+        for connection in (first, second):
+            connection.begin()
+            connection.execute(text("SET LOCAL lock_timeout = '2s'"))
+
+        def insert(connection, table, name):
+            connection.execute(text(f"INSERT INTO preproduction.{table} (name) VALUES (:name)"),
+                               {"name": committed_names + name})
+
+        insert(first, "items", "1")
+        insert(second, "embodiments", "2")
+        insert(first, "embodiments", "1")
+        insert(second, "items", "2")
+        second.commit()
+        first.commit()
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.fixture
+def client_db(db, client):
+    """The test's session behind client, with the counter bumps of each statement visible."""
+    fire_deferred_bumps(db)
+    return db
+
+
+@pytest.mark.parametrize("path, write", [
+    ("/api/v1/items/", "INSERT INTO preproduction.items (name) VALUES ('etag-route')"),
+    ("/api/v1/items/list", "UPDATE preproduction.items SET notes = notes"),
+    ("/api/v1/subdatasets/",
+     "INSERT INTO preproduction.raw_episodes (subdataset_id, label) SELECT min(id), 'good' FROM preproduction.subdatasets"),
+])
+def test_not_modified_until_a_write(client, client_db, path, write):
+    client_db.execute(text("INSERT INTO preproduction.subdatasets (name) VALUES ('etag-route')"))
+
+    status, headers, _ = client("GET", path)
+    assert status == 200
+    etag = headers["etag"]
+
+    status, headers, _ = client("GET", path, {"If-None-Match": etag})
+    assert (status, headers["etag"]) == (304, etag)
+
+    client_db.execute(text(write))
+    status, headers, _ = client("GET", path, {"If-None-Match": etag})
+    assert status == 200
+    assert headers["etag"] != etag
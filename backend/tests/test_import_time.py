@@ -0,0 +1,84 @@
+"""
+Import-time budget for app.main.
+
+Workers are forked from a preloaded app (gunicorn --preload), so importing
+the app must stay cheap and must not create clients, sockets or threads.
+Each check runs in a fresh interpreter so nothing is already imported.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Measured at ~1.8s (was ~4.4s with an eagerly created Connector); the
+# headroom is for slower CI machines, not for new import-time work
+IMPORT_TIME_BUDGET = 3.0
+
+PROBE = """
+import json, os, sys, threading, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+
+from app.db import session
+from app.core import auth
+from app.core.gcs_service import gcs_service
+report = {
+    "seconds": elapsed,
+    "threads": threading.active_count(),
+    "modules": [name for name in ("google.cloud.sql.connector", "google.cloud.storage", "authlib", "aiohttp")
+                if name in sys.modules],
+    "connector": session.connector is not None,
+    "storage_client": gcs_service._client is not None,
+    "oauth": auth._oauth is not None,
+}
+
+# A forked worker starts without anything created in the parent
+session.connector = object()
+gcs_service._client = object()
+pid = os.fork()
+if pid == 0:
+    os._exit(0 if session.connector is None and gcs_service._client is None else 1)
+_, status = os.waitpid(pid, 0)
+report["fork_reset"] = os.waitstatus_to_exitcode(status) == 0
+print(json.dumps(report))
+"""
+
+
+@pytest.fixture(scope="module")
+def import_report():
+    # conftest.py fills in dummy settings; nothing may connect at import
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    # Warm the bytecode cache so the measurement does not include compiling
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "app"], cwd=BACKEND_DIR, check=True)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_within_budget(import_report):
+    assert import_report["seconds"] < IMPORT_TIME_BUDGET, (
+        f"importing app.main took {import_report['seconds']:.2f}s, budget is {IMPORT_TIME_BUDGET}s"
+    )
+
+
+def test_import_creates_no_clients_or_threads(import_report):
+    assert import_report["threads"] == 1
+    assert import_report["modules"] == []
+    assert not import_report["connector"]
+    assert not import_report["storage_client"]
+    assert not import_report["oauth"]
+
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="requires os.register_at_fork")
+def test_forked_worker_starts_without_parent_clients(import_report):
+    assert import_report["fork_reset"]
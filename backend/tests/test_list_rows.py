@@ -0,0 +1,163 @@
+"""
+ORM-free list reads (app.crud.rows): the bodies must be byte for byte what
+the ORM reads produce through their response models.
+
+The comparisons need a local Postgres migrated to head:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_list_rows.py
+
+Every test runs in a transaction that is rolled back.
+"""
+
+from typing import List
+
+import pytest
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import text
+
+from app.core.pagination import next_cursor, decode_cursor
+from app.core.row_response import row_response
+from app.crud import task as task_crud, subdataset as subdataset_crud, item as item_crud, episode as episode_crud
+from app.crud.rows import schema_columns, row_dict
+from app.models.item import Item
+from app.models.raw_episode import RawEpisode
+from app.schemas import task as task_schemas, subdataset as subdataset_schemas, item as item_schemas
+from app.schemas.episode import Episode
+
+def orm_body(schema, objects) -> bytes:
+    """The body FastAPI renders for objects through response_model=List[schema]."""
+    adapter = TypeAdapter(List[schema])
+    return JSONResponse(adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")).body
+
+
+def rows_body(rows) -> bytes:
+    return row_response(Response(), rows).body
+
+
+def test_columns_follow_the_schema_field_order():
+    assert [column.name for column in schema_columns(Item.__table__, item_schemas.Item)] == \
+        ["name", "url", "images", "notes", "id"]
+    assert [column.name for column in schema_columns(RawEpisode.__table__, subdataset_schemas.RawEpisode, "e__")] == [
+        "e__operator", "e__url", "e__label", "e__repository", "e__git_commit", "e__recorded_at",
+        "e__id", "e__subdataset_id", "e__uploaded_at"
+    ]
+
+
+def test_cursor_of_dict_rows():
+    rows = [{"id": 1}, {"id": 2}]
+    assert decode_cursor(next_cursor(rows, 2)) == (2,)
+    assert next_cursor(rows, 3) is None
+
+
+def test_response_keeps_the_route_headers():
+    response = Response()
+    response.headers["X-Next-Cursor"] = "abc"
+    rendered = row_response(response, [{"id": 1}])
+    assert rendered.headers["x-next-cursor"] == "abc"
+    assert rendered.headers["content-length"] == str(len(rendered.body))
+
+
+def test_response_keeps_repeated_headers():
+    response = Response()
+    response.set_cookie("a", "1")
+    response.set_cookie("b", "2")
+    rendered = row_response(response, [])
+    assert [value.split(";")[0] for value in rendered.headers.getlist("set-cookie")] == ["a=1", "b=2"]
+
+
+@pytest.fixture
+def ids(connection, insert):
+    """A few rows of every listed table; the ids of a task and a subdataset with episodes."""
+    embodiment = insert("INSERT INTO preproduction.embodiments (name) VALUES ('rows-embodiment')")
+    teleop_mode = insert("INSERT INTO preproduction.teleop_modes (name) VALUES ('rows-teleop')")
+    # Each task gets its default variant from the on_new_task_insert trigger
+    task = insert("INSERT INTO preproduction.tasks (name, status, is_external) VALUES ('rows-task', 'created', false)")
+    insert("INSERT INTO preproduction.tasks (name, description, status, is_external) "
+           "VALUES ('rows-task-2', 'ünïcode', 'done', true)")
+    connection.execute(text(
+        "UPDATE preproduction.task_variants SET embodiment_id = :embodiment, media = ARRAY['a.png', 'b.png'] "
+        "WHERE task_id = :task"
+    ), {"embodiment": embodiment, "task": task})
+    insert("INSERT INTO preproduction.items (name, images) VALUES ('rows-item', ARRAY['x.jpg'])")
+    insert("INSERT INTO preproduction.items (name, url, notes) VALUES ('rows-item-2', 'https://example.com', 'n')")
+    subdataset = insert(
+        "INSERT INTO preproduction.subdatasets (name, embodiment_id, teleop_mode_id) VALUES ('rows-subdataset', :e, :t)",
+        e=embodiment, t=teleop_mode
+    )
+    insert("INSERT INTO preproduction.subdatasets (name) VALUES ('rows-empty-subdataset')")
+    raw_episode = insert(
+        "INSERT INTO preproduction.raw_episodes (subdataset_id, operator, label, recorded_at) "
+        "VALUES (:s, 'operator', 'good', '2026-01-02T03:04:05.123456+00:00')", s=subdataset
+    )
+    insert("INSERT INTO preproduction.raw_episodes (subdataset_id, label, uploaded_at) "
+           "VALUES (:s, 'bad', '2026-01-02T03:04:05+02:00')", s=subdataset)
+    version = insert("INSERT INTO preproduction.episode_conversion_versions (version) VALUES ('v-rows')")
+    insert("INSERT INTO preproduction.episodes (subdataset_id, raw_episode_id, conversion_version_id, url) "
+           "VALUES (:s, :r, :v, 'gs://rows/1')", s=subdataset, r=raw_episode, v=version)
+    insert("INSERT INTO preproduction.episodes (subdataset_id, raw_episode_id) VALUES (:s, :r)",
+           s=subdataset, r=raw_episode)
+
+    return {"task": task, "subdataset": subdataset}
+
+
+def test_items(db, ids):
+    assert rows_body(item_crud.get_item_rows(db, limit=1000)) == \
+        orm_body(item_schemas.Item, item_crud.get_items(db, limit=1000))
+
+
+@pytest.mark.parametrize("with_variants", [False, True])
+def test_tasks(db, ids, with_variants):
+    rows = db.execute(task_crud.task_rows_query(with_variants, limit=1000)).all()
+    variant_rows = db.execute(task_crud.variant_rows_query([row.id for row in rows])).all() if with_variants else None
+    schema = task_schemas.Task if with_variants else task_schemas.TaskList
+    assert rows_body(task_crud.task_row_dicts(rows, variant_rows)) == \
+        orm_body(schema, task_crud.get_tasks(db, limit=1000, with_variants=with_variants))
+
+
+def test_raw_episodes(db, ids):
+    rows = db.execute(subdataset_crud.raw_episode_rows_query(limit=1000))
+    assert rows_body([row_dict(row, subdataset_schemas.RawEpisode) for row in rows]) == \
+        orm_body(subdataset_schemas.RawEpisode, subdataset_crud.get_all_raw_episodes(db, limit=1000))
+
+    rows = db.execute(subdataset_crud.raw_episode_rows_query(ids["subdataset"], label="good"))
+    assert rows_body([row_dict(row, subdataset_schemas.RawEpisode) for row in rows]) == \
+        orm_body(subdataset_schemas.RawEpisode, subdataset_crud.get_raw_episodes(db, ids["subdataset"], label="good"))
+
+
+def test_subdataset_list_without_stats(db, ids):
+    rows = db.execute(subdataset_crud.subdataset_rows_query(subdataset_schemas.SubdatasetList, limit=1000)).all()
+    dicts = [subdataset_crud.subdataset_row_dict(row, subdataset_schemas.SubdatasetList) for row in rows]
+    assert dicts and all("episode_stats" not in subdataset for subdataset in dicts)
+    assert rows_body(dicts) == \
+        orm_body(subdataset_schemas.SubdatasetList, subdataset_crud.get_subdatasets(db, limit=1000))
+
+
+@pytest.mark.parametrize("filters", [{}, {"variant_id": -1}])
+def test_subdataset_list_with_stats(db, ids, filters):
+    rows = db.execute(subdataset_crud.subdataset_rows_query(
+        subdataset_schemas.SubdatasetList, limit=1000, **filters
+    )).all()
+    subdataset_ids = [row.id for row in rows]
+    stats = subdataset_crud.episode_stats_by_subdataset(
+        subdataset_ids, db.execute(subdataset_crud.episode_stats_query(subdataset_ids))
+    )
+    dicts = [
+        subdataset_crud.subdataset_row_dict(row, subdataset_schemas.SubdatasetListWithStats, episode_stats=stats[row.id])
+        for row in rows
+    ]
+    assert rows_body(dicts) == orm_body(
+        subdataset_schemas.SubdatasetListWithStats,
+        subdataset_crud.get_subdatasets(db, limit=1000, with_stats=True, **filters)
+    )
+
+
+def test_subdatasets_with_raw_episodes(db, ids):
+    assert rows_body(subdataset_crud.get_subdataset_rows(db, limit=1000)) == \
+        orm_body(subdataset_schemas.Subdataset, subdataset_crud.get_subdatasets(db, limit=1000))
+
+
+def test_processed_episodes(db, ids):
+    assert rows_body(episode_crud.get_episode_rows_by_subdataset(db, ids["subdataset"])) == \
+        orm_body(Episode, episode_crud.get_episodes_by_subdataset(db, ids["subdataset"]))
@@ -0,0 +1,187 @@
+"""
+Connection liveness (app.db.liveness): the statement retry of
+ReconnectingSession and the idle ping on checkout, against backends killed
+with pg_terminate_backend.
+
+Needs a local Postgres migrated to head, on which the test user may
+terminate its own backends:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_liveness.py
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, exc, text
+
+from app.db import liveness
+from app.db.liveness import ReconnectingSession, install_liveness_check
+from app.models import Embodiment
+
+IDLE_SECONDS = 60
+BACKEND_PID = text("SELECT pg_backend_pid()")
+
+
+class Clock:
+    """Stands in for the time module in app.db.liveness."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(liveness, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def pool_engine(engine, clock):
+    """A one-connection pool with the liveness check, counting its pings and statements."""
+    pool_engine = create_engine(engine.url, pool_size=1, max_overflow=0)
+    install_liveness_check(pool_engine, IDLE_SECONDS)
+    pool_engine.pings = 0
+    pool_engine.statements = []
+
+    do_ping = pool_engine.dialect.do_ping
+
+    def counting_ping(dbapi_connection):
+        pool_engine.pings += 1
+        return do_ping(dbapi_connection)
+
+    pool_engine.dialect.do_ping = counting_ping
+
+    @event.listens_for(pool_engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        pool_engine.statements.append(statement)
+
+    yield pool_engine
+    pool_engine.dispose()
+
+
+@pytest.fixture
+def terminate(engine):
+    """terminate(pid): kill a backend and wait until it is gone."""
+    def terminate(pid: int):
+        # Autocommit: pg_stat_activity is a snapshot for the length of a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            assert connection.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid}).scalar()
+            deadline = time.monotonic() + 5
+            while connection.execute(text("SELECT count(*) FROM pg_stat_activity WHERE pid = :pid"),
+                                     {"pid": pid}).scalar():
+                assert time.monotonic() < deadline, f"backend {pid} still running"
+                time.sleep(0.01)
+
+    return terminate
+
+
+@pytest.fixture
+def session(pool_engine):
+    """A session whose pooled connection has been used once; .pid is its backend."""
+    with ReconnectingSession(bind=pool_engine, expire_on_commit=False) as session:
+        session.pid = session.execute(BACKEND_PID).scalar()
+        session.commit()
+        pool_engine.statements.clear()
+        yield session
+
+
+def test_first_statement_is_retried_once_on_a_new_connection(session, terminate):
+    terminate(session.pid)
+    assert session.execute(BACKEND_PID).scalar() != session.pid
+    assert session.bind.statements == [BACKEND_PID.text] * 2
+
+
+def test_the_retry_is_not_retried(session, pool_engine, terminate):
+    terminate(session.pid)
+
+    # The connection opened for the retry is dead as well
+    @event.listens_for(pool_engine, "connect")
+    def terminate_new_connection(dbapi_connection, connection_record):
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            terminate(cursor.fetchone()[0])
+
+    with pytest.raises(exc.DBAPIError) as raised:
+        session.execute(BACKEND_PID)
+    assert raised.value.connection_invalidated
+    assert session.bind.statements == [BACKEND_PID.text] * 2
+
+
+def test_no_retry_inside_a_transaction(session, terminate):
+    session.execute(text("SELECT 1"))
+    assert session.in_transaction()
+    terminate(session.pid)
+    with pytest.raises(exc.DBAPIError) as raised:
+        session.execute(BACKEND_PID)
+    assert raised.value.connection_invalidated
+    assert session.bind.statements == ["SELECT 1", BACKEND_PID.text]
+
+
+def test_no_retry_with_pending_objects(session, terminate):
+    pending = Embodiment(name="liveness-pending")
+    session.add(pending)
+    terminate(session.pid)
+    with pytest.raises(exc.DBAPIError) as raised:
+        session.execute(BACKEND_PID)
+    assert raised.value.connection_invalidated
+    assert session.bind.statements == [BACKEND_PID.text]
+    assert pending in session.new
+
+
+@pytest.fixture
+def embodiment(engine):
+    """A committed embodiment, deleted afterwards."""
+    with engine.begin() as connection:
+        id = connection.execute(text(
+            "INSERT INTO preproduction.embodiments (name) VALUES ('liveness-dirty') RETURNING id"
+        )).scalar()
+    yield id
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM preproduction.embodiments WHERE id = :id"), {"id": id})
+
+
+def test_no_retry_with_dirty_objects(session, embodiment, terminate):
+    loaded = session.get(Embodiment, embodiment)
+    session.commit()
+    session.pid = session.execute(BACKEND_PID).scalar()
+    session.commit()
+    session.bind.statements.clear()
+
+    loaded.description = "changed"
+    assert session.dirty
+    terminate(session.pid)
+    with pytest.raises(exc.DBAPIError) as raised:
+        session.execute(BACKEND_PID)
+    assert raised.value.connection_invalidated
+    assert session.bind.statements == [BACKEND_PID.text]
+    assert loaded in session.dirty
+
+
+def test_idle_connections_are_pinged_on_checkout(pool_engine, clock, terminate):
+    with pool_engine.connect() as connection:
+        pid = connection.execute(BACKEND_PID).scalar()
+    # Just opened: no ping
+    assert pool_engine.pings == 0
+
+    clock.now += IDLE_SECONDS - 1
+    with pool_engine.connect() as connection:
+        assert connection.execute(BACKEND_PID).scalar() == pid
+    assert pool_engine.pings == 0
+
+    clock.now += IDLE_SECONDS + 1
+    with pool_engine.connect() as connection:
+        assert connection.execute(BACKEND_PID).scalar() == pid
+    assert pool_engine.pings == 1
+
+    # A connection that died while idle is replaced before it is handed out
+    terminate(pid)
+    clock.now += IDLE_SECONDS + 1
+    pool_engine.statements.clear()
+    with pool_engine.connect() as connection:
+        assert connection.execute(BACKEND_PID).scalar() != pid
+    assert pool_engine.pings == 2
+    assert pool_engine.statements == [BACKEND_PID.text]
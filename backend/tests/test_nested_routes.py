@@ -0,0 +1,99 @@
+"""
+The subdataset check of the nested raw episode routes (require_subdataset):
+which 404 an unknown subdataset or episode gets, and how many ORM rows a
+request loads for it.
+
+Needs a local Postgres migrated to head:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_nested_routes.py
+
+The async routes read through their own session, which does not see the
+rows seeded here; they are checked with an unknown subdataset only.
+"""
+
+import json
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Mapper
+
+UNKNOWN = -1
+EPISODES = 20
+
+
+@pytest.fixture
+def ids(insert):
+    """A subdataset with EPISODES raw episodes, and one without any."""
+    subdataset = insert("INSERT INTO preproduction.subdatasets (name) VALUES ('nested-subdataset')")
+    return {
+        "subdataset": subdataset,
+        "other_subdataset": insert("INSERT INTO preproduction.subdatasets (name) VALUES ('nested-other')"),
+        "raw_episodes": [
+            insert("INSERT INTO preproduction.raw_episodes (subdataset_id, label) VALUES (:s, 'good')", s=subdataset)
+            for _ in range(EPISODES)
+        ],
+    }
+
+
+@pytest.fixture
+def loaded_rows():
+    """Counts the ORM instances loaded, by class name."""
+    counts = {}
+
+    def count(instance, context):
+        name = type(instance).__name__
+        counts[name] = counts.get(name, 0) + 1
+
+    event.listen(Mapper, "load", count)
+    yield counts
+    event.remove(Mapper, "load", count)
+
+
+def detail(body: bytes) -> str:
+    return json.loads(body)["detail"]
+
+
+@pytest.mark.parametrize("method, path, json_body", [
+    ("GET", "/api/v1/subdatasets/{subdataset}/episodes/", None),
+    ("GET", "/api/v1/subdatasets/{subdataset}/episodes/{episode}", None),
+    ("POST", "/api/v1/subdatasets/{subdataset}/episodes/", {"label": "good"}),
+    ("PUT", "/api/v1/subdatasets/{subdataset}/episodes/{episode}", {"label": "bad"}),
+    ("DELETE", "/api/v1/subdatasets/{subdataset}/episodes/{episode}", None),
+    ("PUT", "/api/v1/subdatasets/{subdataset}", {"name": "nested-renamed"}),
+    ("DELETE", "/api/v1/subdatasets/{subdataset}", None),
+    ("GET", "/api/v1/raw-episodes/?subdataset_id={subdataset}", None),
+    ("POST", "/api/v1/raw-episodes/?subdataset_id={subdataset}", {"label": "good"}),
+])
+def test_unknown_subdataset(client, ids, method, path, json_body):
+    status, _, body = client(method, path.format(subdataset=UNKNOWN, episode=ids["raw_episodes"][0]),
+                             json_body=json_body)
+    assert (status, detail(body)) == (404, "Subdataset not found")
+
+
+@pytest.mark.parametrize("method, json_body", [("PUT", {"label": "bad"}), ("DELETE", None)])
+def test_episode_of_another_subdataset(client, ids, method, json_body):
+    path = f"/api/v1/subdatasets/{ids['other_subdataset']}/episodes/{ids['raw_episodes'][0]}"
+    status, _, body = client(method, path, json_body=json_body)
+    assert (status, detail(body)) == (404, "Raw episode not found")
+
+
+def test_rows_loaded_do_not_grow_with_the_episodes(db, client, ids, loaded_rows):
+    # Before require_subdataset each of these loaded the subdataset with all
+    # of its raw episodes
+    subdataset, episode = ids["subdataset"], ids["raw_episodes"][0]
+
+    status, _, body = client("POST", f"/api/v1/subdatasets/{subdataset}/episodes/", json_body={"label": "good"})
+    assert (status, json.loads(body)["subdataset_id"]) == (200, subdataset)
+    assert loaded_rows == {}
+    loaded_rows.clear()
+
+    status, _, body = client("PUT", f"/api/v1/subdatasets/{subdataset}/episodes/{episode}", json_body={"label": "bad"})
+    assert (status, json.loads(body)["label"]) == (200, "bad")
+    assert loaded_rows == {"RawEpisode": 1}
+    loaded_rows.clear()
+
+    status, _, body = client("DELETE", f"/api/v1/subdatasets/{subdataset}/episodes/{episode}")
+    assert (status, json.loads(body)) == (200, True)
+    assert loaded_rows == {"RawEpisode": 1}
+    assert db.execute(text("SELECT count(*) FROM preproduction.raw_episodes WHERE subdataset_id = :s"),
+                      {"s": subdataset}).scalar() == EPISODES
@@ -0,0 +1,79 @@
+"""
+The request profiler (app.core.profiler): frame labels and categories, and
+ProfilingMiddleware keeping its blocking work off the event loop.
+"""
+
+import asyncio
+import threading
+
+import pytest
+import sqlalchemy
+
+from app.core import profiler
+from app.core.config import settings
+from app.core.profiler import SOURCE_ROOT, ProfilingMiddleware, RequestProfiler, classify
+
+TOKEN = "profiling-token"
+
+
+def test_frame_labels_are_relative_to_the_source_root():
+    code = classify.__code__
+    assert profiler._frame_label(code) == f"classify (app/core/profiler.py:{code.co_firstlineno})"
+    assert profiler._frame_label(sqlalchemy.text.__code__).startswith("text (sqlalchemy/")
+
+
+@pytest.mark.parametrize("filename, category", [
+    ("/usr/local/lib/python3.11/site-packages/psycopg2/extras.py", "driver"),
+    ("/usr/local/lib/python3.11/site-packages/psycopg/cursor.py", "driver"),
+    ("/usr/local/lib/python3.11/site-packages/sqlalchemy/orm/loading.py", "orm"),
+    (f"{SOURCE_ROOT}app/crud/task.py", "app"),
+    # A virtualenv inside the image's WORKDIR is not application code
+    (f"{SOURCE_ROOT}.venv/lib/python3.11/site-packages/starlette/routing.py", "other"),
+])
+def test_categories(filename, category):
+    assert classify(["/usr/local/lib/python3.11/asyncio/events.py", filename]) == category
+
+
+class RecordingStore:
+    def __init__(self):
+        self.profiles = []
+        self.threads = []
+
+    def save(self, profile):
+        self.threads.append(threading.get_ident())
+        self.profiles.append(profile)
+
+
+def test_sampler_join_and_save_run_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", TOKEN)
+    joined_in = []
+    join = RequestProfiler.join
+
+    def recording_join(self):
+        joined_in.append(threading.get_ident())
+        join(self)
+
+    monkeypatch.setattr(RequestProfiler, "join", recording_join)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    store = RecordingStore()
+    middleware = ProfilingMiddleware(app, store)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def serve():
+        scope = {"type": "http", "method": "GET", "path": "/profiled", "headers": [(b"x-profile", TOKEN.encode())]}
+        await middleware(scope, None, send)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(serve())
+    assert [profile["status_code"] for profile in store.profiles] == [204]
+    assert dict(messages[0]["headers"])[b"x-profile-id"] == store.profiles[0]["id"].encode()
+    assert len(joined_in) == 1 and loop_thread not in joined_in + store.threads
+    # Released for the next profiled request
+    assert middleware._active.acquire(blocking=False)
@@ -0,0 +1,112 @@
+"""
+Per-request query budgets (app.core.query_budget), counted on routes served
+by the app.
+
+Needs a local Postgres migrated to head:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_query_budget.py
+
+The tasks list reads through its own async session, which only sees
+committed rows: its tasks are committed and deleted afterwards.
+"""
+
+import json
+import logging
+
+import pytest
+from fastapi.exceptions import ResponseValidationError
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.query_budget import MODE_RAISE, MODE_WARN, QueryBudgetExceeded, _before_cursor_execute
+from app.crud import task as task_crud
+
+VARIANTS = 6
+TASKS = 10
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Raise mode, with the test engines counting statements like the app's."""
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", MODE_RAISE)
+    monkeypatch.setattr(settings, "QUERY_BUDGETS", {})
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    yield
+    event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@pytest.fixture
+def task(insert):
+    """A task with VARIANTS variants, each on its own embodiment."""
+    task = insert("INSERT INTO preproduction.tasks (name, status, is_external) VALUES ('budget-task', 'created', false)")
+    for number in range(VARIANTS):
+        embodiment = insert("INSERT INTO preproduction.embodiments (name) VALUES (:name)",
+                            name=f"budget-embodiment-{number}")
+        insert("INSERT INTO preproduction.task_variants (task_id, name, embodiment_id) VALUES (:task, :name, :e)",
+               task=task, name=f"budget-variant-{number}", e=embodiment)
+    return task
+
+
+@pytest.fixture
+def lazy_variant_details(monkeypatch):
+    """The variant routes without their eager loads: one embodiment query per variant."""
+    monkeypatch.setattr(task_crud, "_variant_details", lambda: ())
+
+
+def test_eager_loaded_variants_stay_inside_the_budget(budget, client, task, monkeypatch):
+    # The test session's savepoint, table versions, the task, its variants
+    monkeypatch.setattr(settings, "QUERY_BUDGETS", {"/api/v1/tasks/{task_id}/variants/": 4})
+    status, _, body = client("GET", f"/api/v1/tasks/{task}/variants/")
+    assert status == 200 and len(json.loads(body)) == VARIANTS + 1
+
+
+def test_over_the_route_budget_raises(budget, client, task, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_BUDGETS", {"/api/v1/tasks/{task_id}/variants/": 2})
+    with pytest.raises(QueryBudgetExceeded, match=r"GET /api/v1/tasks/\{task_id\}/variants/ ran 3 statements, budget is 2"):
+        client("GET", f"/api/v1/tasks/{task}/variants/")
+
+
+def test_over_the_repeat_limit_raises(budget, client, task, lazy_variant_details):
+    # The lazy loads run while the response is serialized, which reports the error as a validation error
+    with pytest.raises(ResponseValidationError, match=r"repeated a statement 6 times \(limit 5\), likely an N\+1 query"):
+        client("GET", f"/api/v1/tasks/{task}/variants/")
+
+
+def test_warn_mode_logs_and_serves(budget, client, task, lazy_variant_details, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", MODE_WARN)
+    with caplog.at_level(logging.WARNING, logger="app.core.query_budget"):
+        status, _, body = client("GET", f"/api/v1/tasks/{task}/variants/")
+    assert status == 200 and len(json.loads(body)) == VARIANTS + 1
+
+    [report] = [json.loads(record.getMessage()) for record in caplog.records if record.name == "app.core.query_budget"]
+    assert report["event"] == "query_budget_exceeded"
+    assert report["route"] == "/api/v1/tasks/{task_id}/variants/"
+    assert [repeated["count"] for repeated in report["repeated"]] == [VARIANTS]
+    assert report["repeated"][0]["fingerprint"].startswith("SELECT preproduction.embodiments.id")
+
+
+@pytest.fixture
+def committed_tasks(engine):
+    """TASKS committed tasks with their default variant and two more, deleted afterwards."""
+    with engine.begin() as connection:
+        for number in range(TASKS):
+            task = connection.execute(text(
+                "INSERT INTO preproduction.tasks (name, status, is_external) "
+                "VALUES (:name, 'created', false) RETURNING id"
+            ), {"name": f"budget-committed-{number}"}).scalar()
+            connection.execute(text("INSERT INTO preproduction.task_variants (task_id, name) VALUES (:task, :name)"), [
+                {"task": task, "name": f"budget-committed-{number}-{variant}"} for variant in range(2)
+            ])
+    yield
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM preproduction.tasks WHERE name LIKE 'budget-committed-%'"))
+
+
+def test_tasks_with_variants_stay_inside_the_budget(budget, client, committed_tasks, monkeypatch):
+    # Table versions, the page of tasks, the variants of the page: whatever the page size
+    monkeypatch.setattr(settings, "QUERY_BUDGETS", {"/api/v1/tasks/": 3})
+    status, _, body = client("GET", "/api/v1/tasks/")
+    tasks = [task for task in json.loads(body) if task["name"].startswith("budget-committed-")]
+    assert status == 200 and len(tasks) == TASKS
+    assert all(len(task["variants"]) == 3 for task in tasks)
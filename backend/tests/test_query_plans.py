@@ -0,0 +1,176 @@
+"""
+Query plans of the crud read paths.
+
+Runs every crud read against a local Postgres migrated to head and seeded
+with large raw_episodes / episodes tables, EXPLAINs each statement it
+executed and fails on a sequential scan of a large table, i.e. a filter or
+join the indexes in alembic/versions do not cover.
+
+Needs a disposable database:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_query_plans.py
+
+The schema is created (app/db/schema.sql) and migrated if missing; the seed
+data is rolled back at the end.
+"""
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.crud import task as task_crud, subdataset as subdataset_crud, episode as episode_crud
+from app.schemas.subdataset import SubdatasetList
+
+# Tables with at least this many rows must never be scanned sequentially
+LARGE_TABLE_ROWS = 10_000
+
+SEED_SQL = [
+    "INSERT INTO preproduction.embodiments (name) SELECT 'plan-embodiment-' || g FROM generate_series(1, 3) g",
+    "INSERT INTO preproduction.teleop_modes (name) SELECT 'plan-teleop-' || g FROM generate_series(1, 3) g",
+    # Each task gets its default variant from the on_new_task_insert trigger
+    """INSERT INTO preproduction.tasks (name, status, is_external)
+       SELECT 'plan-task-' || g, 'created', g % 2 = 0 FROM generate_series(1, 100) g""",
+    """INSERT INTO preproduction.task_variants (task_id, name)
+       SELECT t.id, 'plan-variant-' || g FROM preproduction.tasks t, generate_series(1, 3) g
+       WHERE t.name LIKE 'plan-task-%'""",
+    """INSERT INTO preproduction.subdatasets (name)
+       SELECT 'plan-subdataset-' || g FROM generate_series(1, 500) g""",
+    """INSERT INTO preproduction.task_variants_to_subdatasets (task_variant_id, subdataset_id)
+       SELECT v.id, s.id FROM preproduction.task_variants v
+       JOIN preproduction.subdatasets s ON s.id % 200 = v.id % 200
+       WHERE v.name LIKE 'plan-variant-%' AND s.name LIKE 'plan-subdataset-%'""",
+    """INSERT INTO preproduction.tasks_to_subdatasets (task_id, subdataset_id)
+       SELECT DISTINCT v.task_id, l.subdataset_id FROM preproduction.task_variants v
+       JOIN preproduction.task_variants_to_subdatasets l ON l.task_variant_id = v.id
+       WHERE v.name LIKE 'plan-variant-%'
+       ON CONFLICT DO NOTHING""",
+    """INSERT INTO preproduction.items (name) SELECT 'plan-item-' || g FROM generate_series(1, 50) g""",
+    """INSERT INTO preproduction.task_variant_to_items (task_variant_id, item_id)
+       SELECT v.id, i.id FROM preproduction.task_variants v
+       JOIN preproduction.items i ON i.id % 10 = v.id % 10
+       WHERE v.name LIKE 'plan-variant-%' AND i.name LIKE 'plan-item-%'""",
+    """INSERT INTO preproduction.raw_episodes (subdataset_id, operator, url, label, recorded_at)
+       SELECT s.id, 'operator', 'gs://plan/' || g,
+              (ARRAY['good', 'bad', 'contains correction', 'corrupted'])[1 + g % 4], NOW()
+       FROM preproduction.subdatasets s, generate_series(1, 120) g
+       WHERE s.name LIKE 'plan-subdataset-%'""",
+    "INSERT INTO preproduction.episode_conversion_versions (version, is_active) VALUES ('plan', true)",
+    """INSERT INTO preproduction.episodes (subdataset_id, raw_episode_id, conversion_version_id, url)
+       SELECT r.subdataset_id, r.id, (SELECT max(id) FROM preproduction.episode_conversion_versions), r.url
+       FROM preproduction.raw_episodes r WHERE r.url LIKE 'gs://plan/%'""",
+    "ANALYZE",
+]
+
+
+def crud_reads(ids):
+    """(name, call) for every crud read the API serves."""
+    return [
+        ("get_tasks", lambda db: task_crud.get_tasks(db)),
+        ("get_tasks(status)", lambda db: task_crud.get_tasks(db, status="created")),
+        ("get_task", lambda db: task_crud.get_task(db, ids["task"])),
+        ("get_task_variants", lambda db: task_crud.get_task_variants(db, ids["task"])),
+        ("get_task_variant", lambda db: task_crud.get_task_variant(db, ids["variant"], with_details=True)),
+        ("get_variant_items", lambda db: task_crud.get_variant_items(db, ids["variant"])),
+        ("get_task_detail_summary", lambda db: task_crud.get_task_detail_summary(db, ids["task"])),
+        ("get_task_detail_json", lambda db: task_crud.get_task_detail_json(db, ids["task"])),
+        ("get_subdataset", lambda db: subdataset_crud.get_subdataset(db, ids["subdataset"])),
+        ("get_subdatasets", lambda db: subdataset_crud.get_subdatasets(db)),
+        ("get_subdatasets(task)", lambda db: subdataset_crud.get_subdatasets(db, task_id=ids["task"])),
+        ("get_subdatasets(variant)", lambda db: subdataset_crud.get_subdatasets(db, variant_id=ids["variant"])),
+        ("get_subdatasets(unassigned)", lambda db: subdataset_crud.get_subdatasets(db, variant_id=-1)),
+        ("get_subdatasets(with_stats)", lambda db: subdataset_crud.get_subdatasets(db, with_stats=True)),
+        ("get_raw_episode", lambda db: subdataset_crud.get_raw_episode(db, ids["raw_episode"])),
+        ("get_raw_episodes", lambda db: subdataset_crud.get_raw_episodes(db, ids["subdataset"])),
+        ("get_raw_episodes(label)",
+         lambda db: subdataset_crud.get_raw_episodes(db, ids["subdataset"], label="good")),
+        ("get_all_raw_episodes", lambda db: subdataset_crud.get_all_raw_episodes(db)),
+        ("get_all_raw_episodes(label)", lambda db: subdataset_crud.get_all_raw_episodes(db, label="good")),
+        ("get_all_raw_episodes(after)",
+         lambda db: subdataset_crud.get_all_raw_episodes(db, after=(ids["raw_episode"] // 2,))),
+        ("get_tasks_and_variants_by_subdataset",
+         lambda db: subdataset_crud.get_tasks_and_variants_by_subdataset(db, ids["subdataset"])),
+        ("get_linked_task_and_variant_by_subdataset",
+         lambda db: subdataset_crud.get_linked_task_and_variant_by_subdataset(db, ids["subdataset"])),
+        ("get_episodes_by_subdataset", lambda db: episode_crud.get_episodes_by_subdataset(db, ids["subdataset"])),
+        ("get_episodes_by_subdataset(after)",
+         lambda db: episode_crud.get_episodes_by_subdataset(db, ids["subdataset"], after=(ids["raw_episode"] // 2,))),
+        # ORM-free list reads (app.crud.rows)
+        ("task_rows_query", lambda db: db.execute(task_crud.task_rows_query(with_variants=True)).all()),
+        ("variant_rows_query", lambda db: db.execute(task_crud.variant_rows_query([ids["task"]])).all()),
+        ("get_subdataset_rows", lambda db: subdataset_crud.get_subdataset_rows(db)),
+        ("subdataset_rows_query(task)", lambda db: db.execute(subdataset_crud.subdataset_rows_query(
+            SubdatasetList, task_id=ids["task"])).all()),
+        ("raw_episode_rows_query", lambda db: db.execute(subdataset_crud.raw_episode_rows_query()).all()),
+        ("raw_episode_rows_query(label)", lambda db: db.execute(
+            subdataset_crud.raw_episode_rows_query(ids["subdataset"], label="good")).all()),
+        ("get_episode_rows_by_subdataset",
+         lambda db: episode_crud.get_episode_rows_by_subdataset(db, ids["subdataset"])),
+    ]
+
+
+CRUD_READ_NAMES = [name for name, _ in crud_reads({})]
+
+
+@pytest.fixture(scope="module")
+def seeded(engine):
+    """Connection inside a transaction holding the seed data; rolled back afterwards."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    for statement in SEED_SQL:
+        connection.execute(text(statement))
+
+    ids = {
+        "task": connection.execute(text(
+            "SELECT min(id) FROM preproduction.tasks WHERE name LIKE 'plan-task-%'")).scalar(),
+        "variant": connection.execute(text(
+            "SELECT min(id) FROM preproduction.task_variants WHERE name LIKE 'plan-variant-%'")).scalar(),
+        "subdataset": connection.execute(text(
+            "SELECT min(subdataset_id) FROM preproduction.task_variants_to_subdatasets")).scalar(),
+        "raw_episode": connection.execute(text(
+            "SELECT max(id) FROM preproduction.raw_episodes")).scalar(),
+    }
+    large_tables = set(connection.execute(text(
+        "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = 'preproduction' AND c.relkind = 'r' AND c.reltuples >= :rows"
+    ), {"rows": LARGE_TABLE_ROWS}).scalars())
+    assert {"raw_episodes", "episodes"} <= large_tables
+
+    yield connection, ids, large_tables
+    transaction.rollback()
+    connection.close()
+
+
+def sequential_scans(plan: dict, large_tables: set) -> list:
+    """Large relations scanned sequentially anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    scans = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in large_tables:
+        scans.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scans.extend(sequential_scans(child, large_tables))
+    return scans
+
+
+@pytest.mark.parametrize("name", CRUD_READ_NAMES)
+def test_crud_read_uses_indexes(seeded, name):
+    connection, ids, large_tables = seeded
+    call = dict(crud_reads(ids))[name]
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        with Session(bind=connection, join_transaction_mode="create_savepoint") as db:
+            call(db)
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+
+    statements = [(s, p) for s, p in statements if s.lstrip().upper().startswith(("SELECT", "WITH"))]
+    assert statements, f"{name} executed no queries"
+
+    for statement, parameters in statements:
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        scans = sequential_scans(plan[0]["Plan"], large_tables)
+        assert not scans, f"{name} scans {', '.join(scans)} sequentially:\n{statement}"
@@ -0,0 +1,78 @@
+"""
+Early release of request sessions (app.db.request_session), on an in-memory
+SQLite engine.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, event, insert, select
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
+
+from app.core.request_context import RequestContext
+from app.db.request_session import release_sessions, release_sessions_async
+from app.db.routing import RoutingSession
+
+Base = declarative_base()
+
+
+class Note(Base):
+    __tablename__ = "notes"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Note).values(name="note"))
+    with RoutingSession(bind=engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def context(session):
+    context = RequestContext({"type": "http", "method": "GET"})
+    context.sessions.append(session)
+    return context
+
+
+def test_reads_are_committed_without_expiring_loaded_objects(session, context):
+    note = session.get(Note, 1)
+    release_sessions(context)
+    assert not session.in_transaction()
+    assert "name" in note.__dict__
+
+
+def test_failed_endpoints_roll_back(session, context):
+    session.add(Note(name="pending"))
+    session.flush()
+    release_sessions(context, failed=True)
+    assert not session.in_transaction()
+    assert session.execute(select(Note.name)).scalars().all() == ["note"]
+
+
+def test_writes_are_left_to_get_db(session, context):
+    session.execute(insert(Note).values(name="written"))
+    release_sessions(context)
+    assert session.in_transaction()
+
+
+def test_async_release_commits_sync_sessions_off_the_event_loop(session, context):
+    committed_in = []
+    event.listen(session, "after_commit", lambda _: committed_in.append(threading.get_ident()))
+    session.get(Note, 1)
+
+    async def release():
+        await release_sessions_async(context)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(release())
+    assert not session.in_transaction()
+    assert len(committed_in) == 1 and committed_in[0] != loop_thread
@@ -0,0 +1,133 @@
+"""
+Read-replica routing (app.db.routing): which engine RoutingSession binds
+each statement to. Two in-memory SQLite engines stand in for the primary
+and the replica; each holds a note naming it, so a read tells which one
+served it.
+"""
+
+import pytest
+from sqlalchemy import Column, Integer, String, column, create_engine, insert, select, text
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
+
+from app.core.request_context import RequestContext, set_request_context, reset_request_context
+from app.crud.task import TASK_DETAIL_JSON
+from app.db.routing import EngineRouter, RoutingSession, is_read, READ_ONLY_OPTION
+
+Base = declarative_base()
+
+
+class Note(Base):
+    __tablename__ = "notes"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+@pytest.fixture
+def engines():
+    primary, replica = (create_engine("sqlite://", poolclass=StaticPool) for _ in range(2))
+    for engine, name in ((primary, "primary"), (replica, "replica")):
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(Note).values(name=name))
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def session(engines):
+    primary, replica = engines
+    with RoutingSession(info={"router": EngineRouter(primary, [replica])}) as session:
+        yield session
+
+
+def request_context(method: str, read_primary: bool = False):
+    context = RequestContext({"type": "http", "method": method})
+    context.read_primary = read_primary
+    return set_request_context(context)
+
+
+@pytest.fixture
+def get_request():
+    token = request_context("GET")
+    yield
+    reset_request_context(token)
+
+
+def served_by(session) -> str:
+    """Name of the engine a plain read goes to."""
+    return session.execute(select(Note.name).order_by(Note.id).limit(1)).scalar()
+
+
+def test_reads():
+    assert is_read(select(column("x")))
+    assert is_read(text("SELECT 1").execution_options(**{READ_ONLY_OPTION: True}))
+    assert is_read(TASK_DETAIL_JSON)
+    # Textual statements may write, or need the primary to read their own writes
+    assert not is_read(text("SELECT 1"))
+    assert not is_read(text("SELECT 1").columns(column("x", String)))
+    assert not is_read(None)
+    assert not is_read(select(column("x")).with_for_update())
+    assert not is_read(select(column("x")).with_for_update(read=True))
+
+
+def test_only_marked_textual_reads_go_to_the_replica(engines, session, get_request):
+    primary, replica = engines
+    assert session.get_bind(clause=TASK_DETAIL_JSON) is replica
+    assert session.get_bind(clause=text("SELECT 1").columns(column("x", String))) is primary
+
+
+def test_reads_go_to_the_replica(session, get_request):
+    assert served_by(session) == "replica"
+    assert session.get(Note, 1).name == "replica"
+    assert "transaction_wrote" not in session.info
+
+
+def test_reads_after_a_write_go_to_the_primary(engines, session, get_request):
+    primary, _ = engines
+    session.execute(insert(Note).values(name="written"))
+    assert session.info["transaction_wrote"]
+    assert served_by(session) == "primary"
+    session.commit()
+    # The session keeps reading its own writes
+    assert served_by(session) == "primary"
+    with primary.connect() as connection:
+        assert connection.execute(select(Note.name).where(Note.name == "written")).scalar() == "written"
+
+
+def test_flushes_go_to_the_primary(engines, session, get_request):
+    primary, replica = engines
+    session.add(Note(name="flushed"))
+    session.flush()
+    assert served_by(session) == "primary"
+    session.commit()
+    for engine, count in ((primary, 1), (replica, 0)):
+        with engine.connect() as connection:
+            assert len(connection.execute(select(Note.id).where(Note.name == "flushed")).all()) == count
+
+
+@pytest.mark.parametrize("locking_read", [
+    lambda session: session.execute(select(Note.name).order_by(Note.id).limit(1).with_for_update()).scalar(),
+    lambda session: session.query(Note).order_by(Note.id).with_for_update(read=True).first().name,
+])
+def test_locking_selects_go_to_the_primary(session, get_request, locking_read):
+    assert locking_read(session) == "primary"
+    assert session.info["transaction_wrote"]
+    # The rows it locked are read on the primary too
+    assert served_by(session) == "primary"
+
+
+@pytest.mark.parametrize("method, read_primary", [("POST", False), ("PUT", False), ("DELETE", False),
+                                                  ("GET", True)])
+def test_requests_that_may_not_read_a_replica(session, method, read_primary):
+    token = request_context(method, read_primary)
+    try:
+        assert served_by(session) == "primary"
+    finally:
+        reset_request_context(token)
+
+
+def test_outside_a_request_everything_goes_to_the_primary(session):
+    assert served_by(session) == "primary"
@@ -0,0 +1,59 @@
+"""
+Cross-worker performance stats (app.core.shared_stats): a second worker is
+simulated by a region published under the pid of the test runner's parent.
+"""
+
+import os
+import json
+
+import pytest
+
+from app.core import shared_stats
+from app.core.config import settings
+from app.core.shared_stats import StatsRegion, get_health_stats, get_instance_stats, local_snapshot, worker_path
+
+
+@pytest.fixture
+def other_worker(tmp_path, monkeypatch):
+    """Pid of another live worker whose snapshot is published in a fresh stats directory."""
+    monkeypatch.setattr(settings, "PERF_SHARED_DIR", str(tmp_path))
+    monkeypatch.setattr(shared_stats, "_health_stats", None)
+    pid = os.getppid()
+    snapshot = {**local_snapshot(), "pid": pid}
+    with monkeypatch.context() as patch:
+        # StatsRegion stamps the writer's pid
+        patch.setattr(os, "getpid", lambda: pid)
+        region = StatsRegion(worker_path(pid), settings.PERF_SHARED_REGION_SIZE)
+        region.write(json.dumps(snapshot).encode())
+    yield pid
+    region.close()
+
+
+@pytest.fixture
+def region_reads(monkeypatch):
+    reads = []
+    read_region = shared_stats.read_region
+
+    def counting_read_region(path):
+        reads.append(path)
+        return read_region(path)
+
+    monkeypatch.setattr(shared_stats, "read_region", counting_read_region)
+    return reads
+
+
+def test_health_stats_merge_every_worker(other_worker):
+    stats = get_health_stats()
+    assert stats["workers"] == sorted([os.getpid(), other_worker])
+    assert stats["performance"] == get_instance_stats()["performance"]
+
+
+def test_health_stats_are_reused_within_the_publish_interval(other_worker, region_reads, monkeypatch):
+    monkeypatch.setattr(settings, "PERF_PUBLISH_INTERVAL", 60.0)
+    first = get_health_stats()
+    assert get_health_stats() is first
+    assert len(region_reads) == 1
+
+    monkeypatch.setattr(settings, "PERF_PUBLISH_INTERVAL", 0.0)
+    assert get_health_stats() is not first
+    assert len(region_reads) == 2
@@ -0,0 +1,88 @@
+"""
+Statement fingerprints and the bounded statement table (app.core.sql_monitor),
+with the cursor event listeners on an in-memory SQLite engine.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from app.core.sql_monitor import SQLMonitor, fingerprint, install_sql_monitor, sql_monitor
+
+
+@pytest.mark.parametrize("statement, expected", [
+    # IN-lists of any length collapse to one entry
+    ("SELECT * FROM t WHERE id IN (1, 2, 3)", "SELECT * FROM t WHERE id IN (?)"),
+    ("SELECT * FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s)", "SELECT * FROM t WHERE id IN (?)"),
+    ("SELECT * FROM t WHERE id IN ($1, $2, $3)", "SELECT * FROM t WHERE id IN (?)"),
+    # Bind parameters of each paramstyle
+    ("SELECT * FROM t WHERE id = $1 AND name = $2", "SELECT * FROM t WHERE id = ? AND name = ?"),
+    ("SELECT * FROM t WHERE id = %(id_1)s", "SELECT * FROM t WHERE id = ?"),
+    ("SELECT * FROM t WHERE id = %s AND name = %s", "SELECT * FROM t WHERE id = ? AND name = ?"),
+    ("SELECT * FROM t WHERE id = ?", "SELECT * FROM t WHERE id = ?"),
+    ("SELECT * FROM t WHERE a = ANY(%(a)s)", "SELECT * FROM t WHERE a = ANY(?)"),
+    # Casts of parameters and literals
+    ("SELECT * FROM t WHERE id = $1::INTEGER", "SELECT * FROM t WHERE id = ?"),
+    ("SELECT * FROM t WHERE tags = %(tags)s::VARCHAR[]", "SELECT * FROM t WHERE tags = ?"),
+    ("SELECT '2024-01-01'::date", "SELECT ?"),
+    # Multi-row VALUES
+    ("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')", "INSERT INTO t (a, b) VALUES (?)"),
+    ("INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4), ($5, $6)", "INSERT INTO t (a, b) VALUES (?)"),
+    # Comments
+    ("SELECT a -- trailing\nFROM t", "SELECT a FROM t"),
+    ("SELECT a /* block\n comment */ FROM t", "SELECT a FROM t"),
+    ("SELECT a /* it's */ FROM t WHERE b = 'c'", "SELECT a FROM t WHERE b = ?"),
+    # Escaped quotes, and comment markers inside a literal
+    ("SELECT * FROM t WHERE a = 'it''s' AND b = ''", "SELECT * FROM t WHERE a = ? AND b = ?"),
+    ("SELECT * FROM t WHERE a = 'x -- y' AND b = '/* z'", "SELECT * FROM t WHERE a = ? AND b = ?"),
+    # Numbers, but not digits inside identifiers
+    ("SELECT t1.c2 FROM t1 WHERE x = -1.5 LIMIT 10 OFFSET 20",
+     "SELECT t1.c2 FROM t1 WHERE x = ? LIMIT ? OFFSET ?"),
+    ("SELECT  *\n\tFROM   t", "SELECT * FROM t"),
+])
+def test_fingerprint(statement, expected):
+    assert fingerprint(statement) == expected
+
+
+def test_cheapest_fingerprint_is_evicted_when_full():
+    monitor = SQLMonitor(capacity=2)
+    monitor.record("SELECT 1 FROM a", 0.5, 1, "caller")
+    monitor.record("SELECT 1 FROM b", 0.1, 1, "caller")
+    monitor.record("SELECT 2 FROM b", 0.6, 1, "caller")
+    # b has grown past a: a is the cheapest now
+    monitor.record("SELECT 1 FROM c", 0.2, 1, "caller")
+    assert [(stats["fingerprint"], stats["calls"]) for stats in monitor.get_stats()] == [
+        ("SELECT ? FROM b", 2), ("SELECT ? FROM c", 1)]
+
+
+def test_new_fingerprint_evicts_even_when_it_is_cheapest():
+    monitor = SQLMonitor(capacity=1)
+    monitor.record("SELECT 1 FROM a", 0.5, 1, "caller")
+    monitor.record("SELECT 1 FROM b", 0.1, 1, "caller")
+    assert list(monitor.statements) == ["SELECT ? FROM b"]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    install_sql_monitor(engine)
+    sql_monitor.reset()
+    yield engine
+    sql_monitor.reset()
+    engine.dispose()
+
+
+def test_failed_statements_leave_nothing_on_the_connection(engine):
+    with engine.connect() as connection:
+        info = dict(connection.info)
+        for _ in range(5):
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM missing")
+        assert connection.info == info
+
+        connection.exec_driver_sql("SELECT 1")
+
+    stats = {stats["fingerprint"]: stats for stats in sql_monitor.get_stats()}
+    assert list(stats) == ["SELECT ?"]
+    assert stats["SELECT ?"]["calls"] == 1 and 0 <= stats["SELECT ?"]["max_time"] < 1
@@ -0,0 +1,56 @@
+"""
+The subdataset detail: the raw episode window (episode_limit).
+
+Needs a local Postgres migrated to head:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_subdataset_detail.py
+
+Every test runs in a transaction that is rolled back.
+"""
+
+import pytest
+
+from app.core.pagination import decode_cursor, encode_cursor, first_cursor
+from app.crud import subdataset as subdataset_crud
+
+
+@pytest.fixture
+def ids(insert):
+    """A subdataset with three raw episodes and one without any."""
+    subdataset = insert("INSERT INTO preproduction.subdatasets (name) VALUES ('detail-subdataset')")
+    return {
+        "subdataset": subdataset,
+        "empty_subdataset": insert("INSERT INTO preproduction.subdatasets (name) VALUES ('detail-empty')"),
+        "raw_episodes": [
+            insert("INSERT INTO preproduction.raw_episodes (subdataset_id, label) VALUES (:s, 'good')", s=subdataset)
+            for _ in range(3)
+        ],
+    }
+
+
+@pytest.mark.parametrize("episode_limit, loaded, cursor_after", [
+    (None, 3, None),
+    (2, 2, 1),
+    (3, 3, 2),
+    (1000, 3, None),
+])
+def test_episode_window(db, ids, episode_limit, loaded, cursor_after):
+    subdataset = subdataset_crud.get_subdataset(db, ids["subdataset"], episode_limit=episode_limit)
+    assert [episode.id for episode in subdataset.raw_episodes] == ids["raw_episodes"][:loaded]
+    expected_cursor = encode_cursor([ids["raw_episodes"][cursor_after]]) if cursor_after is not None else None
+    # Not set without episode_limit; the response model defaults it to null
+    assert getattr(subdataset, "raw_episodes_next_cursor", None) == expected_cursor
+    assert subdataset.episode_stats.total == 3
+
+
+def test_episode_limit_zero_points_at_the_first_page(db, ids):
+    subdataset = subdataset_crud.get_subdataset(db, ids["subdataset"], episode_limit=0)
+    assert subdataset.raw_episodes == []
+    assert subdataset.raw_episodes_next_cursor == first_cursor()
+    page = subdataset_crud.get_raw_episodes(
+        db, ids["subdataset"], after=decode_cursor(subdataset.raw_episodes_next_cursor)
+    )
+    assert [episode.id for episode in page] == ids["raw_episodes"]
+
+    empty = subdataset_crud.get_subdataset(db, ids["empty_subdataset"], episode_limit=0)
+    assert (empty.raw_episodes, empty.raw_episodes_next_cursor) == ([], None)
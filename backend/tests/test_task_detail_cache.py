@@ -0,0 +1,178 @@
+"""
+Task detail response cache and the tasks.version invalidation rules.
+
+The ResponseCache tests need nothing. The invalidation tests run every
+write path that changes GET /tasks/{id}/detail against a local Postgres
+migrated to head, and check that the task's version moved (so the cached
+document misses) while unrelated writes leave it alone:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_task_detail_cache.py
+
+Every test runs in a transaction that is rolled back.
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.core.response_cache import ResponseCache, merge_cache_snapshots
+from app.crud import task as task_crud, subdataset as subdataset_crud, item as item_crud
+from app.api.v1.endpoints import subdatasets as subdataset_endpoints
+from app.schemas.task import TaskUpdate, TaskVariantCreate, TaskVariantUpdate
+from app.schemas.subdataset import SubdatasetUpdate, RawEpisodeCreate
+from app.schemas.item import ItemUpdate
+
+
+def test_hit_only_at_the_cached_version():
+    cache = ResponseCache("test", 1024)
+    assert cache.get(1, 1) is None
+    cache.put(1, 1, b"v1")
+    assert cache.get(1, 1) == b"v1"
+    assert cache.get(1, 2) is None
+    cache.put(1, 2, b"v2")
+    assert cache.get(1, 2) == b"v2"
+    assert cache.get(1, 1) is None
+
+    snapshot = cache.snapshot()
+    assert (snapshot["hits"], snapshot["misses"], snapshot["entries"], snapshot["bytes"]) == (2, 3, 1, 2)
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = ResponseCache("test", 10)
+    cache.put(1, 1, b"aaaa")
+    cache.put(2, 1, b"bbbb")
+    assert cache.get(1, 1) == b"aaaa"
+    cache.put(3, 1, b"cccc")
+
+    assert cache.get(2, 1) is None
+    assert cache.get(1, 1) == b"aaaa"
+    assert cache.get(3, 1) == b"cccc"
+    snapshot = cache.snapshot()
+    assert (snapshot["evictions"], snapshot["entries"], snapshot["bytes"]) == (1, 2, 8)
+
+
+def test_body_larger_than_the_cache_is_not_kept():
+    cache = ResponseCache("test", 4)
+    cache.put(1, 1, b"aa")
+    cache.put(1, 2, b"too large")
+    assert cache.get(1, 1) is None
+    assert cache.get(1, 2) is None
+    assert cache.snapshot()["bytes"] == 0
+
+    disabled = ResponseCache("disabled", 0)
+    disabled.put(1, 1, b"x")
+    assert disabled.get(1, 1) is None
+
+
+def test_merged_snapshots_sum_workers():
+    merged = merge_cache_snapshots([
+        {"task_detail": {"hits": 3, "misses": 1, "evictions": 0, "entries": 2, "bytes": 10, "max_bytes": 100}},
+        {"task_detail": {"hits": 1, "misses": 3, "evictions": 1, "entries": 1, "bytes": 5, "max_bytes": 100}},
+    ])
+    assert merged["task_detail"]["hits"] == 4
+    assert merged["task_detail"]["bytes"] == 15
+    assert merged["task_detail"]["hit_ratio"] == 0.5
+
+
+@pytest.fixture
+def ids(connection, insert):
+    """Ids of a task whose detail shows a variant, an item and a subdataset."""
+    # Each task gets its default variant from the on_new_task_insert trigger
+    task = insert("INSERT INTO preproduction.tasks (name, status) VALUES ('cache-task', 'created')")
+    other_task = insert("INSERT INTO preproduction.tasks (name, status) VALUES ('cache-other-task', 'created')")
+    variant = connection.execute(text(
+        "SELECT id FROM preproduction.task_variants WHERE task_id = :task"), {"task": task}).scalar()
+    other_variant = connection.execute(text(
+        "SELECT id FROM preproduction.task_variants WHERE task_id = :task"), {"task": other_task}).scalar()
+    ids = {
+        "task": task,
+        "variant": variant,
+        "other_task": other_task,
+        "other_variant": other_variant,
+        "item": insert("INSERT INTO preproduction.items (name) VALUES ('cache-item')"),
+        "unlinked_item": insert("INSERT INTO preproduction.items (name) VALUES ('cache-unlinked-item')"),
+        "subdataset": insert("INSERT INTO preproduction.subdatasets (name) VALUES ('cache-subdataset')"),
+        "unlinked_subdataset": insert("INSERT INTO preproduction.subdatasets (name) VALUES ('cache-unlinked')"),
+    }
+    connection.execute(text(
+        "INSERT INTO preproduction.task_variant_to_items (task_variant_id, item_id) VALUES (:variant, :item)"
+    ), ids)
+    connection.execute(text(
+        "INSERT INTO preproduction.task_variants_to_subdatasets (task_variant_id, subdataset_id) "
+        "VALUES (:variant, :subdataset)"
+    ), ids)
+    return ids
+
+
+def raw_episode():
+    return RawEpisodeCreate(operator="operator", url="gs://cache/1", label="good",
+                            recorded_at=datetime.now(timezone.utc))
+
+
+# (write, call) pairs that change the detail of ids["task"]
+INVALIDATING_WRITES = [
+    ("update_task", lambda db, ids: task_crud.update_task(db, ids["task"], TaskUpdate(status="collecting data"))),
+    ("create_task_variant",
+     lambda db, ids: task_crud.create_task_variant(db, ids["task"], TaskVariantCreate(name="second"))),
+    ("update_task_variant",
+     lambda db, ids: task_crud.update_task_variant(db, ids["variant"], TaskVariantUpdate(notes="changed"))),
+    ("delete_task_variant", lambda db, ids: task_crud.delete_task_variant(db, ids["variant"])),
+    ("add_item_to_variant", lambda db, ids: task_crud.add_item_to_variant(db, ids["variant"], ids["unlinked_item"])),
+    ("add_item_to_variant(quantity)",
+     lambda db, ids: task_crud.add_item_to_variant(db, ids["variant"], ids["item"], quantity=3)),
+    ("remove_item_from_variant", lambda db, ids: task_crud.remove_item_from_variant(db, ids["variant"], ids["item"])),
+    ("update_item", lambda db, ids: item_crud.update_item(db, ids["item"], ItemUpdate(url="https://example.com"))),
+    ("delete_item", lambda db, ids: item_crud.delete_item(db, ids["item"])),
+    ("link_subdataset_to_task_variant",
+     lambda db, ids: subdataset_endpoints.link_subdataset_to_task_variant(
+         db=db, subdataset_id=ids["unlinked_subdataset"], data={"task_variant_id": ids["variant"]})),
+    ("update_subdataset",
+     lambda db, ids: subdataset_crud.update_subdataset(db, ids["subdataset"], SubdatasetUpdate(notes="changed"))),
+    ("delete_subdataset", lambda db, ids: subdataset_crud.delete_subdataset(db, ids["subdataset"])),
+]
+
+# (write, call) pairs that leave the detail of ids["task"] as it is
+UNRELATED_WRITES = [
+    ("update_task(other)",
+     lambda db, ids: task_crud.update_task(db, ids["other_task"], TaskUpdate(status="collecting data"))),
+    ("update_task(unchanged)", lambda db, ids: task_crud.update_task(db, ids["task"], TaskUpdate(status="created"))),
+    ("add_item_to_variant(other)",
+     lambda db, ids: task_crud.add_item_to_variant(db, ids["other_variant"], ids["unlinked_item"])),
+    ("update_item(unlinked)",
+     lambda db, ids: item_crud.update_item(db, ids["unlinked_item"], ItemUpdate(notes="changed"))),
+    ("update_subdataset(unlinked)",
+     lambda db, ids: subdataset_crud.update_subdataset(
+         db, ids["unlinked_subdataset"], SubdatasetUpdate(notes="changed"))),
+    # The detail does not include episode stats
+    ("create_raw_episode", lambda db, ids: subdataset_crud.create_raw_episode(db, ids["subdataset"], raw_episode())),
+]
+
+
+@pytest.mark.parametrize("name", [name for name, _ in INVALIDATING_WRITES])
+def test_write_invalidates_task_detail(db, ids, name):
+    cache = ResponseCache("test", 1024)
+    version = task_crud.get_task_version(db, ids["task"])
+    cache.put(ids["task"], version, task_crud.get_task_detail_json(db, ids["task"]).encode())
+
+    dict(INVALIDATING_WRITES)[name](db, ids)
+
+    new_version = task_crud.get_task_version(db, ids["task"])
+    assert new_version > version
+    assert cache.get(ids["task"], new_version) is None
+
+
+@pytest.mark.parametrize("name", [name for name, _ in UNRELATED_WRITES])
+def test_unrelated_write_keeps_task_detail(db, ids, name):
+    version = task_crud.get_task_version(db, ids["task"])
+    document = task_crud.get_task_detail_json(db, ids["task"])
+
+    dict(UNRELATED_WRITES)[name](db, ids)
+
+    assert task_crud.get_task_version(db, ids["task"]) == version
+    assert task_crud.get_task_detail_json(db, ids["task"]) == document
+
+
+def test_deleted_task_has_no_version(db, ids):
+    task_crud.delete_task(db, ids["task"])
+    assert task_crud.get_task_version(db, ids["task"]) is None
@@ -0,0 +1,112 @@
+"""
+The task detail document Postgres builds (TASK_DETAIL_JSON, the "json"
+TASK_DETAIL_ENGINE) must be the TaskDetailSummary the ORM engine returns.
+
+Needs a local Postgres migrated to head:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/iliad_test pytest tests/test_task_detail_json.py
+
+Every test runs in a transaction that is rolled back.
+"""
+
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app.crud import task as task_crud
+from app.schemas.task import TaskDetailSummary
+
+
+@pytest.fixture
+def ids(connection, insert):
+    """Tasks with a full detail, with only their default variant and with no variant at all."""
+    embodiment = insert("INSERT INTO preproduction.embodiments (name) VALUES ('json-embodiment')")
+    teleop_mode = insert("INSERT INTO preproduction.teleop_modes (name) VALUES ('json-teleop')")
+    # Each task gets its default variant from the on_new_task_insert trigger
+    # created_at with and without microseconds; the third one is now()
+    full = insert("INSERT INTO preproduction.tasks (name, description, status, is_external, created_at) "
+                  "VALUES ('json-task', 'ünïcode \"quoted\"', 'created', true, '2024-01-01 12:00:00.12+00')")
+    default_only = insert("INSERT INTO preproduction.tasks (name, status, is_external, created_at) "
+                          "VALUES ('json-default-only', 'created', false, '2024-01-01 14:00:00+02')")
+    no_variants = insert("INSERT INTO preproduction.tasks (name, status, is_external) "
+                         "VALUES ('json-no-variants', 'done', false)")
+    connection.execute(text("DELETE FROM preproduction.task_variants WHERE task_id = :task"), {"task": no_variants})
+
+    variant = insert(
+        "INSERT INTO preproduction.task_variants (task_id, name, embodiment_id, teleop_mode_id, media, notes) "
+        "VALUES (:task, 'json-variant', :e, :t, ARRAY['a.png', 'b.png'], 'n')",
+        task=full, e=embodiment, t=teleop_mode
+    )
+    default_variant = connection.execute(text(
+        "SELECT min(id) FROM preproduction.task_variants WHERE task_id = :task"), {"task": full}).scalar()
+    # Rewrites the default variant's row after the other one: the scan order
+    # of the variants is no longer their id order
+    connection.execute(text("UPDATE preproduction.task_variants SET notes = 'default' WHERE id = :id"),
+                       {"id": default_variant})
+
+    items = [
+        insert("INSERT INTO preproduction.items (name, images) VALUES ('json-item', ARRAY['x.jpg'])"),
+        insert("INSERT INTO preproduction.items (name, url, notes) VALUES ('json-item-2', 'https://example.com', 'n')"),
+    ]
+    for item, quantity in zip(items, [1, 3]):
+        connection.execute(text(
+            "INSERT INTO preproduction.task_variant_to_items (task_variant_id, item_id, quantity) "
+            "VALUES (:variant, :item, :quantity)"
+        ), {"variant": variant, "item": item, "quantity": quantity})
+
+    subdatasets = [
+        insert("INSERT INTO preproduction.subdatasets (name, embodiment_id, teleop_mode_id) "
+               "VALUES ('json-subdataset', :e, :t)", e=embodiment, t=teleop_mode),
+        insert("INSERT INTO preproduction.subdatasets (name, description) VALUES ('json-subdataset-2', 'd')"),
+    ]
+    for variant_id, subdataset in [(variant, subdatasets[1]), (variant, subdatasets[0]),
+                                   (default_variant, subdatasets[0])]:
+        connection.execute(text(
+            "INSERT INTO preproduction.task_variants_to_subdatasets (task_variant_id, subdataset_id) "
+            "VALUES (:variant, :subdataset)"
+        ), {"variant": variant_id, "subdataset": subdataset})
+
+    training_run = insert("INSERT INTO preproduction.training_runs (url) VALUES ('gs://json/run')")
+    connection.execute(text(
+        "INSERT INTO preproduction.training_runs_to_tasks (training_run_id, task_id) VALUES (:run, :task)"
+    ), {"run": training_run, "task": full})
+    insert("INSERT INTO preproduction.evaluations (task_id, name, embodiment_id) VALUES (:task, 'json-eval', :e)",
+           task=full, e=embodiment)
+
+    return {"full": full, "default_only": default_only, "no_variants": no_variants}
+
+
+@pytest.mark.parametrize("task", ["full", "default_only", "no_variants"])
+def test_json_document_is_the_orm_summary(db, ids, task):
+    document = task_crud.get_task_detail_json(db, ids[task])
+    summary = task_crud.get_task_detail_summary(db, ids[task])
+
+    assert TaskDetailSummary.model_validate_json(document) == summary
+    # The body the "orm" engine sends, byte for byte (the test database runs in UTC)
+    assert document == summary.model_dump_json()
+
+
+def test_created_at_is_rendered_as_pydantic_writes_utc(db, ids):
+    def created_at(task):
+        return json.loads(task_crud.get_task_detail_json(db, ids[task]))["created_at"]
+
+    assert created_at("full") == "2024-01-01T12:00:00.120000Z"
+    assert created_at("default_only") == "2024-01-01T12:00:00Z"
+    # Independent of the session TimeZone
+    db.execute(text("SET LOCAL TIME ZONE 'America/New_York'"))
+    assert created_at("full") == "2024-01-01T12:00:00.120000Z"
+
+
+def test_full_task_detail_has_every_relation(db, ids):
+    summary = TaskDetailSummary.model_validate_json(task_crud.get_task_detail_json(db, ids["full"]))
+    assert len(summary.variants) == 2
+    assert [len(group.subdatasets) for group in summary.subdatasets_by_variant] == [1, 2]
+    assert len(summary.subdatasets) == 3
+    assert sum(len(variant.items) for variant in summary.variants) == 2
+    assert len(summary.training_runs) == 1 and len(summary.evaluations) == 1
+
+
+def test_missing_task(db):
+    assert task_crud.get_task_detail_json(db, -1) is None
+    assert task_crud.get_task_detail_summary(db, -1) is None
@@ -0,0 +1,137 @@
+"""
+Connection pool warm-up (app.db.warmup) and the /ready probe, on stand-in
+engines that need no database.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.db import warmup
+from app.db.warmup import PoolWarmUp, warm_up_engine
+import app.main as main
+
+
+class FakeConnection:
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.closed = False
+
+    def exec_driver_sql(self, statement):
+        if self.fail:
+            raise RuntimeError("validation failed")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEngine:
+    """connect() waits for release (if given), then hands out a connection."""
+
+    def __init__(self, release: threading.Event = None, fail: bool = False):
+        self.release = release
+        self.fail = fail
+        self.connections = []
+
+    def connect(self):
+        if self.release is not None:
+            self.release.wait()
+        connection = FakeConnection(self.fail)
+        self.connections.append(connection)
+        return connection
+
+
+def test_opens_validates_and_returns_connections():
+    engine = FakeEngine()
+    assert warm_up_engine(engine, 3, timeout=5) == (3, [])
+    assert len(engine.connections) == 3 and all(connection.closed for connection in engine.connections)
+
+
+def test_failed_validations_are_reported():
+    engine = FakeEngine(fail=True)
+    assert warm_up_engine(engine, 2, timeout=5) == (0, ["validation failed"] * 2)
+    assert all(connection.closed for connection in engine.connections)
+
+
+def test_connections_still_opening_at_the_timeout_are_closed_when_they_arrive():
+    release = threading.Event()
+    engine = FakeEngine(release)
+    assert warm_up_engine(engine, 2, timeout=0.05) == (0, ["2 connections still opening after 0.05s"])
+
+    threads = [thread for thread in threading.enumerate() if thread.name.startswith("pool-warm-up-")]
+    # Never in the way of the interpreter's exit
+    assert len(threads) == 2 and all(thread.daemon for thread in threads)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(engine.connections) == 2 and all(connection.closed for connection in engine.connections)
+
+
+@pytest.fixture
+def warm_up(monkeypatch):
+    """A PoolWarmUp behind /ready whose async primary pool opens the counts queued in async_opened."""
+    monkeypatch.setattr(settings, "DB_POOL_WARMUP", True)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 2)
+    monkeypatch.setattr(settings, "DB_POOL_WARMUP_RETRY_SECONDS", 0)
+    monkeypatch.setattr(warmup, "replica_engines", [])
+    monkeypatch.setattr(warmup, "async_replica_engines", [])
+    monkeypatch.setattr(warmup, "warm_up_engine", lambda engine, size, timeout: (size, []))
+
+    pool_warm_up = PoolWarmUp()
+    pool_warm_up.async_opened = asyncio.Queue()
+
+    async def warm_up_async_engine(engine, size, timeout):
+        opened = await pool_warm_up.async_opened.get()
+        return opened, ["connection refused"] * (size - opened)
+
+    monkeypatch.setattr(warmup, "warm_up_async_engine", warm_up_async_engine)
+    monkeypatch.setattr(main, "pool_warm_up", pool_warm_up)
+    return pool_warm_up
+
+
+async def ready_status() -> int:
+    response = await main.readiness_check()
+    return 200 if isinstance(response, dict) else response.status_code
+
+
+def test_not_ready_until_an_attempt_succeeds(warm_up):
+    async def scenario():
+        warm_up.start()
+        await asyncio.sleep(0)
+        # Served while warming up
+        assert await ready_status() == 503
+
+        # Database not reachable yet: retried
+        await warm_up.async_opened.put(0)
+        while warm_up.attempts < 2:
+            await asyncio.sleep(0)
+        assert warm_up.failed_pools() == ["primary-async"]
+        assert await ready_status() == 503
+
+        await warm_up.async_opened.put(1)
+        while not warm_up.ready:
+            await asyncio.sleep(0)
+        assert await ready_status() == 200
+        assert warm_up.results["primary-async"]["errors"] == ["connection refused"]
+        await warm_up.stop()
+
+    asyncio.run(scenario())
+    assert warm_up.attempts == 2
+
+
+def test_stop_cancels_a_running_warm_up(warm_up):
+    async def scenario():
+        warm_up.start()
+        await asyncio.sleep(0)
+        await warm_up.stop()
+
+    asyncio.run(scenario())
+    assert not warm_up.ready
+
+
+def test_ready_at_once_without_warm_up(warm_up, monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_WARMUP", False)
+    asyncio.run(warm_up.run())
+    assert warm_up.ready and warm_up.attempts == 0
@@ -82,7 +82,7 @@ const SubdatasetDetailPage: React.FC = () => {
   const { data: subdataset, isLoading: loadingSubdataset } = useQuery<SubdatasetDetail>({
     queryKey: ['subdataset-detail', subdatasetId],
     queryFn: async () => {
-      const response = await axios.get(`${BACKEND_URL}/api/v1/subdatasets/${subdatasetId}`)
+      const response = await axios.get(`${BACKEND_URL}/api/v1/subdatasets/${subdatasetId}?episode_limit=0`)
       return response.data
     },
     enabled: !!subdatasetId
@@ -135,7 +135,7 @@ function SubdatasetsPage() {
     queryKey: ['subdataset', expandedSubdatasetId],
     queryFn: async () => {
       if (!expandedSubdatasetId) return null
-      const response = await axios.get(`${BACKEND_URL}/api/v1/subdatasets/${expandedSubdatasetId}`)
+      const response = await axios.get(`${BACKEND_URL}/api/v1/subdatasets/${expandedSubdatasetId}?episode_limit=0`)
       return response.data
     },
     enabled: !!expandedSubdatasetId